@@ -10,12 +10,29 @@ structures of dictionaries, lists and sets.
 
 
 
-from .diff import deepdiff
+from .columns import deepcolumns
+from .compose import deepcompose
+from .diff import DeepDiffResult, deepdiff, deepequal, iter_deepdiff
 from .filter import deepfilter
-from .merge import deepmerge
-from .get import deepget
+from .fingerprint import DeepFingerprints
+from .listdiff import DeepListEdit, listdiff, listpatch
+from .merge import DeepMergePlan, deepmerge, deepmerge_many, deepmerge_plan
+from .merge3 import MISSING, DeepConflict, deepmerge3
+from .parallel import deepdiff_parallel, deepmerge_parallel
+from .path import DeepPath
+from .policy import ANY, DeepPolicy
+from .query import ANY_DEPTH, compile_query, deepquery
+from .get import DeepGetPaths, deepget, deepget_many
+from .intern import (
+    DeepInternTable, FrozenDict, FrozenList, FrozenSet, deepintern, deepthaw)
+from .jsonpatch import (
+    apply_jsonpatch, deepdiff_to_jsonpatch, deepdiff_to_mergepatch,
+    jsonpatch_to_deepdiff, mergepatch_to_deepdiff)
 from .removeitems import deepremoveitems
 from .setdefault import deepsetdefault
+from .store import DeepVersionStore
+from .tracked import TrackedDict, TrackedList, TrackedSet, deeptrack
+from .types import register_container
 
 
 
@@ -24,10 +41,52 @@ __version__ = "1.8"
 
 
 __all__ = [
+    "ANY",
+    "ANY_DEPTH",
+    "MISSING",
+    "DeepConflict",
+    "DeepDiffResult",
+    "DeepFingerprints",
+    "DeepGetPaths",
+    "DeepInternTable",
+    "DeepListEdit",
+    "DeepMergePlan",
+    "DeepPath",
+    "DeepPolicy",
+    "DeepVersionStore",
+    "FrozenDict",
+    "FrozenList",
+    "FrozenSet",
+    "TrackedDict",
+    "TrackedList",
+    "TrackedSet",
+    "apply_jsonpatch",
+    "compile_query",
+    "deepcolumns",
+    "deepcompose",
     "deepdiff",
+    "deepdiff_parallel",
+    "deepdiff_to_jsonpatch",
+    "deepdiff_to_mergepatch",
+    "deepequal",
     "deepfilter",
     "deepget",
+    "deepget_many",
+    "deepintern",
     "deepmerge",
+    "deepmerge3",
+    "deepmerge_many",
+    "deepmerge_parallel",
+    "deepmerge_plan",
+    "deepquery",
     "deepremoveitems",
     "deepsetdefault",
+    "deepthaw",
+    "deeptrack",
+    "iter_deepdiff",
+    "jsonpatch_to_deepdiff",
+    "listdiff",
+    "listpatch",
+    "mergepatch_to_deepdiff",
+    "register_container",
 ]
@@ -0,0 +1,187 @@
+# deepops.columns
+
+
+
+from numbers import Integral, Real
+from operator import itemgetter
+
+from .get import DeepGetPaths
+from .types import _CONTAINERS
+
+
+
+def _column_cells(docs, paths):
+    """Retrieves the values at each of the paths from every document in
+    'docs', returning a list with an entry for each path (in the same
+    order as 'paths'), being a tuple of (rows, values) - the indices of
+    the documents which contain the path and the value in each of them.
+
+    Rather than retrieving each path from each document separately, the
+    trie of paths from DeepGetPaths is walked once, with all the
+    documents together: at each node, we have the list of documents
+    which reached it (and the objects in them at that point), which is
+    narrowed down for each child.  Common prefixes of the paths are
+    thus only traversed once for each document.
+    """
+
+    root = DeepGetPaths(paths)._root
+
+    columns = [None] * len(paths)
+
+    stack = [(root, list(range(len(docs))), list(docs))]
+
+    while stack:
+        node, rows, objs = stack.pop()
+
+        for index in node.indices:
+            columns[index] = (rows, objs)
+
+        # if the objects are all dictionaries, we try the common case
+        # first, where every one of them has the key, which can be done
+        # without a loop in Python
+
+        all_dicts = set(map(type, objs)) == {dict}
+
+        for key, child in node.children.items():
+            if all_dicts:
+                try:
+                    stack.append((child, rows, list(map(itemgetter(key),
+                                                        objs))))
+                    continue
+
+                except KeyError:
+                    pass
+
+
+            child_rows = []
+            child_objs = []
+
+            for row, obj in zip(rows, objs):
+                container = _CONTAINERS[type(obj)]
+
+                if ((container is not None) and (container.kind is dict)
+                    and container.contains(obj, key)):
+
+                    child_rows.append(row)
+                    child_objs.append(obj[key])
+
+            stack.append((child, child_rows, child_objs))
+
+    return columns
+
+
+
+def _column_kind(values):
+    """Returns the kind of column for a list of values: 'bool' if all
+    of them are booleans, 'int' if they're all integers, 'float' if
+    they're a mixture of integers and floats (or other real numbers)
+    and 'object' in all other cases (including no values at all).
+
+    Only the distinct types of the values are checked, which is much
+    quicker than checking each value.
+    """
+
+    types = set(map(type, values))
+
+    if not types:
+        return "object"
+
+    if all(issubclass(t, bool) for t in types):
+        return "bool"
+
+    if any(issubclass(t, bool) or not issubclass(t, Real) for t in types):
+        return "object"
+
+    if all(issubclass(t, Integral) for t in types):
+        return "int"
+
+    return "float"
+
+
+
+def deepcolumns(docs, paths):
+    """This function retrieves the values at a number of paths from
+    each of a sequence of similar documents (nested data structures of
+    dictionaries), returning them as columns of NumPy arrays, for
+    analysis.  It requires NumPy to be installed.
+
+    A list is returned, with an entry for each path in 'paths' (each a
+    sequence of keys, as would be given to deepget()), in the same
+    order.  Each entry is a tuple (values, valid), where 'values' is an
+    array with an element for each document, and 'valid' is a boolean
+    array, which is True where the document contains the path.
+
+    The type of the values array depends on the values found: if they
+    are all booleans, it's a bool array; if they're all integers, it's
+    an int64 array (unless any are out of range); if they're a mixture
+    of integers and floats, it's a float64 array; otherwise, it's an
+    object array.  Missing values are False, 0, NaN or None,
+    respectively, but the valid array should be used to identify them.
+
+    The documents are traversed together, column-wise, sharing any
+    common prefixes of the paths (see DeepGetPaths), rather than
+    calling deepget() for each path in each document.
+
+    Keyword arguments:
+
+    docs -- a sequence of documents to retrieve the values from
+
+    paths -- an iterable of paths to retrieve
+    """
+
+    try:
+        import numpy as np
+    except ImportError:
+        raise ImportError("deepcolumns requires numpy, which can be "
+                          "installed with: pip install deepops[numpy]")
+
+
+    paths = list(paths)
+
+    num_docs = len(docs)
+
+    columns = []
+
+    for rows, values in _column_cells(docs, paths):
+        kind = _column_kind(values)
+
+        if kind == "int":
+            try:
+                present = np.array(values, dtype=np.int64)
+            except OverflowError:
+                kind = "object"
+
+        if kind == "bool":
+            present = np.array(values, dtype=bool)
+            column = np.zeros(num_docs, dtype=bool)
+
+        elif kind == "int":
+            column = np.zeros(num_docs, dtype=np.int64)
+
+        elif kind == "float":
+            present = np.array(values, dtype=np.float64)
+            column = np.full(num_docs, np.nan)
+
+        else:
+            # building an object array from a list would turn any
+            # sequences in it into extra dimensions, so we fill in the
+            # elements individually
+
+            present = np.empty(len(values), dtype=object)
+            for i, value in enumerate(values):
+                present[i] = value
+
+            column = np.full(num_docs, None, dtype=object)
+
+
+        rows = np.array(rows, dtype=np.intp)
+
+        column[rows] = present
+
+        valid = np.zeros(num_docs, dtype=bool)
+        valid[rows] = True
+
+        columns.append((column, valid))
+
+
+    return columns
@@ -0,0 +1,357 @@
+# deepops.compose
+
+
+
+from copy import copy as _copy, deepcopy
+
+from .listdiff import DeepListEdit, _compose_edits, listpatch
+from .listset import _difference, _multiset_difference
+from .merge import deepmerge
+from .path import DeepPath
+from .removeitems import deepremoveitems
+from .types import _KINDS
+from .walk import _recurse, _walk
+
+
+
+def _kind(obj):
+    """Returns the kind of compound object 'obj' is (dict, list or
+    set), or None, if it's not one of those (see register_container()).
+    """
+
+    return _KINDS[type(obj)]
+
+
+
+def _compose_removes(r1, r2, list_as_set, path):
+    """Returns the combination of two sets of items to be removed, one
+    after the other (with nothing added in between), without modifying
+    either.
+
+    This is a generator function, to be run with _walk().
+    """
+
+    kind = _kind(r1)
+
+    if kind != _kind(r2):
+        raise TypeError("deepcompose at: %s cannot combine removals of "
+                        "types: %s and: %s" % (path, type(r1), type(r2)))
+
+    if kind is dict:
+        removes = _copy(r1)
+
+        for item, r2_value in r2.items():
+            if item in removes:
+                # if the entire item is already removed, there's
+                # nothing more to remove from it
+
+                if not removes[item]:
+                    continue
+
+                if not r2_value:
+                    removes[item] = None
+                else:
+                    removes[item] = yield from _recurse(
+                        _compose_removes(removes[item], r2_value, list_as_set,
+                                         path.sub(item)),
+                        path)
+
+            else:
+                removes[item] = r2_value
+
+        return removes
+
+    if kind is set:
+        return r1 | r2
+
+    if list_as_set:
+        return type(r1)(list(r1) + _difference(r2, r1))
+
+    return type(r1)(list(r1) + list(r2))
+
+
+
+def _compose_value(r1, u1, r2, list_as_set, path):
+    """Returns the combination of a removal and update, 'r1' and 'u1',
+    to a compound item, followed by another removal, 'r2', from it, as
+    a new (removal, update) pair.  The removal 'r1' may be None, if
+    there was none.
+
+    This is a generator function, to be run with _walk().
+    """
+
+    kind = _kind(u1)
+
+    if (kind != _kind(r2)) or ((r1 is not None) and (kind != _kind(r1))):
+        raise TypeError("deepcompose at: %s cannot remove type: %s from "
+                        "type: %s" % (path, type(r2), type(u1)))
+
+    if isinstance(u1, DeepListEdit):
+        # a list edit has nothing removed (at the top level, where an
+        # empty removal means nothing is removed), so that's fine, but
+        # items can't be removed after one
+
+        if r2:
+            raise ValueError("deepcompose at: %s cannot remove items after "
+                             "a list edit" % path)
+
+        return (type(r2)() if r1 is None else r1), u1
+
+
+    if kind is dict:
+        return (yield from _compose_dicts(
+                               type(u1)() if r1 is None else r1, u1, r2,
+                               type(u1)(), list_as_set, path))
+
+
+    if r1 is None:
+        r1 = type(r2)()
+
+    if kind is set:
+        # items removed afterwards are removed, whether they were in
+        # the original or were added
+
+        return r1 | r2, u1 - r2
+
+
+    if list_as_set:
+        return (type(r1)(list(r1) + _difference(r2, r1)),
+                type(u1)(_difference(u1, r2)))
+
+
+    # for ordinary lists, items removed afterwards are taken out of the
+    # added items first, and only the remainder removed from the
+    # original
+
+    return (type(r1)(list(r1) + _multiset_difference(r2, u1)),
+            type(u1)(_multiset_difference(u1, r2)))
+
+
+
+def _merge_updates(u1, u2, list_as_set, path, removes=None,
+                   replaced=False):
+    """Returns the combination of two updates to the same item, one
+    after the other, without modifying either.
+
+    The 'removes' argument is the removal from the item made by the
+    earlier patches, if any, and 'replaced' is True if 'u1' replaces
+    the item entirely: i.e. it's in a dictionary and there was no
+    removal from it, or it was removed entirely (as deepdiff() gives
+    for a new item, or one which changes type), rather than 'u1' being
+    merged into what was there.
+
+    This is a generator function, to be run with _walk().
+    """
+
+    # two list edits are combined into a single edit script, with the
+    # same effect
+
+    if isinstance(u1, DeepListEdit) and isinstance(u2, DeepListEdit):
+        try:
+            return _compose_edits(u1, u2)
+
+        except ValueError as e:
+            raise ValueError("deepcompose at: %s cannot combine list edits: "
+                             "%s" % (path, e))
+
+    # a list edit after an update which replaced the entire list can
+    # just be applied to the new list
+    #
+    # otherwise, the edit applies to a list we don't know
+
+    if (isinstance(u2, DeepListEdit) and replaced
+            and (_kind(u1) is list)):
+
+        updates = list(u1)
+
+        try:
+            listpatch(updates, u2)
+
+        except ValueError as e:
+            raise ValueError("deepcompose at: %s cannot apply list edit: %s"
+                             % (path, e))
+
+        return updates
+
+    if isinstance(u2, DeepListEdit) or isinstance(u1, DeepListEdit):
+        if _kind(u1) is list:
+            raise ValueError("deepcompose at: %s cannot combine a list edit "
+                             "with another list update" % path)
+
+        return u2
+
+    # if the first update is a simple value, the second one replaces it
+    # (or fails, when applied, as it would have done anyway)
+
+    if (_kind(u1) is None) or (_kind(u1) != _kind(u2)):
+        return u2
+
+
+    # dictionaries are combined item by item, as they may contain list
+    # edits, which deepmerge() would apply to the first edit script,
+    # rather than combining them
+
+    if _kind(u1) is dict:
+        updates = _copy(u1)
+
+        for item, u2_value in u2.items():
+            if item in updates:
+                item_removes = removes.get(item) if removes else None
+
+                updates[item] = yield from _recurse(
+                    _merge_updates(updates[item], u2_value, list_as_set,
+                                   path.sub(item), item_removes,
+                                   not item_removes),
+                    path)
+
+            else:
+                updates[item] = u2_value
+
+        return updates
+
+
+    return deepmerge(u1, u2, list_as_set=list_as_set, change_types=True,
+                     copy=True)
+
+
+
+def _compose_dicts(r1, u1, r2, u2, list_as_set, path=DeepPath()):
+    """Returns the combination of two (removal, update) pairs of
+    dictionaries, applied one after the other, as a single pair,
+    without modifying any of them.
+
+    This is a generator function, to be run with _walk().
+    """
+
+    removes = _copy(r1)
+    updates = _copy(u1)
+
+
+    # work through the second removals: note that, as with
+    # deepremoveitems(), a removal which is 'empty' (i.e. tests as
+    # False) removes the entire item
+
+    for item, r2_value in r2.items():
+        if not r2_value:
+            # the item is removed entirely, so anything done to it
+            # before doesn't matter
+
+            removes[item] = None
+            updates.pop(item, None)
+
+
+        elif item in updates:
+            if (item in removes) and not removes[item]:
+                # the item was removed entirely and then replaced with
+                # the update, so we just remove the items from that
+
+                updates[item] = deepcopy(updates[item])
+                deepremoveitems(updates[item], r2_value)
+
+            else:
+                remove_value, update_value = yield from _recurse(
+                    _compose_value(removes.get(item), updates[item],
+                                   r2_value, list_as_set, path.sub(item)),
+                    path)
+
+                # an empty removal would remove the entire item, so we
+                # leave it out
+
+                if remove_value:
+                    removes[item] = remove_value
+                else:
+                    removes.pop(item, None)
+
+                updates[item] = update_value
+
+
+        elif item in removes:
+            # if the item was removed entirely, there's nothing to
+            # remove from it, now
+
+            if removes[item]:
+                removes[item] = yield from _recurse(
+                    _compose_removes(removes[item], r2_value, list_as_set,
+                                     path.sub(item)),
+                    path)
+
+        else:
+            removes[item] = r2_value
+
+
+    # then merge in the second updates
+
+    for item, u2_value in u2.items():
+        if item in updates:
+            item_removes = removes.get(item)
+
+            updates[item] = yield from _recurse(
+                _merge_updates(updates[item], u2_value, list_as_set,
+                               path.sub(item), item_removes,
+                               not item_removes),
+                path)
+
+        else:
+            updates[item] = u2_value
+
+
+    return removes, updates
+
+
+
+def deepcompose(patches, list_as_set=False):
+    """Combines a sequence of patches, each a tuple (remove_items,
+    update_items), as returned by deepdiff(), into a single patch, with
+    the same effect as applying each of them in turn (with
+    deepremoveitems() and then deepmerge()).  This is done by combining
+    the patches themselves, without needing the object they apply to,
+    so a long history of changes can be squashed into one, which can be
+    applied in a single step.
+
+    The patches are not modified, but the returned patch may share
+    items with them, so should be copied, if it's to be modified (or
+    applied, as deepmerge() adds the items without copying them).
+
+    The 'list_as_set' argument should be the same as will be used when
+    the patch is applied.  For lists (not treated as sets), the items
+    added and removed are combined, such that the result contains the
+    same items, but not necessarily in the same order, unless each
+    patch replaces the entire list (which is what deepdiff() does).
+
+    Patches containing list edits (see deepdiff()) can be combined:
+    where more than one patch edits the same list, the edit scripts are
+    combined into a single script, with the same effect, and a list
+    which is added (or replaced entirely) and then edited is combined
+    into the edited list.  However, a list which is edited can't also
+    be changed in some other way (such as having items added by another
+    patch, without list_edits).
+    Patches using keyed lists are not supported.
+
+    If no patches are given, an empty patch is returned.
+    """
+
+    patches = list(patches)
+
+    if not patches:
+        return {}, {}
+
+    removes, updates = patches[0]
+
+    for r2, u2 in patches[1:]:
+        if (_kind(removes) is dict) and (_kind(updates) is dict):
+            removes, updates = _walk(_compose_dicts(
+                                         removes, updates, r2, u2,
+                                         list_as_set))
+
+        else:
+            # the top level is a list or set (where an empty removal
+            # just means there's nothing to remove)
+
+            removes, updates = _walk(_compose_value(
+                                         removes, updates, r2, list_as_set,
+                                         DeepPath()))
+
+            updates = _walk(_merge_updates(updates, u2, list_as_set,
+                                           DeepPath()))
+
+    return removes, updates
@@ -2,133 +2,645 @@
 
 
 
+from time import monotonic
+
+from .fingerprint import DeepFingerprints
+from .intern import _known_equal
+from .keyedlist import _index_keyed_list
+from .listdiff import listdiff
+from .listset import _difference
 from .path import DeepPath
+from .policy import _policy_state
+from .types import _CONTAINERS, _KINDS, _thawed_type
+from .walk import _iter_walk, _recurse, _walk
+
+
+
+class DeepDiffResult(tuple):
+    """The result of deepdiff(): this is a 2-tuple of (remove_items,
+    update_items), as before, so it can be unpacked as one, with the
+    addition of the 'truncated' attribute, which is True if the
+    comparison was stopped early because it exceeded the 'max_changes'
+    or 'time_budget' limit (in which case the items are incomplete).
+    """
+
+
+    def __new__(cls, remove_items, update_items, truncated=False):
+        self = tuple.__new__(cls, (remove_items, update_items))
+        self.truncated = truncated
+        return self
+
+
+    def __getnewargs__(self):
+        return self[0], self[1], self.truncated
+
+
+
+class _DiffBudget:
+    """This class tracks the number of changes found by deepdiff() and
+    the time taken, against the limits given by its 'max_changes' and
+    'time_budget' arguments.
+    """
+
+
+    def __init__(self, max_changes, time_budget):
+        self.max_changes = max_changes
+        self.deadline = (None if time_budget is None
+                             else monotonic() + time_budget)
+
+        self.changes = 0
+        self.exceeded = False
+
+
+    def spend(self, changes=0):
+        """Adds 'changes' to the number found and returns whether either
+        limit has now been exceeded (once it has, this is always True).
+        """
+
+        self.changes += changes
+
+        if not self.exceeded:
+            if ((self.max_changes is not None)
+                and (self.changes > self.max_changes)):
+
+                self.exceeded = True
+
+            elif (self.deadline is not None) and (monotonic() > self.deadline):
+                self.exceeded = True
+
+        return self.exceeded
+
+
+
+class _DiffLevel:
+    """This class holds the changes found at one level of the
+    comparison (one pair of compound objects) by _deepdiff(), for
+    _DiffBuilder.
+
+    For a dictionary, the remove and update items are dictionaries;
+    otherwise, they're lists (of the items removed and added, for a set
+    or list treated as one, or the dictionaries of the key field and
+    changes for a keyed list).  They're converted to the type of
+    object to return, when the level is finished.  Where the level is
+    replaced as a whole (a list which has changed, or been edited), the
+    (remove_items, update_items) tuple is set in 'result', instead.
+    """
+
+    __slots__ = ("type", "key", "remove_items", "update_items", "result")
+
+
+    def __init__(self, a, key, kind):
+        self.type = _thawed_type(a)
+        self.key = key
+        self.remove_items = {} if kind is dict else []
+        self.update_items = {} if kind is dict else []
+        self.result = None
+
+
+
+class _DiffBuilder:
+    """This class is the 'changes' object for _deepdiff(), when it's
+    run for deepdiff(): it builds the remove and update structures from
+    the changes found, counting them against the limits in the
+    _DiffBudget, if there is one.
+
+    The methods for each change return an empty tuple, as there is
+    nothing for _deepdiff() to yield (see _DiffEvents).
+    """
+
+    opname = "deepdiff"
+    strict = True
+
+
+    def __init__(self, budget=None):
+        self.budget = budget
+        self.exceeded = False
+
+
+    def _spend(self, changes):
+        # counts the changes against the budget, recording if it's been
+        # exceeded (the caller has checked there is one)
+
+        if self.budget.spend(changes):
+            self.exceeded = True
+
+
+    def stop(self):
+        """Returns whether the comparison should stop before looking at
+        another pair of objects, as the budget has been exceeded.
+        """
+
+        if self.budget is not None:
+            self._spend(0)
+
+        return self.exceeded
+
+
+    def empty(self, a):
+        """Returns the result for a pair of objects, with 'a' being the
+        'from' object, which have no changes (or are skipped).
+        """
+
+        return _thawed_type(a)(), _thawed_type(a)()
+
+
+    def level(self, a, kind, key=None):
+        """Returns the object to record the changes at a level, where
+        'a' is the 'from' object, 'kind' is the kind of container it is
+        and 'key' is the key field, if it's a keyed list.
+        """
+
+        return _DiffLevel(a, key, kind)
+
+
+    def remove(self, level, path, item, a_value):
+        # the value is None as we want to remove the entire key, not
+        # items from within it, which is how deepremoveitems() handles
+        # this - in a keyed list, this is an item with only the key
+        # field, built with the type of the item
+
+        if level.key is None:
+            level.remove_items[item] = None
+        else:
+            level.remove_items.append(
+                _thawed_type(a_value)({ level.key: item }))
+
+        if self.budget is not None:
+            self._spend(1)
+
+        return ()
+
+
+    def update(self, level, path, item, b_value):
+        if level.key is None:
+            level.update_items[item] = b_value
+        else:
+            level.update_items.append(b_value)
+
+        if self.budget is not None:
+            self._spend(1)
+
+        return ()
+
+
+    def remove_item(self, level, path, value):
+        level.remove_items.append(value)
+
+        if self.budget is not None:
+            self._spend(1)
+
+        return ()
+
+
+    def add_item(self, level, path, value):
+        level.update_items.append(value)
+
+        if self.budget is not None:
+            self._spend(1)
+
+        return ()
+
+
+    def replace(self, level, path, a, b):
+        # with lists as lists, the order is important, so we just
+        # remove everything in 'a' and add everything in 'b'
+
+        level.result = a, b
+
+        if self.budget is not None:
+            self._spend(1)
+
+        return ()
+
+
+    def edit(self, level, path, script):
+        # there's nothing to remove and the update is the edit script
+        # (deepmerge() will apply this, rather than merging it as a
+        # list)
+
+        level.result = level.type(), script
+
+        if self.budget is not None:
+            self._spend(1)
+
+        return ()
+
+
+    def child(self, level, item, result):
+        """Stores the 'result' of the recursive call for 'item', if
+        there were subitems to remove or update (they'd be empty
+        structures, if not).
+        """
+
+        remove_subitems, update_subitems = result
+
+        if level.key is None:
+            if remove_subitems:
+                level.remove_items[item] = remove_subitems
+
+            if update_subitems:
+                level.update_items[item] = update_subitems
+
+            return
+
+
+        # in a keyed list, these are added as a dictionary with the key
+        # field and the changes within the item
+
+        if remove_subitems:
+            level.remove_items.append(
+                type(remove_subitems)({ level.key: item }))
+
+            level.remove_items[-1].update(remove_subitems)
+
+        if update_subitems:
+            level.update_items.append(
+                type(update_subitems)({ level.key: item }))
+
+            level.update_items[-1].update(update_subitems)
+
+
+    def result(self, level):
+        """Returns the (remove_items, update_items) tuple for a finished
+        level, created with the same type as 'a' (or the mutable
+        version of it, if it's frozen - see deepintern()).
+        """
+
+        if level.result is not None:
+            return level.result
+
+        remove_items = level.remove_items
+        update_items = level.update_items
+
+        if type(remove_items) is not level.type:
+            remove_items = level.type(remove_items)
+            update_items = level.type(update_items)
+
+        return remove_items, update_items
+
+
+
+class _DiffEvents:
+    """This class is the 'changes' object for _deepdiff(), when it's
+    run for iter_deepdiff() or deepequal(): rather than building
+    anything, each change is returned as an (op, path, value) event,
+    for _deepdiff() to yield.
+
+    If 'strict' is False, values of different types are not an error,
+    but are just given as a change (replacing the value in 'a').
+    """
+
+    exceeded = False
+
+
+    def __init__(self, opname, strict=True):
+        self.opname = opname
+        self.strict = strict
+
+
+    def stop(self):
+        return False
+
+
+    def empty(self, a):
+        return None
+
+
+    def level(self, a, kind, key=None):
+        return None
+
+
+    def remove(self, level, path, item, a_value):
+        return (("remove", path.sub(item), None),)
+
+
+    def update(self, level, path, item, b_value):
+        return (("update", path.sub(item), b_value),)
+
+
+    def remove_item(self, level, path, value):
+        return (("remove_item", path, value),)
 
 
+    def add_item(self, level, path, value):
+        return (("add_item", path, value),)
 
-def _deepdiff(a, b, list_as_set, change_types, filter_func, path=DeepPath()):
-    """Backend function for deepdiff() that does the actual work.  It
-    is defined privately to not offer the 'path' argument.
+
+    def replace(self, level, path, a, b):
+        return (("update", path, b),)
+
+
+    def edit(self, level, path, script):
+        return (("edit", path, script),)
+
+
+    def child(self, level, item, result):
+        pass
+
+
+    def result(self, level):
+        return None
+
+
+
+# the depth (length of the path) from which dictionaries and keyed
+# lists are no longer compared with '==', before working through them:
+# each comparison walks the entire subtree, so doing this at every
+# level is quadratic in the depth of the structures (and, in very deep
+# ones, exceeds the recursion limit every time)
+
+_EQUAL_DEPTH = 50
+
+
+
+def _same(a, b, kind, state, fingerprints, path):
+    """Returns whether compound objects 'a' and 'b' (of the kind of
+    container 'kind' - 'b' may be of another kind) are known to be the
+    same (and don't need comparing item by item).
+
+    This can often be told without comparing them: if they're the same
+    object, or are both frozen objects (see deepintern()), with
+    different hashes.  Otherwise, if we have fingerprints, we compare
+    those, rather than the objects themselves, as that's constant time
+    (once the digests have been calculated).
+
+    Failing that, they're compared with '==', unless they're
+    dictionaries or keyed lists, beyond _EQUAL_DEPTH: these are just
+    walked, which finds they're the same, if they are, anyway.
+    """
+
+    equal = _known_equal(a, b)
+
+    if (equal is None) and (fingerprints is not None):
+        equal = fingerprints.equal(a, b)
+
+    if equal is None:
+        if ((len(path) >= _EQUAL_DEPTH)
+            and ((kind is dict)
+                 or ((kind is list) and (state.list_key is not None)))):
+
+            return False
+
+        # comparing very deep structures with '==' can exceed the
+        # recursion limit - if so, we just treat them as different and
+        # work through them (this raises RecursionError from Python
+        # 3.5, which is a subclass of the RuntimeError raised before)
+
+        try:
+            equal = a == b
+
+        except RuntimeError:
+            equal = False
+
+    return equal
+
+
+
+def _deepdiff(a, b, state, filter_func, fingerprints, changes,
+              path=DeepPath()):
+
+    """Backend function for deepdiff() and iter_deepdiff() that does
+    the actual work.  It is defined privately to not offer the 'path'
+    argument.
+
+    This is a generator function: recursive calls are made with
+    _recurse(), so it can be run with _walk() and, where the changes
+    are to be given as they're found, each change is yielded as an
+    (op, path, value) tuple, so it's run with _iter_walk(), instead.
+
+    Each change found is passed to the 'changes' object, which either
+    builds the remove and update items (a _DiffBuilder) or returns the
+    change as an event to be yielded (a _DiffEvents), so the rules for
+    comparing the objects are the same for both.  The value returned
+    is the result for this level from the 'changes' object.
 
     See deepdiff() for information.
 
     Keyword arguments (in addition to deepdiff()):
 
+    state -- the state of the DeepPolicy for this path, giving the
+    options to use (this replaces the 'policy' argument and the other
+    options, such as list_as_set)
+
+    changes -- the _DiffBuilder or _DiffEvents object, to which the
+    changes are passed: once its 'exceeded' attribute is True (the
+    budget for the comparison has run out), no further changes are
+    looked for; if its 'strict' attribute is False, values of different
+    types are a change, rather than raising a TypeError
+
     path -- a DeepPath() object representing the position in the
     structures for this call.
     """
 
 
-    # if a filter function was supplied call it and return without
-    # doing anything, if it returns False
+    # if the policy says to skip this path, or a filter function was
+    # supplied call it, return without doing anything, if it returns
+    # False
+
+    if state.skip:
+        return changes.empty(a)
 
     if filter_func:
         if not filter_func(path, a, b):
-            return type(a)(), type(a)()
+            return changes.empty(a)
+
+
+    # if we've run out of budget, we don't look any further
+
+    if changes.stop():
+        return changes.empty(a)
 
 
     # raise errors if either of the supplied objects are not compound
     # types
 
-    if not isinstance(a, (list, set, dict)):
-        raise TypeError("deepdiff at: %s invalid type for 'from' ('a') "
-                        "object: %s" % (path, type(a)))
+    a_kind = _KINDS[type(a)]
+    b_kind = _KINDS[type(b)]
+
+    if a_kind is None:
+        raise TypeError("%s at: %s invalid type for 'from' ('a') object: %s"
+                            % (changes.opname, path, type(a)))
 
-    if not isinstance(b, (list, set, dict)):
-        raise TypeError("deepdiff at: %s invalid type for 'to' ('b') object: "
-                        "%s" % (path, type(b)))
+    if b_kind is None:
+        raise TypeError("%s at: %s invalid type for 'to' ('b') object: %s"
+                            % (changes.opname, path, type(b)))
 
 
     # if they're the same, there's nothing to remove, nothing to update
 
-    if a == b:
-        return type(a)(), type(a)()
+    if _same(a, b, a_kind, state, fingerprints, path):
+        return changes.empty(a)
+
+
+    if (a_kind is list) and (b_kind is list):
+        key = state.list_key
+
+        if key is not None:
+            # this is a keyed list of dictionaries, so we match up the
+            # items in each by the value of their key field and compare
+            # those: the items to remove and update are lists of
+            # dictionaries, containing the key field, and the fields to
+            # be removed or updated in that item (an item with only the
+            # key field in the remove list means the entire item is
+            # removed)
+
+            a_index = _index_keyed_list(a, key, path, changes.opname)
+            b_index = _index_keyed_list(b, key, path, changes.opname)
+
+            level = changes.level(a, list, key)
+
+            for k, a_item in a_index.items():
+                if k not in b_index:
+                    yield from changes.remove(level, path, k, a_item)
+
+            if changes.exceeded:
+                return changes.result(level)
 
+            # the items in 'b' are added, if they're not in 'a', or
+            # compared, if they are, in the order of 'b'
 
-    if isinstance(a, list) and isinstance(b, list):
-        if list_as_set:
+            for k, b_item in b_index.items():
+                if k not in a_index:
+                    yield from changes.update(level, path, k, b_item)
+
+                else:
+                    changes.child(
+                        level, k,
+                        (yield from _recurse(
+                             _deepdiff(a_index[k], b_item, state.sub(k),
+                                       filter_func, fingerprints, changes,
+                                       path.sub(k)),
+                             path)))
+
+                    if changes.exceeded:
+                        break
+
+            return changes.result(level)
+
+
+        level = changes.level(a, list)
+
+        if state.list_as_set:
             # we're treating lists as sets, so we find the differences,
             # ignoring the order - we create the new objects with the
             # same type as 'a' (in case it's not a list)
+            #
+            # the differences are found by hashing the items, rather
+            # than searching the other list for each one, as that is
+            # quadratic and very slow for long lists
+
+            # remove everything in 'a' that is not in 'b' and update
+            # (add) everything in 'b' that is not in 'a'
 
-            return (
-                # remove everything in 'a' that is not in 'b'
-                type(a)([ i for i in a if i not in b ]),
+            for i in _difference(a, b):
+                yield from changes.remove_item(level, path, i)
 
-                # update (add) everything in 'b' that is not in 'a'
-                type(a)([ i for i in b if i not in a ]))
+            for i in _difference(b, a):
+                yield from changes.add_item(level, path, i)
+
+        elif state.list_edits:
+            # we're calculating edit scripts for lists, so the change
+            # is the edit script to transform the list 'a' into 'b'
+
+            yield from changes.edit(level, path, listdiff(a, b))
 
         else:
-            # with lists as lists, the order is important and they're
-            # different, so we just remove everything in 'a' and add
-            # everything in 'b'
+            # the lists are different, so they're replaced entirely
 
-            return a, b
+            yield from changes.replace(level, path, a, b)
 
+        return changes.result(level)
 
-    elif isinstance(a, set) and isinstance(b, set):
+
+    elif (a_kind is set) and (b_kind is set):
         # remove everything in 'a' not in 'b' and add everything in 'b'
         # not in 'a'
 
-        return a.difference(b), b.difference(a)
+        a_container = _CONTAINERS[type(a)]
+        b_container = _CONTAINERS[type(b)]
+
+        level = changes.level(a, set)
+
+        for i in a_container.iterate(a):
+            if not b_container.contains(b, i):
+                yield from changes.remove_item(level, path, i)
+
+        for i in b_container.iterate(b):
+            if not a_container.contains(a, i):
+                yield from changes.add_item(level, path, i)
+
+        return changes.result(level)
+
+
+    elif (a_kind is dict) and (b_kind is dict):
+        a_container = _CONTAINERS[type(a)]
+        b_container = _CONTAINERS[type(b)]
+
+        level = changes.level(a, dict)
 
 
-    elif isinstance(a, dict) and isinstance(b, dict):
         # we delete all the items where the key is in 'a' but not in
-        # 'b' (the value in the returned dictionary is None as we want
-        # to remove the entire key, not items from within it, which is
-        # how deepremoveitems() handles this)
-        #
-        # this also initialises the remove_items dictionary (perhaps to
-        # an empty dictionary, if there are none)
+        # 'b' and add all the items where the key is in 'b' but not in
+        # 'a', including their value
         #
-        # we create this with the same type as 'a'
+        # any items the policy says to skip are left alone
 
-        remove_items = type(a)({ i: None for i in a if i not in b })
+        for item, a_value in a_container.iterate(a):
+            if ((not b_container.contains(b, item))
+                and (not state.sub(item).skip)):
 
+                yield from changes.remove(level, path, item, a_value)
+
+        for item, b_value in b_container.iterate(b):
+            if ((not a_container.contains(a, item))
+                and (not state.sub(item).skip)):
+
+                yield from changes.update(level, path, item, b_value)
 
-        # we add all the items where the key is in 'b' but not in 'a',
-        # including their value
-        #
-        # this also initialises the update_items dictionary (perhaps to
-        # an empty dictionary, if there are none)
-        #
-        # we create this with the same type as 'a' (not 'b'), as we're
-        # really reporting on what needs to be added to 'a'
 
-        update_items = type(a)({ i: b[i] for i in b if i not in a })
+        # each item removed or added counts as a change - if that takes
+        # us over budget, we don't look at the common items
+
+        if changes.exceeded:
+            return changes.result(level)
 
 
         # finally, work through the keys that are common to both
         # dictionaries...
 
-        for item in set(a).intersection(b):
+        for item, a_value in a_container.iterate(a):
+            if not b_container.contains(b, item):
+                continue
+
+            sub_state = state.sub(item)
+
+            if sub_state.skip:
+                continue
+
+            b_value = b[item]
+
+
             # if this item is a compound type in both dictionaries...
             #
             # (we don't need to check the types are the same as this
             # will be done by the recursive call)
 
-            if (isinstance(a[item], (list, set, dict))
-                and isinstance(b[item], (list, set, dict))):
-
-                # recursively calculate the differences, getting the
-                # subitems to be removed and updated within it
+            if ((_KINDS[type(a_value)] is not None)
+                and (_KINDS[type(b_value)] is not None)):
 
-                remove_subitems, update_subitems = (
-                    _deepdiff(a[item], b[item], list_as_set, change_types,
-                              filter_func, path.sub(item)))
+                # recursively calculate the differences, passing the
+                # result (the subitems to be removed and updated within
+                # it) to the changes object
 
+                changes.child(
+                    level, item,
+                    (yield from _recurse(
+                         _deepdiff(a_value, b_value, sub_state, filter_func,
+                                   fingerprints, changes, path.sub(item)),
+                         path)))
 
-                # if there were subitems to remove or update (they'd be
-                # None, or empty structures - something that tests as
-                # False - if they were the same), store those in the
-                # dictionaries of replies
-
-                if remove_subitems:
-                    remove_items[item] = remove_subitems
-
-                if update_subitems:
-                    update_items[item] = update_subitems
+                if changes.exceeded:
+                    break
 
 
             # the item is a simple type in one or both of the
@@ -139,51 +651,63 @@ def _deepdiff(a, b, list_as_set, change_types, filter_func, path=DeepPath()):
                 # to filter it
 
                 if filter_func:
-                    if not filter_func(
-                               path.sub(item), a[item], b[item]):
-
+                    if not filter_func(path.sub(item), a_value, b_value):
                         continue
 
 
                 # the types must match, unless we're allowed to
-                # change_types
+                # change_types (or just looking for differences)
+
+                if ((type(a_value) != type(b_value))
+                    and (not sub_state.change_types)
+                    and changes.strict):
 
-                if (type(a[item]) != type(b[item])) and (not change_types):
                     raise TypeError(
-                              "deepdiff at: %s cannot compare or "
-                              "change types: %s and: %s"
-                                  % (path.sub(item), type(a[item]),
-                                     type(b[item])))
+                              "%s at: %s cannot compare or change types: "
+                              "%s and: %s"
+                                  % (changes.opname, path.sub(item),
+                                     type(a_value), type(b_value)))
 
 
-                # store the new value for the item in the update
-                # dictionary
+                # the item is updated with the new value
 
-                if a[item] != b[item]:
-                    update_items[item] = b[item]
+                if a_value != b_value:
+                    yield from changes.update(level, path, item, b_value)
 
+                    if changes.exceeded:
+                        break
 
-        return remove_items, update_items
+
+        return changes.result(level)
 
 
     # if we get here, the items are of different types (but are both
     # compound types, as we checked for that earlier): raise a
-    # TypeError
+    # TypeError, unless we're just looking for differences, in which
+    # case 'a' is replaced
 
-    raise TypeError(
-              "deepdiff at %s: unable to change from type: %s to type: %s"
-                  % (path, type(a), type(b)))
+    if not changes.strict:
+        level = changes.level(a, a_kind)
+        yield from changes.replace(level, path, a, b)
+        return changes.result(level)
 
+    raise TypeError("%s at %s: unable to change from type: %s to type: %s"
+                        % (changes.opname, path, type(a), type(b)))
 
 
-def deepdiff(a, b, list_as_set=False, change_types=False, filter_func=None):
+
+def deepdiff(a, b, list_as_set=False, change_types=False, filter_func=None,
+             fingerprints=None, list_edits=False, list_keys=None,
+             policy=None, max_changes=None, time_budget=None):
     """Recursively compare two nested compound objects - 'a' and 'b' -
     returning what needs to be done to transform 'a' into 'b'.  Both
     'a' and 'b' must be compound types (a list, set or dictionary) at
     the top level and can contain further compound types or simple
     types, nested within.
 
-    The return value is a 2-tuple: ('remove_items', 'update_items'):
+    The return value is a 2-tuple: ('remove_items', 'update_items') (a
+    DeepDiffResult object, which also has a 'truncated' attribute - see
+    'max_changes' and 'time_budget', below):
 
     'remove_items' is what needs to be removed from 'a' (i.e. items
     that are in 'a' that are not in 'b').
@@ -213,7 +737,10 @@ def deepdiff(a, b, list_as_set=False, change_types=False, filter_func=None):
     unless list_as_set is set to True, in which case they are handled
     as per a set (although the result will still be a list).  No
     attempt is made to transform the list, leaving the common items in
-    place, as this would be tricky regarding the ordering.
+    place, unless list_edits is set to True, in which case nothing is
+    removed and the update is a DeepListEdit script (see listdiff()),
+    which deepmerge() will apply to the list.  Lists at paths given in
+    list_keys are handled as 'keyed lists' of dictionaries (see below).
 
     For sets, the items in 'a' that are not in 'b' are removed, and the
     items in 'b' that are not in 'a' are updated (added).
@@ -226,11 +753,28 @@ def deepdiff(a, b, list_as_set=False, change_types=False, filter_func=None):
     (according to type()) - a TypeError is raised otherwise - unless
     change_types is set to True.
 
+    For keyed lists, the items (which must be dictionaries) are matched
+    up by the value of their key field (which must be unique within
+    each list), regardless of their order, and matching items compared
+    recursively, as dictionaries.  The remove and update values are
+    lists of dictionaries, each containing the key field and the fields
+    to be removed or updated within that item.  Items in 'a' not in 'b'
+    give just the key field in the remove list; items in 'b' not in 'a'
+    are given in their entirety in the update list.  deepremoveitems()
+    and deepmerge() will handle these, if given the same list_keys.
+
     If the two objects being compared are equal, empty objects of the
     same type are returned.  For example, if two lists are compared and
     found to be equal, two empty lists will be returned - nothing to
     remove from the starting list and nothing to add to it.
 
+    Frozen objects, as returned by deepintern(), can be compared: the
+    objects returned are the mutable versions of their types (but may
+    contain frozen items from 'a' or 'b').  Subtrees which are the same
+    object are not compared further and frozen subtrees with different
+    hashes are known to differ, without comparing them, so objects
+    interned with the same DeepInternTable can be compared very quickly.
+
     Keyword arguments:
 
     a -- the 'from' object
@@ -259,6 +803,162 @@ def deepdiff(a, b, list_as_set=False, change_types=False, filter_func=None):
     particular level is problematic.  For any particular level, if it
     is filtered out, empty objects of the same type will be returned for
     the remove and update values.
+
+    fingerprints -- if this is specified, the objects are compared
+    using digests of their contents, rather than with '==' at each
+    level (which walks the entire subtree, every time): this can either
+    be a DeepFingerprints object (allowing the cached digests to be
+    reused over several calls, as long as the objects are not modified
+    in between) or True, to use a new one for this call only.
+
+    list_edits -- if this is True (and list_as_set is False), lists
+    which differ will give an edit script of the minimal insertions and
+    deletions to transform the list, rather than removing and adding
+    the entire list.
+
+    list_keys -- if this is specified, it is a dictionary mapping paths
+    (as tuples of path items, where the items of a keyed list are given
+    by the value of their key field) to the name of the key field in
+    the items of the list at that path, for lists to be handled as
+    keyed lists.
+
+    policy -- if this is specified, it is a DeepPolicy object, giving
+    options for particular paths, overriding the above arguments (which
+    become the defaults) and allowing paths to be skipped, without
+    calling a filter_func.
+
+    max_changes -- if this is specified, the comparison is stopped as
+    soon as more than this number of changes have been found (counting
+    them as iter_deepdiff() would give them), and the 'truncated'
+    attribute of the result set to True: the items returned are those
+    found up to that point (which are correct, but incomplete).  This
+    is useful to find out if two objects differ by more than a certain
+    amount, without working out the full difference.
+
+    time_budget -- if this is specified, it is the time (in seconds)
+    after which the comparison is stopped, as with max_changes.  The
+    time is only checked as each change or compound object is reached,
+    so comparing a single, very large object (which is not broken down,
+    such as a list, compared with '=='), may overrun it.
     """
 
-    return _deepdiff(a, b, list_as_set, change_types, filter_func)
+    if fingerprints is True:
+        fingerprints = DeepFingerprints()
+
+    state = _policy_state(
+                policy, list_keys, list_as_set=list_as_set,
+                list_edits=list_edits, change_types=change_types)
+
+    budget = None
+
+    if (max_changes is not None) or (time_budget is not None):
+        budget = _DiffBudget(max_changes, time_budget)
+
+    changes = _DiffBuilder(budget)
+
+    remove_items, update_items = _walk(
+        _deepdiff(a, b, state, filter_func, fingerprints, changes))
+
+    return DeepDiffResult(remove_items, update_items, changes.exceeded)
+
+
+
+def iter_deepdiff(a, b, list_as_set=False, change_types=False,
+                  filter_func=None, fingerprints=None, list_edits=False,
+                  list_keys=None, policy=None):
+    """This generator function compares two nested compound objects -
+    'a' and 'b' - in the same way as deepdiff(), but, rather than
+    building and returning the complete remove and update structures,
+    it yields the individual changes needed to transform 'a' into 'b',
+    as they are found.  This allows a large difference to be streamed
+    somewhere, counted, or abandoned part way through, without holding
+    it all in memory.
+
+    Each change is a 3-tuple (op, path, value), where 'path' is a
+    DeepPath object and 'op' is one of:
+
+    "remove" -- the key at 'path' is removed (from a dictionary, or the
+    item with that key value, from a keyed list); 'value' is None.
+
+    "update" -- the key at 'path' is set to 'value' (which may be a new
+    key, a changed simple value, an entire new item in a keyed list, or
+    a list which has changed, when lists are not treated as sets or
+    edited; in this last case, 'path' may be the root).
+
+    "remove_item" -- 'value' is removed from the set (or list, if
+    list_as_set is True) at 'path'; if an item occurs more than once in
+    a list, a change is given for each occurrence.
+
+    "add_item" -- 'value' is added to the set (or list) at 'path'.
+
+    "edit" -- the list at 'path' is changed by the DeepListEdit script
+    in 'value' (only if list_edits is True).
+
+    The changes are given depth-first, in the same order as deepdiff()
+    finds them: at each level, the items removed, then those added,
+    followed by the changes to the items common to both (with the
+    changes within each compound item given before moving on to the
+    next), except in a keyed list, where the items added and changed
+    are given in the order of 'b'.  The depth of the structures is not
+    limited by the recursion limit, but they should not be modified
+    until the iteration is finished.  As with deepdiff(), the values
+    are not copied.
+
+    The arguments and the errors raised are as per deepdiff(), but the
+    errors are only raised when the point they occur is reached.
+    """
+
+    if fingerprints is True:
+        fingerprints = DeepFingerprints()
+
+    state = _policy_state(
+                policy, list_keys, list_as_set=list_as_set,
+                list_edits=list_edits, change_types=change_types)
+
+    yield from _iter_walk(
+        _deepdiff(a, b, state, filter_func, fingerprints,
+                  _DiffEvents("iter_deepdiff")))
+
+
+
+def deepequal(a, b, list_as_set=False, filter_func=None, fingerprints=None,
+              list_keys=None, policy=None):
+    """Compares two nested compound objects - 'a' and 'b' - in the same
+    way as deepdiff(), returning True if there would be no difference
+    between them (i.e. the remove and update items would both be empty)
+    or False, otherwise.
+
+    Unlike deepdiff(), this stops as soon as a difference is found,
+    without working out the rest of the difference (or building any of
+    it), so is much quicker when the objects differ: the objects are
+    equal if the comparison iter_deepdiff() makes gives no changes.
+
+    The arguments are as per deepdiff(), including list_as_set (so
+    lists which only differ in their order are equal), filter_func (so
+    differences in the parts which are filtered out are ignored) and
+    the options in the policy, but simple values of different types,
+    or compound values of different types, are just treated as a
+    difference (there is no 'change_types' option and no TypeError is
+    raised).  'a' and 'b' must be compound types at the top level.
+    """
+
+    if _KINDS[type(a)] is None:
+        raise TypeError("deepequal invalid type for 'from' ('a') object: %s"
+                            % type(a))
+
+    if _KINDS[type(b)] is None:
+        raise TypeError("deepequal invalid type for 'to' ('b') object: %s"
+                            % type(b))
+
+    if fingerprints is True:
+        fingerprints = DeepFingerprints()
+
+    state = _policy_state(policy, list_keys, list_as_set=list_as_set)
+
+    for _ in _iter_walk(
+                 _deepdiff(a, b, state, filter_func, fingerprints,
+                           _DiffEvents("deepequal", strict=False))):
+
+        return False
+
+    return True
@@ -2,18 +2,29 @@
 
 
 
+from .intern import _Frozen
 from .path import DeepPath
+from .types import _CONTAINERS, _KINDS, _thawed_type
+from .walk import _recurse, _walk
 
 
 
-def _deepfilter(a, b, path=DeepPath()):
+def _deepfilter(a, b, memo, path=DeepPath()):
     """Backend function for deeprfilter() that does the actual
     work.  It is defined privately to not offer the 'path' argument.
 
+    This is a generator function, to be run with _walk(): recursive
+    calls are made by yielding the generator for the call.
+
     See deepfilter() for information.
 
     Keyword arguments (in addition to deepfilter()):
 
+    memo -- a dictionary of the results of filtering frozen objects
+    (see deepintern()), keyed on the id() of the objects being filtered
+    and the filter, so a shared subtree which is filtered in the same
+    way, in several places, is only filtered once
+
     path -- a DeepPath() object representing the position in the
     structures for this call.
     """
@@ -24,19 +35,36 @@ def _deepfilter(a, b, path=DeepPath()):
     # against (we'll check for that later), so just abort with an
     # exception
 
-    if not isinstance(b, (list, set, dict)):
+    a_kind = _KINDS[type(a)]
+    b_kind = _KINDS[type(b)]
+
+    if b_kind is None:
         raise TypeError("deepfilter at: %s cannot filter simple type: %s"
                             % (path, type(b)))
 
 
+    # if this is a frozen object, which has already been filtered in
+    # the same way, we just return the same result (the objects are in
+    # the memo, so their IDs can't be reused during the call)
+
+    if isinstance(a, _Frozen):
+        memo_key = id(a), id(b)
+
+        if memo_key in memo:
+            return memo[memo_key][2]
+
+
     # if the object we're filtering from is a list or set...
 
-    if isinstance(a, (list, set)):
+    if a_kind in (list, set):
+        a_items = _CONTAINERS[type(a)].iterate(a)
+        b_contains = _CONTAINERS[type(b)].contains
+
         # ... and the object specifying what to filter is also a list or
         # set, we just include any items that are in the filter set
 
-        if isinstance(b, (list, set)):
-            r = [ item for item in a if item in b ]
+        if b_kind in (list, set):
+            r = [ item for item in a_items if b_contains(b, item) ]
 
 
         # ... or, if the object specifying what to filter is a
@@ -51,8 +79,8 @@ def _deepfilter(a, b, path=DeepPath()):
 
         else:
             r = []
-            for item in a:
-                if item in b:
+            for item in a_items:
+                if b_contains(b, item):
                     if not b[item]:
                         r.append(item)
 
@@ -67,25 +95,31 @@ def _deepfilter(a, b, path=DeepPath()):
         # we did all the work above, building a list (to preserve
         # duplicates and order) - but we actually want an object of the
         # same type as 'a' (which might be a set, or a subclass), so
-        # convert it, if necessary
+        # convert it, if necessary (or the type it's handled as, if it's
+        # read-only)
 
-        r = type(a)(r)
+        r = _thawed_type(a)(r)
 
 
     # if the object we're filtering is a dictionary...
 
-    elif isinstance(a, dict):
-        # return value is object of same type
+    elif a_kind is dict:
+        # return value is object of same type (but if it's frozen, we
+        # need to build it with the mutable version, and convert it
+        # afterwards)
+
+        r = _thawed_type(a)()
 
-        r = type(a)()
+        a_contains = _CONTAINERS[type(a)].contains
+        b_items = _CONTAINERS[type(b)].iterate(b)
 
 
         # ... and the object specifying what to filter is a list or set,
         # we just include the keys in that list or set, if they exist
 
-        if isinstance(b, (list, set)):
-            for item in b:
-                if item in a:
+        if b_kind in (list, set):
+            for item in b_items:
+                if a_contains(a, item):
                     r[item] = a[item]
 
 
@@ -101,15 +135,18 @@ def _deepfilter(a, b, path=DeepPath()):
         # the two dictionaries to include the corresponding items
 
         else:
-            for item in b:
-                if item in a:
-                    if not b[item]:
+            for item, b_value in b_items:
+                if a_contains(a, item):
+                    if not b_value:
                         r[item] = a[item]
                     else:
                         # get the recursive result but only include it
                         # if it's not empty
 
-                        sub_r = _deepfilter(a[item], b[item], path.sub(item))
+                        sub_r = yield from _recurse(
+                                    _deepfilter(a[item], b_value, memo,
+                                                path.sub(item)),
+                                    path)
                         if sub_r:
                             r[item] = sub_r
 
@@ -125,6 +162,13 @@ def _deepfilter(a, b, path=DeepPath()):
                       % (path, type(b), type(a)))
 
 
+    if isinstance(a, _Frozen):
+        if not isinstance(r, _Frozen):
+            r = type(a)(r)
+
+        memo[memo_key] = a, b, r
+
+
     # return the resulting filtered version of 'a'
 
     return r
@@ -165,6 +209,11 @@ def deepfilter(a, b):
     If there are mismatches, violating the above rules, a TypeError()
     or ValueError() exception is raised.
 
+    Frozen objects (see deepintern()) can be filtered, giving frozen
+    objects: a frozen subtree which is shared by several parts of 'a',
+    and filtered in the same way in each, is only filtered once, with
+    the same result used for each.
+
     Keyword arguments:
 
     a -- the object to have items returned from it: this can be a
@@ -177,4 +226,4 @@ def deepfilter(a, b):
     level
     """
 
-    return _deepfilter(a, b)
+    return _walk(_deepfilter(a, b, {}))
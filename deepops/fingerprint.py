@@ -0,0 +1,292 @@
+# deepops.fingerprint
+
+
+
+try:
+    from hashlib import blake2b
+
+except ImportError:
+    # blake2b is only available from Python 3.6, so we fall back to
+    # md5 before that (the digests aren't used for security, so only
+    # their size and spread matter - md5 is slower, but gives a 16
+    # byte digest)
+
+    blake2b = None
+    from hashlib import md5
+
+from .types import _CONTAINERS, _TypeTable
+
+
+
+def _digest_kind(t):
+    """Returns the kind of compound type 't' is, for the purposes of
+    calculating its digest: dict, list or set, for the containers (see
+    register_container()), tuple, for tuples, and set, for frozensets
+    (which compare equal to sets), or None, for a simple type.
+    """
+
+    container = _CONTAINERS[t]
+
+    if container is not None:
+        return container.kind
+
+    if issubclass(t, tuple):
+        return tuple
+
+    if issubclass(t, frozenset):
+        return set
+
+    return None
+
+
+
+# the compound types which we calculate digests for from the digests
+# of their items (rather than directly from their value) and cache,
+# giving the kind of each type (as returned by _digest_kind())
+
+_DIGEST_KINDS = _TypeTable(_digest_kind)
+
+
+# size of the digests (in bytes) - 16 bytes makes the chance of an
+# accidental collision negligible
+
+_DIGEST_SIZE = 16
+
+
+
+def _hash(tag, data):
+    """Returns the digest of some 'data' (a bytes object), prefixed
+    by a single-byte 'tag', identifying the type of data.
+    """
+
+    if blake2b is None:
+        return md5(tag + data).digest()
+
+    return blake2b(tag + data, digest_size=_DIGEST_SIZE).digest()
+
+
+
+def _int_bytes(value):
+    """Returns the decimal representation of an integer (or a boolean or
+    float with an integral value) as bytes.  This is done via str(), as
+    formatting bytes with '%' is only available from Python 3.5.
+    """
+
+    return str(int(value)).encode()
+
+
+
+def _leaf_digest(value):
+    """Returns the digest of a simple (non-compound) value, or None,
+    if the value is not one of the types we know how to encode safely.
+
+    Values which compare equal with '==' (e.g. 1, 1.0 and True) are
+    encoded the same way, so they get the same digest.
+    """
+
+    if value is None:
+        return _hash(b"N", b"")
+
+    if isinstance(value, (bool, int)):
+        return _hash(b"i", _int_bytes(value))
+
+    if isinstance(value, float):
+        # floats with an integral value compare equal to the integer,
+        # so we encode them as one
+
+        if value.is_integer():
+            return _hash(b"i", _int_bytes(value))
+
+        return _hash(b"f", repr(value).encode())
+
+    if isinstance(value, str):
+        return _hash(b"s", value.encode("utf-8", "surrogatepass"))
+
+    if isinstance(value, bytes):
+        return _hash(b"b", value)
+
+
+    # we don't know how to encode this value such that only equal
+    # values will get the same digest, so we can't give one
+
+    return None
+
+
+
+class DeepFingerprints:
+    """This class calculates and caches 'fingerprints' (Merkle-style
+    digests) of compound objects (dictionaries, lists, sets, tuples,
+    frozensets and any registered containers - see
+    register_container()), allowing two objects to be tested for equality in
+    constant time, once their digests have been calculated.
+
+    The digest of a compound object is calculated from the digests of
+    the items within it, so calculating the digest of the top of a
+    structure calculates the digests of everything within it, in a
+    single pass, caching each one.
+
+    Digests are cached by the identity of the object (the cache keeps a
+    reference to each object, so the identity will not be reused): the
+    cache assumes objects are not modified once their digest has been
+    calculated, so, if they are, invalidate() must be called to clear
+    it, which causes all digests to be recalculated as they're needed.
+
+    If an object contains a simple value of a type which cannot be
+    fingerprinted (anything other than None, booleans, integers,
+    floats, strings and bytes), its digest is None, and equal() will
+    fall back to comparing the objects with '=='.
+    """
+
+
+    def __init__(self):
+        # the cache of digests, keyed on the id() of the object, with
+        # the value being a tuple of (object, digest)
+
+        self._cache = {}
+
+
+    def invalidate(self):
+        """Invalidates all cached digests by clearing the cache.  This
+        must be called if any of the objects which have been
+        fingerprinted have been modified.
+        """
+
+        self._cache.clear()
+
+
+    def _item_digest(self, item):
+        """Returns the digest of an item inside a compound object: if
+        it is a compound object itself, its digest must already be in
+        the cache.
+        """
+
+        if _DIGEST_KINDS[type(item)] is not None:
+            return self._cache[id(item)][1]
+
+        return _leaf_digest(item)
+
+
+    def _items(self, obj):
+        """Returns an iterable of the items in compound object 'obj'
+        (the (key, value) pairs, for a dictionary), using the iteration
+        hook for the type, if it has one.
+        """
+
+        container = _CONTAINERS[type(obj)]
+
+        if container is None:
+            return obj
+
+        return container.iterate(obj)
+
+
+    def _combine(self, obj):
+        """Calculates the digest of compound object 'obj', from the
+        digests of the items within it (which must already be cached,
+        if they're compound objects themselves).
+        """
+
+        kind = _DIGEST_KINDS[type(obj)]
+
+        if kind is dict:
+            pairs = []
+            for key, value in self._items(obj):
+                key_digest = _leaf_digest(key)
+                value_digest = self._item_digest(value)
+
+                if (key_digest is None) or (value_digest is None):
+                    return None
+
+                pairs.append(key_digest + value_digest)
+
+            # dictionaries are unordered (for the purposes of
+            # equality) so the pairs are sorted
+
+            return _hash(b"d", b"".join(sorted(pairs)))
+
+
+        digests = []
+        for item in self._items(obj):
+            item_digest = self._item_digest(item)
+
+            if item_digest is None:
+                return None
+
+            digests.append(item_digest)
+
+        if kind is set:
+            # sets and frozensets compare equal, so they're tagged the
+            # same, and are unordered, so the items are sorted
+
+            return _hash(b"S", b"".join(sorted(digests)))
+
+        if kind is list:
+            return _hash(b"L", b"".join(digests))
+
+        return _hash(b"T", b"".join(digests))
+
+
+    def digest(self, obj):
+        """Returns the digest of 'obj', calculating (and caching) it
+        if it isn't already, along with the digests of all the compound
+        objects within it.
+
+        The tree is traversed using an explicit stack, rather than
+        recursively, so arbitrarily deep structures can be handled.
+        """
+
+        if _DIGEST_KINDS[type(obj)] is None:
+            return _leaf_digest(obj)
+
+
+        cache = self._cache
+
+
+        # work through the stack of objects to process - each entry is
+        # the object and a flag indicating whether the items within it
+        # have been processed and it's ready to be combined (this is a
+        # post-order traversal)
+
+        stack = [(obj, False)]
+
+        while stack:
+            node, ready = stack.pop()
+
+            if id(node) in cache:
+                continue
+
+            if ready:
+                cache[id(node)] = node, self._combine(node)
+                continue
+
+            stack.append((node, True))
+
+            items = self._items(node)
+            if _DIGEST_KINDS[type(node)] is dict:
+                items = (value for _, value in items)
+
+            stack.extend(
+                (item, False)
+                    for item in items
+                    if _DIGEST_KINDS[type(item)] is not None)
+
+
+        return cache[id(obj)][1]
+
+
+    def equal(self, a, b):
+        """Returns whether 'a' and 'b' are equal, by comparing their
+        digests.  If either cannot be fingerprinted, they are compared
+        with '=='.
+        """
+
+        if a is b:
+            return True
+
+        a_digest = self.digest(a)
+        b_digest = self.digest(b)
+
+        if (a_digest is None) or (b_digest is None):
+            return a == b
+
+        return a_digest == b_digest
@@ -3,6 +3,7 @@
 
 
 from .path import DeepPath
+from .types import _KINDS
 
 
 
@@ -21,20 +22,15 @@ def deepget(d, *path, default=None, default_error=False):
     """
 
 
-    # path traversed so far (for error message)
-
-    path_so_far = DeepPath()
-
-
     # start at the top of the dictionary and work through it
 
     d_this = d
 
-    for key in path:
+    for depth, key in enumerate(path):
         # if we're not raising exceptions, and we can't index this
         # level of the path, return the default value
 
-        if (not default_error) and (not isinstance(d_this, dict)):
+        if (not default_error) and (_KINDS[type(d_this)] is not dict):
             return default
 
 
@@ -43,8 +39,11 @@ def deepget(d, *path, default=None, default_error=False):
 
         if key not in d_this:
             if default_error:
+                # the path traversed so far is only built if we need it
+                # for the error message
+
                 raise KeyError("deepget at: %s key not found: %s"
-                                   % (path_so_far, key))
+                                   % (DeepPath(path[:depth]), key))
 
             return default
 
@@ -52,9 +51,137 @@ def deepget(d, *path, default=None, default_error=False):
         # move down to the next level in the path
 
         d_this = d_this[key]
-        path_so_far.append(key)
 
 
     # return the object at the end of the path
 
     return d_this
+
+
+
+class _GetNode:
+    """A node in the trie of paths in a DeepGetPaths object."""
+
+    __slots__ = ("path", "children", "indices")
+
+
+    def __init__(self, path):
+        # the path to this node (as a tuple of keys)
+        self.path = path
+
+        # the child nodes, keyed on the next key in the path
+        self.children = {}
+
+        # the indices of the paths ending at this node
+        self.indices = []
+
+
+
+class DeepGetPaths:
+    """This class holds a 'compiled' set of paths to retrieve from
+    nested data structures of dictionaries, in a single pass, with
+    get().  It can be reused to retrieve the same paths from many
+    structures.
+
+    The paths are arranged into a trie, so that common prefixes are
+    only traversed once.
+    """
+
+
+    def __init__(self, paths):
+        """Compiles the iterable of 'paths', each of which is a
+        sequence of keys, as would be given to deepget().
+        """
+
+        self._root = _GetNode(())
+        self._count = 0
+
+        for path in paths:
+            node = self._root
+
+            for key in path:
+                child = node.children.get(key)
+
+                if child is None:
+                    child = _GetNode(node.path + (key,))
+                    node.children[key] = child
+
+                node = child
+
+            node.indices.append(self._count)
+            self._count += 1
+
+
+    def __len__(self):
+        return self._count
+
+
+    def get(self, d, default=None, default_error=False):
+        """Retrieves the values at all the paths from the nested data
+        structure 'd', returning them as a list, in the same order as
+        the paths were given.
+
+        The 'default' and 'default_error' arguments behave as per
+        deepget(), for each path.
+        """
+
+        results = [default] * self._count
+
+
+        # work through the trie, using an explicit stack, with each
+        # entry being a node in the trie and the corresponding object
+        # in 'd' for that node
+
+        stack = [(self._root, d)]
+
+        while stack:
+            node, d_this = stack.pop()
+
+            for index in node.indices:
+                results[index] = d_this
+
+
+            # if we're not raising exceptions, and we can't index this
+            # level of the path, all the paths below here will get the
+            # default value
+
+            if (not default_error) and (_KINDS[type(d_this)] is not dict):
+                continue
+
+
+            for key, child in node.children.items():
+                # if the key can't be found, we either raise an
+                # exception, or leave the default value, depending on
+                # default_error
+
+                if key not in d_this:
+                    if default_error:
+                        raise KeyError("deepget at: %s key not found: %s"
+                                           % (DeepPath(node.path), key))
+
+                    continue
+
+                stack.append((child, d_this[key]))
+
+
+        return results
+
+
+
+def deepget_many(d, paths, default=None, default_error=False):
+    """This function retrieves the values at several paths from a
+    nested data structure of dictionaries, returning them as a list, in
+    the same order as the paths.  Each path is a sequence of keys, as
+    would be given to deepget().
+
+    This is equivalent to calling deepget() for each path but walks
+    any common prefixes of the paths only once.  If the same paths are
+    to be retrieved from many structures, a DeepGetPaths object should
+    be created and reused, instead, to avoid compiling the paths each
+    time.
+
+    The 'default' and 'default_error' arguments behave as per
+    deepget(), for each path.
+    """
+
+    return DeepGetPaths(paths).get(d, default, default_error)
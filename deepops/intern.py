@@ -0,0 +1,402 @@
+# deepops.intern
+
+
+
+from .path import DeepPath
+from .types import _CONTAINERS, _KINDS, _thawed_type, register_container
+from .walk import _recurse, _walk
+
+
+
+class _Frozen:
+    """Mixin class for the frozen (immutable) versions of the compound
+    types, below, as created by deepintern().
+
+    Each is a subclass of the corresponding mutable type, so it can be
+    used by anything which accepts that type (including the other
+    functions in this module), but any attempt to modify it raises a
+    TypeError.  Its hash is calculated from its contents, when first
+    needed, and cached.
+
+    Copying a frozen object returns the object itself, as it can never
+    change (and neither can the frozen objects inside it).
+    """
+
+    __slots__ = ()
+
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("'%s' object is immutable" % type(self).__name__)
+
+
+    def __copy__(self):
+        return self
+
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+    def __reduce__(self):
+        return type(self), (self._thawed(self),)
+
+
+
+class FrozenDict(_Frozen, dict):
+    """Frozen dictionary, as created by deepintern()."""
+
+    __slots__ = ("_hash",)
+
+    _thawed = dict
+
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self._hash = None
+
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self.items()))
+
+        return self._hash
+
+
+    __setitem__ = __delitem__ = __ior__ = _Frozen._immutable
+    clear = pop = popitem = setdefault = update = _Frozen._immutable
+
+
+
+class FrozenList(_Frozen, list):
+    """Frozen list, as created by deepintern()."""
+
+    __slots__ = ("_hash",)
+
+    _thawed = list
+
+
+    def __init__(self, *args):
+        list.__init__(self, *args)
+        self._hash = None
+
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(tuple(self))
+
+        return self._hash
+
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _Frozen._immutable
+    append = clear = extend = insert = pop = _Frozen._immutable
+    remove = reverse = sort = _Frozen._immutable
+
+
+
+class FrozenSet(_Frozen, set):
+    """Frozen set, as created by deepintern()."""
+
+    __slots__ = ("_hash",)
+
+    _thawed = set
+
+
+    def __init__(self, *args):
+        set.__init__(self, *args)
+        self._hash = None
+
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self))
+
+        return self._hash
+
+
+    __ior__ = __iand__ = __isub__ = __ixor__ = _Frozen._immutable
+    add = clear = discard = pop = remove = update = _Frozen._immutable
+    difference_update = intersection_update = _Frozen._immutable
+    symmetric_difference_update = _Frozen._immutable
+
+
+
+# the frozen types are handled as read-only containers
+
+register_container(FrozenDict, dict, readonly=True)
+register_container(FrozenList, list, readonly=True)
+register_container(FrozenSet, set, readonly=True)
+
+
+
+def _known_equal(a, b):
+    """Returns whether 'a' and 'b' are equal, if this can be determined
+    without comparing their contents (True, if they're the same object;
+    False, if they're both frozen and their hashes differ), or None, if
+    it can't.
+    """
+
+    if a is b:
+        return True
+
+    if isinstance(a, _Frozen) and isinstance(b, _Frozen):
+        if hash(a) != hash(b):
+            return False
+
+    return None
+
+
+
+def _leaf_key(value):
+    """Returns the key for a simple value in the intern table.  This
+    includes the type of the value, as well as the value, as values of
+    different types can compare equal (e.g. 1, 1.0 and True), but
+    interning them as the same would change them.
+    """
+
+    if isinstance(value, float):
+        # 0.0 and -0.0 compare equal, but aren't the same
+
+        return type(value), value.hex()
+
+    if isinstance(value, tuple):
+        return type(value), tuple(_leaf_key(item) for item in value)
+
+    if isinstance(value, frozenset):
+        return type(value), frozenset(_leaf_key(item) for item in value)
+
+    return type(value), value
+
+
+
+class DeepInternTable:
+    """This class holds a table of interned (frozen) compound objects,
+    as created by deepintern(), so that identical objects are only
+    stored once: interning an object which is identical to one already
+    in the table returns the existing object.
+
+    Objects are only identical if they contain the same items, of the
+    same types, in the same order (for lists and dictionaries): equal
+    objects which differ in this way (e.g. 1 and True) are kept
+    separate.
+
+    The table keeps a reference to all of the objects in it, so the
+    same table can be used to intern many objects (e.g. a large number
+    of documents with common parts) but the objects will never be
+    freed, unless clear() is called.
+    """
+
+
+    def __init__(self):
+        # the interned objects, keyed on a tuple of the type of the
+        # object and the keys of the items in it: interned items are
+        # identified by their id(), as they are unique (and the table
+        # keeps them alive); simple values by their _leaf_key()
+
+        self._table = {}
+
+
+    def __len__(self):
+        return len(self._table)
+
+
+    def clear(self):
+        """Removes all the objects from the table."""
+
+        self._table.clear()
+
+
+    def _item_key(self, item):
+        if isinstance(item, _Frozen):
+            return id(item)
+
+        return _leaf_key(item)
+
+
+    def _intern(self, frozen_type, items, key, path):
+        """Returns the interned object of 'frozen_type', given the
+        'items' to construct it from and the 'key' identifying it,
+        creating it, if it's not already in the table.
+        """
+
+        try:
+            obj = self._table.get(key)
+
+        except TypeError:
+            raise TypeError("deepintern at: %s cannot intern object "
+                            "containing unhashable simple value" % path)
+
+        if obj is None:
+            obj = frozen_type(items)
+            self._table[key] = obj
+
+        return obj
+
+
+    def _deepintern(self, obj, path=DeepPath()):
+        """Backend function for deepintern() that does the actual work.
+
+        This is a generator function, to be run with _walk(): recursive
+        calls are made by yielding the generator for the call.
+        """
+
+        # objects which are already frozen must have been interned (in
+        # this table, or another one) so we just use them
+
+        if isinstance(obj, _Frozen):
+            return obj
+
+
+        kind = _KINDS[type(obj)]
+
+        if kind is dict:
+            items = []
+            key = [FrozenDict]
+
+            for k, v in _CONTAINERS[type(obj)].iterate(obj):
+                if _KINDS[type(v)] is not None:
+                    v = yield from _recurse(
+                            self._deepintern(v, path.sub(k)), path)
+
+                items.append((k, v))
+                key.extend((_leaf_key(k), self._item_key(v)))
+
+            return self._intern(FrozenDict, items, tuple(key), path)
+
+
+        if kind in (list, set):
+            items = []
+
+            for i, v in enumerate(_CONTAINERS[type(obj)].iterate(obj)):
+                if _KINDS[type(v)] is not None:
+                    # items in sets can't be mutable types, so this is
+                    # a list (or a hashable type registered as a
+                    # container, such as a frozenset)
+
+                    v = yield from _recurse(
+                            self._deepintern(v, path.sub(i)), path)
+
+                items.append(v)
+
+            if kind is list:
+                return self._intern(
+                           FrozenList, items,
+                           (FrozenList,) + tuple(map(self._item_key, items)),
+                           path)
+
+            return self._intern(
+                       FrozenSet, items,
+                       (FrozenSet, frozenset(map(self._item_key, items))),
+                       path)
+
+
+        raise TypeError("deepintern at: %s cannot intern simple type: %s"
+                            % (path, type(obj)))
+
+
+    def intern(self, obj):
+        """Returns the interned version of nested compound object 'obj'
+        - see deepintern().
+        """
+
+        return _walk(self._deepintern(obj))
+
+
+
+def deepintern(obj, table=None):
+    """Converts a nested compound object - 'obj' - into a frozen
+    (immutable) version of it, where identical subtrees (from anywhere
+    within the object, or other objects interned with the same table)
+    share a single object.  This is known as 'hash-consing'.  The
+    object must be a compound type (a list, set or dictionary) at the
+    top level, and is not modified.
+
+    The dictionaries, lists and sets are converted to FrozenDict,
+    FrozenList and FrozenSet objects, respectively.  These are
+    subclasses of the mutable types, so can be used with the other
+    functions in this module (except those that would modify them,
+    such as deepmerge()), but they are hashable, with their hash cached
+    once calculated.  The simple values inside them are not copied and
+    must be hashable.
+
+    This has a number of advantages, where the same subtrees are
+    repeated many times (for example, common blocks of settings in a
+    large number of configuration documents):
+
+    The memory required is reduced, as each distinct subtree is only
+    stored once.
+
+    Identical subtrees are the same object, so they can be compared
+    with 'is' - deepdiff() and iter_deepdiff() do this, and also check
+    the hashes of frozen objects, so subtrees which differ can be
+    identified without comparing their contents, in most cases.
+
+    deepfilter() only filters each shared subtree once, if it's filtered
+    in the same way.
+
+    The frozen objects can be converted back to mutable ones with
+    deepthaw().
+
+    Keyword arguments:
+
+    obj -- the object to intern
+
+    table -- if this is specified, it is a DeepInternTable object, to
+    share the interned objects between calls (otherwise, objects are
+    only shared within 'obj')
+    """
+
+    if table is None:
+        table = DeepInternTable()
+
+    return table.intern(obj)
+
+
+
+def _deepthaw(obj):
+    """Backend function for deepthaw() that does the actual work.
+
+    This is a generator function, to be run with _walk(): recursive
+    calls are made by yielding the generator for the call.
+    """
+
+    container = _CONTAINERS[type(obj)]
+
+    if container.kind is dict:
+        thawed = {}
+
+        for k, v in container.iterate(obj):
+            if _KINDS[type(v)] is not None:
+                v = yield _deepthaw(v)
+
+            thawed[k] = v
+
+        return _thawed_type(obj)(thawed)
+
+
+    items = []
+
+    for v in container.iterate(obj):
+        if _KINDS[type(v)] is not None:
+            v = yield _deepthaw(v)
+
+        items.append(v)
+
+    return _thawed_type(obj)(items)
+
+
+
+def deepthaw(obj):
+    """Converts a frozen object, as returned by deepintern(), back into
+    a mutable one, returning a new object, with each of the frozen
+    dictionaries, lists and sets replaced by a new, mutable one (and
+    any other compound objects copied).  The simple values inside them
+    are not copied.
+
+    The object must be a compound type (a list, set or dictionary) at
+    the top level.
+    """
+
+    if _KINDS[type(obj)] is None:
+        raise TypeError("deepthaw cannot thaw simple type: %s" % type(obj))
+
+    return _walk(_deepthaw(obj))
@@ -0,0 +1,996 @@
+# deepops.jsonpatch
+
+
+
+from copy import deepcopy
+import re
+
+from .diff import deepdiff
+from .listdiff import DeepListEdit
+from .merge import deepmerge
+from .removeitems import deepremoveitems
+from .types import _CONTAINERS, _KINDS, _thawed_type
+from .walk import _walk
+
+
+
+# a valid array index in a JSON Pointer: only ASCII digits, with no
+# leading zeros (str.isdigit() also accepts other Unicode digits)
+
+_LIST_INDEX_RE = re.compile(r"0|[1-9][0-9]*")
+
+
+
+def _escape(token):
+    """Escapes a key for use in a JSON Pointer (RFC 6901)."""
+
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+
+def _unescape(token):
+    """Reverses _escape()."""
+
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+
+def _json_kind(value):
+    """Returns the type of JSON container 'value' is converted to: dict,
+    for the types handled as dictionaries, or list, for those handled
+    as lists or sets (see register_container()), and for tuples and
+    frozensets (which are simple values elsewhere, but can only be
+    arrays, in JSON), or None, for a simple value.
+    """
+
+    kind = _KINDS[type(value)]
+
+    if kind is None:
+        return list if isinstance(value, (tuple, frozenset)) else None
+
+    return dict if kind is dict else list
+
+
+
+def _json_value(value):
+    """Converts a value to the types available in JSON, returning a new
+    object: sets and tuples become lists, and dictionaries and lists
+    (including subclasses and other registered containers) plain ones.
+    Simple values are not changed.
+
+    This is a generator function, to be run with _walk().
+    """
+
+    container = _CONTAINERS[type(value)]
+
+    if (container is not None) and (container.kind is dict):
+        items = {}
+
+        for k, v in container.iterate(value):
+            if _json_kind(v) is not None:
+                v = yield _json_value(v)
+
+            items[k] = v
+
+        return items
+
+    items = []
+
+    for v in (value if container is None else container.iterate(value)):
+        if _json_kind(v) is not None:
+            v = yield _json_value(v)
+
+        items.append(v)
+
+    return items
+
+
+
+def _to_json(value):
+    """Returns 'value' converted with _json_value(), if it's compound."""
+
+    if _json_kind(value) is not None:
+        return _walk(_json_value(value))
+
+    return value
+
+
+
+def _json_type(value):
+    """Returns the JSON type of 'value', for comparing values in a 'test'
+    operation: dict or list, as _json_kind(), float, for any number
+    (JSON does not distinguish integers), bool, or the type of any other
+    simple value.
+    """
+
+    if isinstance(value, bool):
+        return bool
+
+    if isinstance(value, (int, float)):
+        return float
+
+    return _json_kind(value) or type(value)
+
+
+
+def _json_items(value):
+    """Returns an iterator over the items in the JSON container 'value':
+    (key, value) pairs, for a dictionary, or the items of a list.
+    """
+
+    container = _CONTAINERS[type(value)]
+
+    return iter(value) if container is None else container.iterate(value)
+
+
+
+def _json_equal(a, b):
+    """Returns whether 'a' and 'b' are equal as JSON values (RFC 6902,
+    section 4.6): they must be of the same JSON type, so, unlike with
+    '==', true is not equal to 1 (but 1 is equal to 1.0), and
+    dictionaries and lists are compared item by item.
+
+    This is a generator function, to be run with _walk().
+    """
+
+    kind = _json_type(a)
+
+    if _json_type(b) is not kind:
+        return False
+
+    if kind is dict:
+        if len(a) != len(b):
+            return False
+
+        for k, v in _json_items(a):
+            if (k not in b) or not (yield _json_equal(v, b[k])):
+                return False
+
+        return True
+
+    if kind is list:
+        a_items = list(_json_items(a))
+        b_items = list(_json_items(b))
+
+        if len(a_items) != len(b_items):
+            return False
+
+        for a_item, b_item in zip(a_items, b_items):
+            if not (yield _json_equal(a_item, b_item)):
+                return False
+
+        return True
+
+    return a == b
+
+
+
+def _new_value(a_value, remove_value, update_value, list_as_set):
+    """Returns the new value of a list or set 'a_value', after removing
+    'remove_value' and merging 'update_value' into it (either of which
+    may be None, if there is none), as deepremoveitems() and deepmerge()
+    would.  'a_value' is not modified.
+    """
+
+    value = _thawed_type(a_value)(a_value)
+
+    if remove_value:
+        deepremoveitems(value, remove_value)
+
+    if update_value:
+        deepmerge(value, update_value, list_as_set=list_as_set,
+                  change_types=True)
+
+    return value
+
+
+
+def _jsonpatch_ops(a, remove_items, update_items, list_as_set, ops,
+                   pointer=""):
+
+    """Backend function for deepdiff_to_jsonpatch(), which appends the
+    operations to change the dictionary 'a' at 'pointer' to the list
+    'ops'.
+
+    This is a generator function, to be run with _walk(): recursive
+    calls are made by yielding the generator for the call.
+    """
+
+    # if the removal is a list or set of keys, we handle it as a
+    # dictionary of entire items to remove
+
+    if _KINDS[type(remove_items)] is not dict:
+        remove_items = { k: None for k in remove_items }
+
+
+    for k in list(remove_items) + [ k for k in update_items
+                                         if k not in remove_items ]:
+
+        if k not in a:
+            # the item doesn't exist, so can only be added
+
+            if k in update_items:
+                ops.append({ "op": "add",
+                             "path": pointer + "/" + _escape(k),
+                             "value": _to_json(update_items[k]) })
+
+            continue
+
+
+        item_pointer = pointer + "/" + _escape(k)
+
+        remove_value = remove_items.get(k)
+        update_value = update_items.get(k)
+        a_value = a[k]
+
+
+        if (k in remove_items) and not remove_value:
+            # the entire item is removed, and perhaps replaced
+
+            if k in update_items:
+                ops.append({ "op": "replace", "path": item_pointer,
+                             "value": _to_json(update_value) })
+
+            else:
+                ops.append({ "op": "remove", "path": item_pointer })
+
+
+        elif ((_KINDS[type(a_value)] is dict)
+              and (_KINDS[type(update_items.get(k, {}))] is dict)):
+
+            yield _jsonpatch_ops(
+                      a_value, remove_value or {}, update_items.get(k, {}),
+                      list_as_set, ops, item_pointer)
+
+
+        elif (isinstance(update_value, DeepListEdit)
+              and not remove_value):
+
+            # an edit script maps directly onto operations on the
+            # indices of the list, as the operations are in descending
+            # order of index (so each can be applied in turn)
+
+            for op, index, value in update_value:
+                if op == "delete":
+                    ops.extend({ "op": "remove",
+                                 "path": item_pointer + "/" + str(index) }
+                                   for _ in range(value))
+
+                else:
+                    ops.extend({ "op": "add",
+                                 "path": item_pointer + "/" + str(index + i),
+                                 "value": _to_json(v) }
+                                   for i, v in enumerate(value))
+
+
+        elif ((_KINDS[type(a_value)] in (list, set))
+              and (_KINDS[type(update_items.get(k, []))] in (list, set))):
+
+            # we can't change the items in a list or set individually
+            # (without indices), so we replace it with the new value
+
+            ops.append({ "op": "replace", "path": item_pointer,
+                         "value": _to_json(_new_value(
+                                      a_value, remove_value, update_value,
+                                      list_as_set)) })
+
+
+        elif k in update_items:
+            # a simple value is replaced (as is a compound one, if
+            # deepdiff() gave a simple value for it, with change_types)
+
+            ops.append({ "op": "replace", "path": item_pointer,
+                         "value": _to_json(update_value) })
+
+
+
+def deepdiff_to_jsonpatch(a, remove_items, update_items, list_as_set=False):
+    """Converts the changes to be made to a nested object - 'a' - given
+    as a (remove_items, update_items) tuple (as returned by deepdiff()
+    and applied with deepremoveitems() followed by deepmerge()) into a
+    JSON Patch (RFC 6902): a list of operations, each a dictionary with
+    'op', 'path' and (where required) 'value' fields, which gives the
+    same result, when applied with apply_jsonpatch() (or by another
+    implementation of JSON Patch).
+
+    The original object, 'a', is needed as JSON Patch must distinguish
+    between adding and replacing items, and changes to lists and sets
+    need to be converted into new values (or indices), but it is not
+    modified.  Only 'a' must be a dictionary, at the top level.
+
+    Dictionaries are changed item by item.  Lists and sets are replaced
+    entirely, with their new value, unless the update is a DeepListEdit
+    script (as returned by deepdiff() with list_edits), which is turned
+    into 'remove' and 'add' operations on the indices of the list.
+    Keyed lists are not supported.
+
+    The values in the operations are converted to JSON types (sets and
+    tuples become lists) and are new objects, so they don't share
+    anything with 'a' or the changes.  The keys are converted into
+    strings, in the paths, so the patch will only apply to the JSON
+    version of 'a', if there are any non-string keys.
+
+    Keyword arguments:
+
+    a -- the object the changes are to be made to
+
+    remove_items, update_items -- the changes to convert
+
+    list_as_set -- this specifies whether the lists will be merged as
+    sets by deepmerge() (it should be the same as given to deepdiff())
+    """
+
+    if _KINDS[type(a)] is not dict:
+        raise TypeError("deepdiff_to_jsonpatch can only convert changes to "
+                        "a dictionary, not: %s" % type(a))
+
+    ops = []
+
+    _walk(_jsonpatch_ops(a, remove_items, update_items, list_as_set, ops))
+
+    return ops
+
+
+
+def _replace_type_changes(a, remove_items, update_items):
+    """Changes the (remove_items, update_items) tuple for the dictionary
+    'a', as returned by deepdiff() with change_types, so any items
+    changed from a simple value to a compound one, or vice-versa, are
+    removed entirely, before they're updated: deepdiff() just gives the
+    new value for them, which deepmerge() would refuse to merge.
+    'remove_items' is modified in place.
+
+    This is a generator function, to be run with _walk(): recursive
+    calls are made by yielding the generator for the call.
+    """
+
+    for k, update_value in update_items.items():
+        if (k not in a) or ((k in remove_items) and not remove_items[k]):
+            # the item is added, or already replaced entirely
+            continue
+
+        a_value = a[k]
+
+        if ((_KINDS[type(a_value)] is None)
+                != (_KINDS[type(update_value)] is None)):
+
+            remove_items[k] = None
+
+        elif ((_KINDS[type(a_value)] is dict)
+              and (_KINDS[type(update_value)] is dict)):
+            remove_subitems = remove_items.get(k, {})
+
+            yield _replace_type_changes(a_value, remove_subitems,
+                                        update_value)
+
+            if remove_subitems:
+                remove_items[k] = remove_subitems
+
+
+
+def jsonpatch_to_deepdiff(a, patch, list_as_set=False, list_edits=False):
+    """Converts a JSON Patch (RFC 6902) - a list of operations - which
+    applies to nested object 'a', into a (remove_items, update_items)
+    tuple, as returned by deepdiff(), which has the same effect, when
+    applied with deepremoveitems() followed by deepmerge().
+
+    This is done by applying the patch to 'a' with copy-on-write (see
+    apply_jsonpatch(), so 'a' is not modified and only the parts
+    changed are copied) and comparing the result with deepdiff(), with
+    change_types (as JSON Patch can change the type of a value).  As
+    the unchanged parts of the patched object are shared with 'a', they
+    are not compared further.
+
+    Changes which deepdiff() cannot represent (such as changing a list
+    into a dictionary) will raise a TypeError.  Items changed between a
+    simple value and a compound one are removed entirely and replaced
+    (deepmerge() cannot merge one into the other).
+
+    The 'list_as_set' and 'list_edits' arguments are passed to
+    deepdiff().
+    """
+
+    diff = deepdiff(a, apply_jsonpatch(a, patch, copy=True),
+                    list_as_set=list_as_set, change_types=True,
+                    list_edits=list_edits)
+
+    _walk(_replace_type_changes(a, *diff))
+
+    return diff
+
+
+
+def _mergepatch_replace(old, new, key):
+    """Returns the merge patch value to change an item from 'old' to
+    'new' (where 'old' is the existing value, or None, if there is
+    none): if 'new' is a dictionary, it's merged with 'old' (or an empty
+    object, if 'old' isn't one), so the items in 'old' which are not in
+    'new' must be removed, recursively.  'key' is the key of the item,
+    for error messages.
+
+    This is a generator function, to be run with _walk().
+    """
+
+    if _KINDS[type(new)] is dict:
+        if _KINDS[type(old)] is not dict:
+            old = {}
+
+        patch = { k: None for k in old if k not in new }
+
+        for k, v in _CONTAINERS[type(new)].iterate(new):
+            patch[k] = yield _mergepatch_replace(
+                                 old[k] if k in old else None, v, k)
+
+        return patch
+
+
+    # a merge patch uses null to remove an item, so it can't set an
+    # item to None
+
+    if new is None:
+        raise ValueError("deepdiff_to_mergepatch cannot set item: %s to "
+                         "None" % key)
+
+    return _to_json(new)
+
+
+
+def _mergepatch(a, remove_items, update_items, list_as_set):
+    """Backend function for deepdiff_to_mergepatch(), which returns the
+    merge patch to change the dictionary 'a'.
+
+    This is a generator function, to be run with _walk(): recursive
+    calls are made by yielding the generator for the call.
+    """
+
+    if _KINDS[type(remove_items)] is not dict:
+        remove_items = { k: None for k in remove_items }
+
+    patch = {}
+
+    for k in list(remove_items) + [ k for k in update_items
+                                         if k not in remove_items ]:
+
+        remove_value = remove_items.get(k)
+        update_value = update_items.get(k)
+
+
+        if (k not in a) or ((k in remove_items) and not remove_value):
+            # the item is added, removed entirely, or replaced
+
+            if k in update_items:
+                patch[k] = yield _mergepatch_replace(
+                                     a[k] if k in a else None, update_value,
+                                     k)
+
+            elif k in a:
+                patch[k] = None
+
+
+        elif ((_KINDS[type(a[k])] is dict)
+              and (_KINDS[type(update_items.get(k, {}))] is dict)):
+
+            sub_patch = yield _mergepatch(
+                                  a[k], remove_value or {},
+                                  update_items.get(k, {}), list_as_set)
+
+            if sub_patch:
+                patch[k] = sub_patch
+
+
+        elif ((_KINDS[type(a[k])] in (list, set))
+              and (_KINDS[type(update_items.get(k, []))] in (list, set))):
+
+            # arrays are replaced entirely
+
+            patch[k] = _to_json(_new_value(a[k], remove_value, update_value,
+                                           list_as_set))
+
+
+        elif k in update_items:
+            patch[k] = yield _mergepatch_replace(a[k], update_value, k)
+
+
+    return patch
+
+
+
+def deepdiff_to_mergepatch(a, remove_items, update_items, list_as_set=False):
+    """Converts the changes to be made to a nested object - 'a' - given
+    as a (remove_items, update_items) tuple (as returned by deepdiff())
+    into a JSON Merge Patch (RFC 7386): a dictionary containing the
+    items to change, with any items to be removed set to None (null,
+    in JSON), and dictionaries for the items to be merged recursively.
+
+    As for deepdiff_to_jsonpatch(), 'a' (which must be a dictionary) is
+    needed, but not modified, and the values in the patch are converted
+    to JSON types, as new objects.  Lists and sets are replaced with
+    their new values, in their entirety, as there is no way to change
+    their items in a merge patch.  Keyed lists are not supported.
+
+    A merge patch cannot set an item to None (as this is used to remove
+    items), so a ValueError is raised, if that is needed.
+
+    The 'list_as_set' argument is as per deepdiff_to_jsonpatch().
+    """
+
+    if _KINDS[type(a)] is not dict:
+        raise TypeError("deepdiff_to_mergepatch can only convert changes "
+                        "to a dictionary, not: %s" % type(a))
+
+    return _walk(_mergepatch(a, remove_items, update_items, list_as_set))
+
+
+
+def _mergepatch_value(patch):
+    """Returns the value that a merge patch gives, when applied to
+    something which is not an object: an object value is applied to an
+    empty object, so any nulls within it are removed.
+
+    This is a generator function, to be run with _walk().
+    """
+
+    value = {}
+
+    for k, v in _CONTAINERS[type(patch)].iterate(patch):
+        if _KINDS[type(v)] is dict:
+            v = yield _mergepatch_value(v)
+
+        if v is not None:
+            value[k] = v
+
+    return value
+
+
+
+def _mergepatch_diff(a, patch):
+    """Backend function for mergepatch_to_deepdiff(), which returns the
+    (remove_items, update_items) tuple for the merge patch of the
+    dictionary 'a'.
+
+    This is a generator function, to be run with _walk(): recursive
+    calls are made by yielding the generator for the call.
+    """
+
+    remove_items = {}
+    update_items = {}
+
+    for k, value in _CONTAINERS[type(patch)].iterate(patch):
+        if value is None:
+            if k in a:
+                remove_items[k] = None
+
+        elif _KINDS[type(value)] is dict:
+            if (k in a) and (_KINDS[type(a[k])] is dict):
+                remove_subitems, update_subitems = (
+                    yield _mergepatch_diff(a[k], value))
+
+                if remove_subitems:
+                    remove_items[k] = remove_subitems
+
+                if update_subitems:
+                    update_items[k] = update_subitems
+
+            else:
+                if k in a:
+                    remove_items[k] = None
+
+                update_items[k] = yield _mergepatch_value(value)
+
+        else:
+            # a compound item must be removed to be replaced (or it
+            # would be merged), as must a simple one being replaced by
+            # a compound one (which deepmerge() can't merge), but a
+            # simple one can just be updated with another
+
+            if (k in a) and ((_KINDS[type(a[k])] is not None)
+                             or (_KINDS[type(value)] is not None)):
+
+                remove_items[k] = None
+
+            update_items[k] = value
+
+    return remove_items, update_items
+
+
+
+def mergepatch_to_deepdiff(a, patch):
+    """Converts a JSON Merge Patch (RFC 7386) - 'patch' - which applies
+    to the dictionary 'a', into a (remove_items, update_items) tuple, as
+    returned by deepdiff(), which has the same effect, when applied
+    with deepremoveitems() followed by deepmerge() (with change_types,
+    as a merge patch can change the type of a value).
+
+    'a' is needed to know which items exist (and whether the objects in
+    the patch will be merged with an existing object or replace the
+    item), but is not modified.  The values in the result are taken
+    from the patch, without copying them.
+    """
+
+    if _KINDS[type(a)] is not dict:
+        raise TypeError("mergepatch_to_deepdiff can only convert a patch "
+                        "to a dictionary, not: %s" % type(a))
+
+    if _KINDS[type(patch)] is not dict:
+        raise TypeError("mergepatch_to_deepdiff patch must be an object "
+                        "(dictionary), not: %s" % type(patch))
+
+    return _walk(_mergepatch_diff(a, patch))
+
+
+
+def _copy_value(value):
+    """Returns a deep copy of 'value', if it's compound (simple values
+    don't need copying).
+    """
+
+    if _KINDS[type(value)] is not None:
+        return deepcopy(value)
+
+    return value
+
+
+
+class _PatchTarget:
+    """This class holds the state of a document while a JSON Patch is
+    applied to it, by apply_jsonpatch().
+
+    The containers at each path which has been resolved are cached,
+    keyed on their JSON Pointer, so a run of operations on the same
+    container (or different containers with the same parent) only
+    resolves it once, rather than walking from the root of the document
+    for every operation.  When an operation changes an item, any cached
+    paths through it are discarded (along with all those through a
+    list, if the indices of the items in it are shifted).
+
+    In copy-on-write mode, the containers along each path are copied,
+    the first time they're resolved, so the original document is not
+    modified.
+    """
+
+
+    def __init__(self, doc, copy):
+        self.copy = copy
+
+        # the IDs of the containers we've created (and so can modify,
+        # in copy-on-write mode)
+
+        self._owned = set()
+
+        self._set_doc(doc)
+
+
+    def _set_doc(self, doc):
+        if self.copy and (_KINDS[type(doc)] in (list, dict)):
+            doc = self._own(doc)
+
+        self.doc = doc
+
+        # the cache of containers, keyed on their pointer, and the
+        # pointers of the children of each in the cache
+
+        self._cache = { "": doc }
+        self._children = { "": set() }
+
+
+    def _own(self, obj):
+        obj = _thawed_type(obj)(obj)
+        self._owned.add(id(obj))
+        return obj
+
+
+    def _discard(self, pointer, value):
+        """Removes 'pointer' and all those below it from the cache, if
+        its old 'value' was a container (as only those are cached).
+        """
+
+        if _KINDS[type(value)] not in (list, dict):
+            return
+
+        stack = [pointer]
+
+        while stack:
+            pointer = stack.pop()
+
+            if self._cache.pop(pointer, None) is not None:
+                stack.extend(self._children.pop(pointer))
+
+
+    def _discard_children(self, pointer):
+        """Removes all the pointers below 'pointer' from the cache."""
+
+        children = self._children[pointer]
+
+        if children:
+            for child in children:
+                self._discard(child, self._cache.get(child))
+
+            self._children[pointer] = set()
+
+
+    def _split(self, pointer, index):
+        """Splits 'pointer' into the pointer to the parent container
+        and the (unescaped) key of the item within it.
+        """
+
+        if not pointer.startswith("/"):
+            raise ValueError("apply_jsonpatch operation %d invalid path: %s"
+                                 % (index, pointer))
+
+        parent_pointer, _, key = pointer.rpartition("/")
+
+        if "~" in key:
+            key = _unescape(key)
+
+        return parent_pointer, key
+
+
+    def resolve(self, pointer, index):
+        """Returns the container at 'pointer', using the cache, where
+        possible.  'index' is the index of the operation in the patch,
+        for error messages.
+        """
+
+        container = self._cache.get(pointer)
+
+        if container is not None:
+            return container
+
+
+        # resolve the parent of the container (recursively), then find
+        # the container within that
+
+        parent_pointer, key = self._split(pointer, index)
+
+        parent = self.resolve(parent_pointer, index)
+
+        if _KINDS[type(parent)] is list:
+            key = self._list_index(parent, key, pointer, index, False)
+
+        container = self._get_child(parent, key, pointer, index)
+
+        if _KINDS[type(container)] not in (list, dict):
+            raise TypeError("apply_jsonpatch operation %d at: %s cannot "
+                            "access item in non-container type: %s"
+                                % (index, pointer, type(container)))
+
+        if self.copy and (id(container) not in self._owned):
+            container = self._own(container)
+            parent[key] = container
+
+        self._cache[pointer] = container
+        self._children[pointer] = set()
+        self._children[parent_pointer].add(pointer)
+
+        return container
+
+
+    def _list_index(self, container, key, pointer, index, end):
+        """Returns the list index given by 'key' ('end' specifies
+        whether the index after the last item is valid, or '-' for it).
+        """
+
+        if key == "-" and end:
+            return len(container)
+
+        if not _LIST_INDEX_RE.fullmatch(key):
+
+            raise ValueError("apply_jsonpatch operation %d at: %s invalid "
+                             "list index: %s" % (index, pointer, key))
+
+        i = int(key)
+
+        if i > len(container) - (0 if end else 1):
+            raise ValueError("apply_jsonpatch operation %d at: %s list index "
+                             "out of range: %d" % (index, pointer, i))
+
+        return i
+
+
+    def _get_child(self, container, key, pointer, index):
+        """Returns the item with 'key' in 'container' (for a list, this
+        must already be converted to an index).
+        """
+
+        kind = _KINDS[type(container)]
+
+        if kind is dict:
+            if key not in container:
+                raise ValueError("apply_jsonpatch operation %d at: %s item "
+                                 "does not exist" % (index, pointer))
+
+            return container[key]
+
+        if kind is list:
+            return container[key]
+
+        raise TypeError("apply_jsonpatch operation %d at: %s cannot access "
+                        "item in non-container type: %s"
+                            % (index, pointer, type(container)))
+
+
+    def _locate(self, pointer, index, end=False):
+        """Returns the container holding the item at 'pointer' and the
+        key of the item within it (converted to an index, for a list,
+        where 'end' is as per _list_index()), along with the pointer of
+        the container.
+        """
+
+        parent_pointer, key = self._split(pointer, index)
+
+        container = self.resolve(parent_pointer, index)
+
+        if _KINDS[type(container)] is list:
+            key = self._list_index(container, key, pointer, index, end)
+
+        return container, key, parent_pointer
+
+
+    def get(self, pointer, index):
+        """Returns the value at 'pointer'."""
+
+        if not pointer:
+            return self.doc
+
+        container, key, _ = self._locate(pointer, index)
+
+        return self._get_child(container, key, pointer, index)
+
+
+    def add(self, pointer, value, index):
+        """Adds 'value' at 'pointer' (replacing an existing dictionary
+        item, or inserting into a list).
+        """
+
+        if not pointer:
+            self._set_doc(value)
+            return
+
+        container, key, parent_pointer = self._locate(pointer, index, True)
+
+        kind = _KINDS[type(container)]
+
+        if kind is dict:
+            self._discard(pointer,
+                          container[key] if key in container else None)
+            container[key] = value
+
+        elif kind is list:
+            container.insert(key, value)
+            self._discard_children(parent_pointer)
+
+        else:
+            self._get_child(container, key, pointer, index)
+
+
+    def remove(self, pointer, index):
+        """Removes the item at 'pointer', returning its value."""
+
+        if not pointer:
+            raise ValueError("apply_jsonpatch operation %d cannot remove "
+                             "the entire document" % index)
+
+        container, key, parent_pointer = self._locate(pointer, index)
+
+        value = self._get_child(container, key, pointer, index)
+
+        del container[key]
+
+        if _KINDS[type(container)] is dict:
+            self._discard(pointer, value)
+        else:
+            self._discard_children(parent_pointer)
+
+        return value
+
+
+    def replace(self, pointer, value, index):
+        """Replaces the item at 'pointer' with 'value'."""
+
+        if not pointer:
+            self._set_doc(value)
+            return
+
+        container, key, _ = self._locate(pointer, index)
+
+        # this checks the item exists
+
+        self._discard(pointer, self._get_child(container, key, pointer,
+                                               index))
+
+        container[key] = value
+
+
+
+def apply_jsonpatch(doc, patch, copy=False):
+    """Applies a JSON Patch (RFC 6902) - 'patch', a list of operations,
+    each a dictionary with 'op', 'path' and other fields, depending on
+    the operation - to a nested object, 'doc', returning the patched
+    object.  All the operations are supported: add, remove, replace,
+    move, copy and test.
+
+    If 'copy' is False, 'doc' is modified in place (and returned, unless
+    the entire document is replaced).  If an operation fails, any
+    earlier operations will already have been applied.
+
+    If 'copy' is True, 'doc' is not modified: the dictionaries and
+    lists along the path of each change are copied, the first time
+    they're changed, and the rest of the returned object is shared with
+    'doc' (so it should be copied, if it's to be modified).  This also
+    allows frozen objects (see deepintern()) to be patched.
+
+    The values in the operations are copied, when they are added to the
+    document, so the patch is not modified, even if later operations
+    change items within them.
+
+    The operations are applied in order, but the containers which
+    have been looked up are cached (keyed on their path), and only
+    discarded when the item holding them is changed, so a series of
+    operations on items in the same container (as typically found in a
+    long patch) only looks it up once, rather than walking from the
+    root of the document for each operation.
+
+    If an operation is invalid, or a path does not exist, a ValueError
+    is raised; a TypeError is raised if a path tries to look up an item
+    within a simple value.
+    """
+
+    target = _PatchTarget(doc, copy)
+
+    for index, operation in enumerate(patch):
+        try:
+            op = operation["op"]
+            path = operation["path"]
+
+        except KeyError as e:
+            raise ValueError("apply_jsonpatch operation %d missing field: %s"
+                                 % (index, e.args[0]))
+
+
+        if op in ("add", "replace", "test"):
+            if "value" not in operation:
+                raise ValueError("apply_jsonpatch operation %d missing "
+                                 "field: value" % index)
+
+            value = operation["value"]
+
+        elif op in ("move", "copy"):
+            if "from" not in operation:
+                raise ValueError("apply_jsonpatch operation %d missing "
+                                 "field: from" % index)
+
+            from_path = operation["from"]
+
+
+        if op == "add":
+            target.add(path, _copy_value(value), index)
+
+        elif op == "remove":
+            target.remove(path, index)
+
+        elif op == "replace":
+            target.replace(path, _copy_value(value), index)
+
+        elif op == "move":
+            if path.startswith(from_path + "/"):
+                raise ValueError("apply_jsonpatch operation %d cannot move "
+                                 "item: %s into itself" % (index, from_path))
+
+            if path != from_path:
+                target.add(path, target.remove(from_path, index), index)
+
+        elif op == "copy":
+            target.add(path, _copy_value(target.get(from_path, index)),
+                       index)
+
+        elif op == "test":
+            if not _walk(_json_equal(target.get(path, index), value)):
+                raise ValueError("apply_jsonpatch operation %d at: %s test "
+                                 "failed" % (index, path))
+
+        else:
+            raise ValueError("apply_jsonpatch operation %d unknown "
+                             "operation: %s" % (index, op))
+
+
+    return target.doc
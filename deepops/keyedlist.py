@@ -0,0 +1,49 @@
+# deepops.keyedlist
+
+
+
+from .types import _KINDS
+
+
+
+def _index_keyed_list(l, key, path, op_name):
+    """Indexes the items in the keyed list 'l', returning a dictionary
+    mapping the value of the key field 'key' in each item to the item
+    itself.
+
+    Each item must be a dictionary containing the key field (a
+    TypeError or ValueError is raised, if not) and the key values must
+    be unique (a ValueError is raised, if not).
+
+    Keyword arguments:
+
+    l -- the list to index
+
+    key -- the name of the key field in each item
+
+    path -- the DeepPath of the list, used in exception messages
+
+    op_name -- the name of the calling function, used in exception
+    messages
+    """
+
+    index = {}
+
+    for item in l:
+        if _KINDS[type(item)] is not dict:
+            raise TypeError("%s at: %s keyed list item is not a dictionary: "
+                            "%s" % (op_name, path, type(item)))
+
+        if key not in item:
+            raise ValueError("%s at: %s keyed list item missing key field: "
+                             "%s" % (op_name, path, repr(key)))
+
+        if item[key] in index:
+            raise ValueError("%s at: %s keyed list has duplicate key: %s"
+                                 % (op_name, path.sub(item[key]),
+                                    repr(key)))
+
+        index[item[key]] = item
+
+    return index
+
@@ -0,0 +1,441 @@
+# deepops.listdiff
+
+
+
+class DeepListEdit(list):
+    """This class represents an 'edit script' to transform one list
+    into another, as returned by listdiff().  It is a list of
+    operations, each of which is a tuple of (operation, index, value):
+
+    ("delete", index, count) -- delete 'count' items, starting at
+    'index'
+
+    ("insert", index, items) -- insert the list of 'items' at 'index'
+
+    The operations are in descending order of index and the indices
+    refer to the list being transformed, before any of the operations
+    have been applied: because they are in descending order, they can
+    be applied one at a time, in order, without the indices of the
+    later operations being affected.  Where a delete and an insert
+    happen at the same index, the delete comes first.
+
+    It is a separate type (rather than a plain list) so that deepmerge()
+    can recognise one and apply it, instead of merging it as a list.
+    """
+
+
+    def __repr__(self):
+        return "%s(%s)" % (type(self).__name__, list.__repr__(self))
+
+
+
+def _bisect(a, a_lo, a_hi, b, b_lo, b_hi):
+    """Finds the 'middle snake' of the shortest edit path between the
+    slices a[a_lo:a_hi] and b[b_lo:b_hi], using Myers' algorithm,
+    searching forwards from the start and backwards from the end,
+    simultaneously, in linear space.
+
+    Returns a point (x, y) - indices into 'a' and 'b' - on the shortest
+    path, at which the problem can be split into two smaller ones, or
+    None, if no split point could be found (in which case, there are no
+    items in common).
+
+    The slices must not share a common prefix or suffix (these should
+    be removed before calling this).
+    """
+
+    n = a_hi - a_lo
+    m = b_hi - b_lo
+
+    max_d = (n + m + 1) // 2
+    v_offset = max_d
+    v_length = 2 * max_d + 2
+
+    # the furthest reaching x position on each diagonal 'k' (offset by
+    # 'v_offset', so it can be stored in a list), forwards and
+    # backwards (backwards x positions count from the end)
+
+    v_fwd = [-1] * v_length
+    v_fwd[v_offset + 1] = 0
+    v_rev = [-1] * v_length
+    v_rev[v_offset + 1] = 0
+
+    delta = n - m
+
+    # if the difference in length is odd, the forward path will overlap
+    # the reverse path; if it's even, the reverse path will overlap the
+    # forward
+
+    front = (delta % 2 != 0)
+
+    # these track the diagonals which have gone off the edge of the
+    # grid, so they can be excluded from later rounds
+
+    k1_start = k1_end = k2_start = k2_end = 0
+
+
+    for d in range(max_d):
+        # advance the forward path
+
+        for k1 in range(-d + k1_start, d + 1 - k1_end, 2):
+            k1_offset = v_offset + k1
+
+            if (k1 == -d) or ((k1 != d)
+                              and (v_fwd[k1_offset - 1]
+                                       < v_fwd[k1_offset + 1])):
+                x1 = v_fwd[k1_offset + 1]
+            else:
+                x1 = v_fwd[k1_offset - 1] + 1
+
+            y1 = x1 - k1
+
+            while (x1 < n) and (y1 < m) and (a[a_lo + x1] == b[b_lo + y1]):
+                x1 += 1
+                y1 += 1
+
+            v_fwd[k1_offset] = x1
+
+            if x1 > n:
+                k1_end += 2
+
+            elif y1 > m:
+                k1_start += 2
+
+            elif front:
+                k2_offset = v_offset + delta - k1
+                if (0 <= k2_offset < v_length) and (v_rev[k2_offset] != -1):
+                    if x1 >= n - v_rev[k2_offset]:
+                        return a_lo + x1, b_lo + y1
+
+
+        # advance the reverse path
+
+        for k2 in range(-d + k2_start, d + 1 - k2_end, 2):
+            k2_offset = v_offset + k2
+
+            if (k2 == -d) or ((k2 != d)
+                              and (v_rev[k2_offset - 1]
+                                       < v_rev[k2_offset + 1])):
+                x2 = v_rev[k2_offset + 1]
+            else:
+                x2 = v_rev[k2_offset - 1] + 1
+
+            y2 = x2 - k2
+
+            while ((x2 < n) and (y2 < m)
+                   and (a[a_hi - 1 - x2] == b[b_hi - 1 - y2])):
+                x2 += 1
+                y2 += 1
+
+            v_rev[k2_offset] = x2
+
+            if x2 > n:
+                k2_end += 2
+
+            elif y2 > m:
+                k2_start += 2
+
+            elif not front:
+                k1_offset = v_offset + delta - k2
+                if (0 <= k1_offset < v_length) and (v_fwd[k1_offset] != -1):
+                    x1 = v_fwd[k1_offset]
+                    y1 = v_offset + x1 - k1_offset
+
+                    if x1 >= n - x2:
+                        return a_lo + x1, b_lo + y1
+
+
+    # no overlap was found, so there is nothing in common
+
+    return None
+
+
+
+def _matches(a, b):
+    """Returns a list of the blocks of items which are common to lists
+    'a' and 'b', as tuples of (a_index, b_index, length), in ascending
+    order, forming the longest common subsequence of the two lists.
+
+    The lists are split up with _bisect(), working through the parts
+    using an explicit stack, rather than recursion.
+    """
+
+    matches = []
+
+
+    # each entry on the stack is a region of the two lists to compare,
+    # given as (a_lo, a_hi, b_lo, b_hi)
+
+    stack = [(0, len(a), 0, len(b))]
+
+    while stack:
+        a_lo, a_hi, b_lo, b_hi = stack.pop()
+
+
+        # skip over any common prefix and suffix, recording them as
+        # matches - this makes the common case of items being added or
+        # removed at the end (or start) of a long list very quick
+
+        prefix = 0
+        while ((a_lo + prefix < a_hi) and (b_lo + prefix < b_hi)
+               and (a[a_lo + prefix] == b[b_lo + prefix])):
+            prefix += 1
+
+        if prefix:
+            matches.append((a_lo, b_lo, prefix))
+            a_lo += prefix
+            b_lo += prefix
+
+        suffix = 0
+        while ((a_lo < a_hi - suffix) and (b_lo < b_hi - suffix)
+               and (a[a_hi - 1 - suffix] == b[b_hi - 1 - suffix])):
+            suffix += 1
+
+        if suffix:
+            matches.append((a_hi - suffix, b_hi - suffix, suffix))
+            a_hi -= suffix
+            b_hi -= suffix
+
+
+        # if either region is now empty, the rest is just insertions or
+        # deletions, so there are no more matches to find
+
+        if (a_lo == a_hi) or (b_lo == b_hi):
+            continue
+
+
+        # find the point to split the regions at and process each half
+
+        split = _bisect(a, a_lo, a_hi, b, b_lo, b_hi)
+
+        if split is not None:
+            x, y = split
+            stack.append((x, a_hi, y, b_hi))
+            stack.append((a_lo, x, b_lo, y))
+
+
+    matches.sort()
+
+    return matches
+
+
+
+def _edit_script(gaps):
+    """Returns the DeepListEdit script for the list of 'gaps', each
+    (index, delete_count, insert_items), in ascending order of index,
+    giving the items to be deleted from the original list at 'index'
+    and the items to be inserted in their place.
+    """
+
+    # build the edit script in descending order of index, so the
+    # operations can be applied one by one, with any delete coming
+    # before an insert at the same index
+
+    edit = DeepListEdit()
+
+    for index, delete_count, insert_items in reversed(gaps):
+        if delete_count:
+            edit.append(("delete", index, delete_count))
+
+        if insert_items:
+            edit.append(("insert", index, list(insert_items)))
+
+    return edit
+
+
+
+def listdiff(a, b):
+    """Compares two lists, 'a' and 'b', returning a DeepListEdit edit
+    script with the minimal set of deletions and insertions required
+    to transform 'a' into 'b'.  Items are compared with '=='.
+
+    The edit script is calculated using Myers' O(ND) algorithm, in
+    linear space, where 'D' is the size of the edit script: lists which
+    are mostly the same (e.g. a long list which has had a few items
+    appended to it) are compared quickly and give a small edit script.
+
+    The returned script can be applied to 'a' with listpatch() (or
+    merged with deepmerge()).  The inserted items are not copied, so
+    will be the same objects as in 'b'.
+    """
+
+    # work through the gaps between the common blocks, recording the
+    # items in 'a' to be deleted and the items from 'b' to be inserted,
+    # as (index, delete_count, insert_items) - we add a dummy block at
+    # the end to catch any trailing differences
+
+    gaps = []
+
+    a_pos = b_pos = 0
+
+    for a_index, b_index, length in _matches(a, b) + [(len(a), len(b), 0)]:
+        if (a_index > a_pos) or (b_index > b_pos):
+            gaps.append((a_pos, a_index - a_pos, b[b_pos:b_index]))
+
+        a_pos = a_index + length
+        b_pos = b_index + length
+
+
+    return _edit_script(gaps)
+
+
+
+def listpatch(a, edit):
+    """Applies a DeepListEdit 'edit' script (as returned by listdiff())
+    to the list 'a', modifying it in place.
+
+    Rather than applying each operation in turn (which would shift the
+    items after it in the list each time), the new list is built in a
+    single pass and the contents of 'a' replaced with it.
+    """
+
+    result = []
+    pos = 0
+
+
+    # work through the operations in ascending order of index,
+    # copying across the unchanged items between them
+
+    for op, index, value in reversed(edit):
+        if (index < pos) or (index > len(a)):
+            raise ValueError("listpatch operation at invalid index: %d"
+                                 % index)
+
+        result.extend(a[pos:index])
+        pos = index
+
+        if op == "delete":
+            pos += value
+
+            if pos > len(a):
+                raise ValueError("listpatch delete beyond end of list at: "
+                                     "%d" % index)
+
+        elif op == "insert":
+            result.extend(value)
+
+        else:
+            raise ValueError("listpatch unknown operation: %s" % op)
+
+
+    result.extend(a[pos:])
+
+    a[:] = result
+
+
+
+def _compose_edits(edit1, edit2):
+    """Returns a single DeepListEdit script with the same effect as
+    applying the script 'edit1' to a list, followed by 'edit2', without
+    needing the list itself (as its length is not known, the items
+    beyond those the scripts refer to are just left alone).
+
+    The list after 'edit1' is represented as a list of segments: the
+    items kept from the original list, as a (start, end) range of
+    indices (with the last range having no end, as it runs to the end
+    of the list), and the items inserted, as a list.  'edit2' is then
+    applied to the segments, in the same way as listpatch() applies it
+    to a list, and the resulting segments converted back to a script.
+    A ValueError is raised if 'edit2' is not valid after 'edit1'.
+    """
+
+    segments = []
+    pos = 0
+
+    for op, index, value in reversed(edit1):
+        if index < pos:
+            raise ValueError("listpatch operation at invalid index: %d"
+                                 % index)
+
+        if index > pos:
+            segments.append((pos, index))
+
+        pos = index
+
+        if op == "delete":
+            pos += value
+
+        elif value:
+            segments.append(list(value))
+
+    segments.append((pos, None))
+
+
+    # the segments are kept in reverse order, so the next one can be
+    # taken from the end
+
+    segments.reverse()
+    result = []
+
+    def advance(count, keep):
+        # moves past the next 'count' items, adding them to the result,
+        # if 'keep' is True, splitting the segment containing the last
+        # one, if necessary
+
+        while count:
+            segment = segments.pop()
+
+            if isinstance(segment, tuple):
+                start, end = segment
+                n = count if end is None else min(count, end - start)
+
+                if keep:
+                    result.append((start, start + n))
+
+                if (end is None) or (start + n < end):
+                    segments.append((start + n, end))
+
+            else:
+                n = min(count, len(segment))
+
+                if keep:
+                    result.append(segment[:n])
+
+                if n < len(segment):
+                    segments.append(segment[n:])
+
+            count -= n
+
+    pos = 0
+
+    for op, index, value in reversed(edit2):
+        if index < pos:
+            raise ValueError("listpatch operation at invalid index: %d"
+                                 % index)
+
+        advance(index - pos, True)
+        pos = index
+
+        if op == "delete":
+            advance(value, False)
+            pos += value
+
+        elif value:
+            result.append(list(value))
+
+    result.extend(reversed(segments))
+
+
+    # work through the resulting segments, recording the gaps between
+    # the ranges of the original list which are kept, and the items
+    # inserted in them, as listdiff() does (the last segment is always
+    # the range running to the end of the list)
+
+    gaps = []
+    pos = 0
+    insert_items = []
+
+    for segment in result:
+        if isinstance(segment, tuple):
+            start, end = segment
+
+            if (start > pos) or insert_items:
+                gaps.append((pos, start - pos, insert_items))
+                insert_items = []
+
+            pos = end
+
+        else:
+            insert_items.extend(segment)
+
+    return _edit_script(gaps)
@@ -0,0 +1,161 @@
+# deepops.listset
+
+
+
+from .types import _CONTAINERS
+
+
+
+# markers used to tag the canonical (hashable) forms of unhashable
+# compound items, so that they can never compare equal to a genuine,
+# hashable item which happens to have the same structure (e.g. a tuple
+# which looks like a canonicalised list)
+
+_LIST = object()
+_DICT = object()
+_TUPLE = object()
+
+
+
+def _canonical(item):
+    """Returns a hashable, canonical form of 'item', which compares
+    equal to the canonical form of another item if, and only if, the
+    two items compare equal with '=='.
+
+    Hashable items are returned as they are.  Unhashable lists, tuples
+    (containing unhashable items), dictionaries and sets are converted
+    recursively into tuples and frozensets, tagged with a private
+    marker.
+
+    A TypeError is raised if 'item' (or something inside it) is
+    unhashable and cannot be canonicalised.
+    """
+
+    try:
+        hash(item)
+        return item
+
+    except TypeError:
+        pass
+
+
+    # tuples preserve order, so we canonicalise their items, in order,
+    # into a tuple (they're simple values, not containers - see
+    # register_container() - but can still contain unhashable items)
+
+    if isinstance(item, tuple):
+        return (_TUPLE, tuple(_canonical(i) for i in item))
+
+    container = _CONTAINERS[type(item)]
+
+    if container is not None:
+        # sets compare equal to frozensets with the same members, so
+        # we don't tag them: their members are already hashable
+
+        if container.kind is set:
+            return frozenset(container.iterate(item))
+
+
+        # lists preserve order, like tuples
+
+        if container.kind is list:
+            return (_LIST,
+                    tuple(_canonical(i) for i in container.iterate(item)))
+
+
+        # dictionaries do not preserve order (in terms of equality), so
+        # the key/value pairs are stored in a frozenset (the keys
+        # themselves must already be hashable)
+
+        return (_DICT, frozenset((k, _canonical(v))
+                                     for k, v in container.iterate(item)))
+
+
+    raise TypeError("cannot canonicalise unhashable type: %s" % type(item))
+
+
+
+def _difference(a, b):
+    """Returns a list of the items in 'a' which are not in 'b',
+    preserving the order of 'a' and any duplicates in it.
+
+    This gives the same result as '[ i for i in a if i not in b ]' but
+    runs in linear time, rather than quadratic, by hashing the items in
+    'b' (canonicalising any unhashable items, such as dictionaries or
+    lists in lists).  If any item cannot be canonicalised, the simple
+    quadratic version is used, instead.
+    """
+
+    # there's nothing to gain from hashing if either list is empty
+
+    if not (a and b):
+        return list(a)
+
+
+    try:
+        # try hashing the items as they are, first: this avoids the
+        # cost of calling _canonical() on each item, in the common
+        # case that everything is hashable
+
+        try:
+            b_keys = set(b)
+            return [ i for i in a if i not in b_keys ]
+
+        except TypeError:
+            pass
+
+
+        b_keys = { _canonical(i) for i in b }
+        return [ i for i in a if _canonical(i) not in b_keys ]
+
+    except (TypeError, RuntimeError):
+        return [ i for i in a if i not in b ]
+
+
+
+def _multiset_difference(a, b):
+    """Returns a list of the items in 'a', in order, with one occurrence
+    removed for each item in 'b' (the first one, if there are several),
+    as would be left by calling a.remove(i) for each item in 'b' (which
+    is in 'a'), but in linear time, by hashing the items, as for
+    _difference().
+    """
+
+    if not (a and b):
+        return list(a)
+
+
+    def without(key):
+        # count the occurrences of each item to remove and then skip
+        # that many of each, from the start of 'a'
+
+        counts = {}
+        for i in b:
+            k = key(i)
+            counts[k] = counts.get(k, 0) + 1
+
+        result = []
+        for i in a:
+            k = key(i)
+            if counts.get(k):
+                counts[k] -= 1
+            else:
+                result.append(i)
+
+        return result
+
+
+    try:
+        try:
+            return without(lambda i: i)
+
+        except TypeError:
+            return without(_canonical)
+
+    except (TypeError, RuntimeError):
+        result = list(a)
+        for i in b:
+            if i in result:
+                result.remove(i)
+
+        return result
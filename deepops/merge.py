@@ -2,145 +2,383 @@
 
 
 
+import sys
+from collections import namedtuple
+
+from .keyedlist import _index_keyed_list
+from .listdiff import DeepListEdit, listpatch
+from .listset import _difference
 from .path import DeepPath
+from .policy import _policy_state
+from .types import _CONTAINERS, _KINDS, _check_writable, _mutable_copy
+from .undo import _UndoLog
+from .walk import _recurse, _walk
+
+
+
+# marker for a key which is not (yet) present in the dictionary being
+# merged into
+
+_MISSING = object()
+
+
+
+# the actions returned by _merge_action()
+
+_MERGE = "merge"
+_SET = "set"
+_KEEP = "keep"
+_SKIP = "skip"
+
+
+
+def _merge_action(a_value, b_value, state, filter_func, path, item, opname):
+    """Returns what is to be done to merge the value 'b_value' into
+    'item' in the dictionary at 'path', which currently has the value
+    'a_value' (or _MISSING, if it's not present), following the rules
+    described in deepmerge(), with 'state' being the state of the
+    DeepPolicy for the item.  This is one of:
+
+    _MERGE -- both values are compound types, so they're merged
+    recursively (the filter_func isn't called, as the recursive call
+    will do that)
+
+    _SET -- the item is set to 'b_value' (it's not present, or is a
+    simple value, being replaced)
+
+    _KEEP -- the item is a simple value, which is not replaced (as the
+    'replace' option is off)
+
+    _SKIP -- the filter_func returned False for the item
+
+    A TypeError is raised, if the values can't be merged, with the
+    operation being given as 'opname'.
+    """
+
+    if a_value is _MISSING:
+        if filter_func:
+            if not filter_func(path.sub(item), None, b_value):
+                return _SKIP
+
+        return _SET
+
+
+    a_compound = _KINDS[type(a_value)] is not None
+    b_compound = _KINDS[type(b_value)] is not None
+
+    if a_compound and b_compound:
+        return _MERGE
+
+
+    # this isn't a recursive call but we still might want to filter it
+
+    if filter_func:
+        if not filter_func(path.sub(item), a_value, b_value):
+            return _SKIP
+
+
+    # one of the items is a compound type, but not the other, so we
+    # can't change the type
+    #
+    # (we could technically, but that would be inconsistent with the
+    # behaviour at the root)
+
+    if a_compound or b_compound:
+        raise TypeError("%s at: %s cannot merge compound and non-compound "
+                        "types: %s and: %s"
+                            % (opname, path.sub(item), type(a_value),
+                               type(b_value)))
+
 
+    # the items are both non-compound types, so we can just replace it,
+    # as long as the types match, or we can change_types
 
+    if (type(a_value) != type(b_value)) and (not state.change_types):
+        raise TypeError("%s at: %s can't compare or change types: %s and: "
+                        "%s" % (opname, path.sub(item), type(a_value),
+                                type(b_value)))
 
-def _deepmerge(a, b, replace, list_as_set, change_types, filter_func,
-               path=DeepPath()):
+    return _SET if state.replace else _KEEP
 
-    """Backend function for deepmerge() that does the actual work.  It
-    is defined privately to not offer the 'path' argument.
+
+
+class _MergeChanges:
+    """This class is the 'changes' object for _deepmerge(), when it's
+    run for deepmerge(): each change is made to the object being merged
+    into, after being recorded in the _UndoLog 'undo', if there is one,
+    and conflicts (where the objects can't be merged) raise the
+    exception for them.
+    """
+
+
+    def __init__(self, undo=None):
+        self.undo = undo
+
+
+    def conflict(self, path, error):
+        """Handles the exception 'error', for a conflict at 'path',
+        which stops the merge: here, it's just raised.
+        """
+
+        raise error
+
+
+    def edit_list(self, a, script):
+        if self.undo:
+            self.undo.replace_list(a)
+
+        listpatch(a, script)
+
+
+    def extend_list(self, a, items):
+        if self.undo:
+            self.undo.extend_list(a)
+
+        a.extend(items)
+
+
+    def append_item(self, a, item):
+        if self.undo:
+            self.undo.extend_list(a)
+
+        a.append(item)
+
+
+    def update_set(self, a, items):
+        if self.undo:
+            self.undo.add_set_items(a, items)
+
+        a.update(items)
+
+
+    def set_item(self, a, item, value):
+        if self.undo:
+            self.undo.set_item(a, item)
+
+        a[item] = value
+
+
+    def keep_item(self, a, item, value):
+        pass
+
+
+
+def _deepmerge(a, b, state, filter_func, copy, changes, path=DeepPath()):
+    """Backend function for deepmerge() and deepmerge_plan() that does
+    the actual work.  It is defined privately to not offer the 'path'
+    argument.
+
+    This is a generator function, to be run with _walk(): recursive
+    calls are made by yielding the generator for the call.
 
     See deepmerge() for information.
 
     Keyword arguments (in addition to deepmerge()):
 
+    state -- the state of the DeepPolicy for this path, giving the
+    options to use (this replaces the 'policy' argument and the other
+    options, such as replace)
+
+    changes -- the object which makes the changes to 'a' (apart from
+    storing the merged copies of items, when 'copy' is True) and
+    handles conflicts: a _MergeChanges object, which makes them (and
+    raises the exception for a conflict) or a _MergePlanner, which just
+    records them (and the conflicts, after which the item is skipped)
+
     path -- a DeepPath() object representing the position in the
     structures for this call.
+
+    The merged object is returned: this is 'a' unless 'copy' is True,
+    in which case it's a (shallow) copy of 'a', and the caller must
+    store it in place of 'a'.
     """
 
 
-    # if a filter function was supplied call it and return without
-    # doing anything, if it returns False
+    # if the policy says to skip this path, or a filter function was
+    # supplied call it, return without doing anything, if it returns
+    # False
+
+    if state.skip:
+        return a
 
     if filter_func:
         if not filter_func(path, a, b):
-            return
+            return a
+
+
+    # if we're not modifying 'a' in place, we copy it, before changing
+    # it - the items inside it are not copied, unless they are also
+    # changed (by the recursive calls below), so any parts of 'a' not
+    # touched by 'b' are shared with the copy
+    #
+    # if we are modifying it in place, it must not be read-only (see
+    # register_container())
+
+    if copy:
+        a = _mutable_copy(a)
+
+    else:
+        try:
+            _check_writable(a, path, "deepmerge")
+
+        except TypeError as e:
+            changes.conflict(path, e)
+            return a
+
+    a_kind = _KINDS[type(a)]
+    b_kind = _KINDS[type(b)]
+
+
+    # if the item being merged is an edit script for a list (from
+    # deepdiff() with list_edits enabled), we apply it
+
+    if isinstance(b, DeepListEdit):
+        if a_kind is not list:
+            changes.conflict(
+                path,
+                TypeError("deepmerge at: %s cannot apply list edit to type: "
+                          "%s" % (path, type(a))))
+
+            return a
+
+        changes.edit_list(a, b)
 
 
     # if the items being merged are both lists, what we do depends on
     # the list_as_set option...
 
-    if isinstance(a, list) and isinstance(b, list):
-        if list_as_set:
+    elif (a_kind is list) and (b_kind is list):
+        key = state.list_key
+
+        if key is not None:
+            # this is a keyed list of dictionaries, so we merge each
+            # item in 'b' into the item in 'a' with the same value for
+            # the key field, or append it, if there isn't one
+
+            try:
+                a_index = _index_keyed_list(a, key, path, "deepmerge")
+                b_index = _index_keyed_list(b, key, path, "deepmerge")
+
+            except (TypeError, ValueError) as e:
+                changes.conflict(path, e)
+                return a
+
+            # if we're copying, the merged items will be new objects,
+            # so we need to know where each item is, to replace it
+
+            if copy:
+                a_position = { id(a_item): i for i, a_item in enumerate(a) }
+
+            for k, b_item in b_index.items():
+                if k in a_index:
+                    merged = yield from _recurse(
+                                 _deepmerge(a_index[k], b_item, state.sub(k),
+                                            filter_func, copy, changes,
+                                            path.sub(k)),
+                                 path)
+
+                    if merged is not a_index[k]:
+                        a[a_position[id(a_index[k])]] = merged
+
+                else:
+                    changes.append_item(a, b_item)
+
+        elif state.list_as_set:
             # it's enabled, so we treat the list 'a' as a set and only
             # add items from 'b' to it if they don't exist already
+            #
+            # (the missing items are found by hashing, rather than
+            # searching 'a' for each one, which would be quadratic)
 
-            a.extend([ i for i in b if i not in a ])
+            changes.extend_list(a, _difference(b, a))
 
         else:
             # it's disabled, so we just append the corresponding list
             # in 'b' to 'a' (potentially adding duplicates)
 
-            a.extend(b)
+            changes.extend_list(a, b)
 
 
     # if the items being merged are both sets, we just add the missing
     # items in 'b'
 
-    elif isinstance(a, set) and isinstance(b, set):
-        a.update(b)
+    elif (a_kind is set) and (b_kind is set):
+        changes.update_set(a, b)
 
 
     # if the items being merged are both dictionaries, we work through
     # the items in 'b' to see if they're present in 'a'...
 
-    elif isinstance(a, dict) and isinstance(b, dict):
+    elif (a_kind is dict) and (b_kind is dict):
         for item in b:
-            if item in a:
-                # the item is present - what we do now depends on the
-                # type of the objects...
+            sub_state = state.sub(item)
 
-                if (isinstance(a[item], (list, set, dict))
-                    and (isinstance(b[item], (list, set, dict)))):
+            if sub_state.skip:
+                continue
 
-                    # the item is a compound type (list, set or
-                    # dictionary) - recursively merge them
-                    #
-                    # we don't need to check if they're the same as the
-                    # recursive call will do that
+            b_value = b[item]
 
-                    _deepmerge(a[item], b[item], replace, list_as_set,
-                               change_types, filter_func, path.sub(item))
+            try:
+                action = _merge_action(
+                             a[item] if item in a else _MISSING, b_value,
+                             sub_state, filter_func, path, item, "deepmerge")
 
-                else:
-                    # this isn't a recursive call but we still might
-                    # want to filter it
+            except TypeError as e:
+                changes.conflict(path.sub(item), e)
+                continue
 
-                    if filter_func:
-                       if not filter_func(path.sub(item), a[item], b[item]):
-                           return
 
+            # the item is a compound type (list, set or dictionary) in
+            # both - recursively merge them
+            #
+            # we don't need to check if they're the same as the
+            # recursive call will do that
 
-                    if (isinstance(a[item], (list, set, dict))
-                      or (isinstance(b[item], (list, set, dict)))):
+            if action is _MERGE:
+                merged = yield from _recurse(
+                             _deepmerge(a[item], b_value, sub_state,
+                                        filter_func, copy, changes,
+                                        path.sub(item)),
+                             path)
 
-                        # one of the items is a compound type, but not
-                        # the other, so we can't change the type
-                        #
-                        # (we could technically, but that would be
-                        # inconsistent with the behaviour at the root)
+                if merged is not a[item]:
+                    a[item] = merged
 
-                        raise TypeError(
-                                "deepmerge at: %s cannot merge compound and "
-                                "non-compound types: %s and: %s"
-                                    % (path.sub(item), type(a[item]),
-                                        type(b[item])))
 
-                    else:
-                        # the corresponding items in 'a' and 'b' are
-                        # both non-compound types, so we can just
-                        # replace it
+            # the item is missing from 'a', or is a simple value to be
+            # replaced (or not)
 
-                        if ((type(a[item]) != type(b[item]))
-                            and (not change_types)):
+            elif action is _SET:
+                changes.set_item(a, item, b_value)
 
-                            raise TypeError(
-                                    "deepmerge at: %s can't compare or "
-                                    "change types: %s and: %s"
-                                        % (path.sub(item), type(a[item]),
-                                            type(b[item])))
+            elif action is _KEEP:
+                changes.keep_item(a, item, b_value)
 
-                        if replace:
-                            a[item] = b[item]
 
-            else:
-                # this isn't a recursive call but we still might want to
-                # filter it
+            # a filter_func rejecting an item stops the rest of the
+            # dictionary being merged
 
-                if filter_func:
-                    if not filter_func(path.sub(item), None, b[item]):
-                        return
+            else:
+                return a
 
+    else:
+        changes.conflict(
+            path,
+            TypeError("deepmerge at: %s incompatible or unhandled types: %s "
+                      "and: %s" % (path, type(a), type(b))))
 
-                # the item exists in 'b' but not in 'a', so just add
-                # the item to 'a'
 
-                a[item] = b[item]
-
-    else:
-        raise TypeError(
-                  "deepmerge at: %s incompatible or unhandled types: %s and: "
-                  "%s" % (path, type(a), type(b)))
+    return a
 
 
 
 def deepmerge(a, b, replace=True, list_as_set=False, change_types=False,
-              filter_func=None):
+              filter_func=None, list_keys=None, policy=None, copy=False,
+              atomic=False):
 
     """Recursively merge two nested compound objects - 'a' and 'b': the
-    items in 'b' are merged into 'a', in place, modifying 'a'.  Both
+    items in 'b' are merged into 'a', in place, modifying 'a' (unless
+    'copy' is True, in which case a new object is returned).  Both
     'a' and 'b' must be compound types (a list, set or dictionary) at
     the top level and can contain further compound types or simple
     types, nested within.
@@ -149,7 +387,11 @@ def deepmerge(a, b, replace=True, list_as_set=False, change_types=False,
 
     For lists, the corresponding items in 'b' are appended.  This will
     create duplicates, if they're in both lists (unless list_as_set is
-    enabled).
+    enabled).  If the item in 'b' is a DeepListEdit script (as returned
+    by deepdiff() with list_edits enabled), it is applied to the list.
+    Lists at paths given in list_keys are handled as 'keyed lists' of
+    dictionaries: each item in 'b' is merged into the item in 'a' with
+    the same value of the key field, or appended, if there isn't one.
 
     For sets, the result is the union of the items in 'a' and 'b'.
 
@@ -167,7 +409,7 @@ def deepmerge(a, b, replace=True, list_as_set=False, change_types=False,
     Keyword arguments:
 
     a -- the 'initial' dictionary: this dictionary will be modified in
-    place to contain the merged items from 'b'
+    place to contain the merged items from 'b' (unless 'copy' is True)
 
     b -- the 'additional' dictionary: items in this dictionary will be
     added to 'a', taking precedence over them
@@ -192,6 +434,463 @@ def deepmerge(a, b, replace=True, list_as_set=False, change_types=False,
     act on this level or skip it: it can be used to filter at specific
     levels, perform some other action or raise an exception, if a
     particular level is problematic
+
+    list_keys -- if this is specified, it is a dictionary mapping paths
+    (as tuples of path items, where the items of a keyed list are given
+    by the value of their key field) to the name of the key field in
+    the items of the list at that path, for lists to be handled as
+    keyed lists (see deepdiff())
+
+    policy -- if this is specified, it is a DeepPolicy object, giving
+    options for particular paths, overriding the above arguments (which
+    become the defaults) and allowing paths to be skipped, without
+    calling a filter_func
+
+    copy -- if this is True, 'a' is not modified: instead, a new
+    object is returned, with the result of the merge; only the
+    compound objects in 'a' which the merge changes (those on the paths
+    to the items in 'b') are copied, with the rest of 'a' shared with
+    the new object (so the cost depends on the size of 'b', rather than
+    'a').  Note that the items from 'b' are not copied (as with a
+    normal merge).
+
+    atomic -- if this is True, and an exception is raised part way
+    through the merge (e.g. a TypeError, from incompatible types, or
+    from a filter_func), the changes already made to 'a' are rolled
+    back before the exception is passed on, so 'a' is left unchanged;
+    the previous values of the items changed are recorded as the merge
+    proceeds, so this costs much less than copying 'a' beforehand (this
+    has no effect if 'copy' is True, as 'a' is not changed, anyway)
     """
 
-    _deepmerge(a, b, replace, list_as_set, change_types, filter_func)
+    state = _policy_state(
+                policy, list_keys, replace=replace, list_as_set=list_as_set,
+                change_types=change_types)
+
+    undo = _UndoLog() if atomic and not copy else None
+
+    try:
+        merged = _walk(_deepmerge(a, b, state, filter_func, copy,
+                                  _MergeChanges(undo)))
+
+    except BaseException:
+        if undo:
+            undo.rollback()
+
+        raise
+
+    if copy:
+        return merged
+
+
+
+def _deepmerge_many(a, bs, state, filter_func, copy=False, path=DeepPath()):
+    """Backend function for deepmerge_many() that does the actual work.
+    It is defined privately to not offer the 'path' argument.
+
+    This works as per _deepmerge(), except that 'bs' is a list of
+    objects to merge into 'a', in order, which are all traversed
+    together.
+    """
+
+
+    # as with _deepmerge(), skip this path if the policy or filter
+    # function says so (the filter function is called for each layer,
+    # and only the layers it allows are merged)
+
+    if state.skip:
+        return a
+
+    if filter_func:
+        bs = [ b for b in bs if filter_func(path, a, b) ]
+
+    if not bs:
+        return a
+
+    if copy:
+        a = _mutable_copy(a)
+    else:
+        _check_writable(a, path, "deepmerge_many")
+
+
+    a_kind = _KINDS[type(a)]
+
+    if (a_kind is list) and all(_KINDS[type(b)] is list for b in bs):
+        key = state.list_key
+
+        if key is not None:
+            # this is a keyed list, so we match up the items from all
+            # the layers by their key and merge them together, in one
+            # go, into the item in 'a', or a new item
+
+            a_index = _index_keyed_list(a, key, path, "deepmerge_many")
+
+            if copy:
+                a_position = { id(a_item): i for i, a_item in enumerate(a) }
+
+            b_items = {}
+            for b in bs:
+                for k, b_item in _index_keyed_list(
+                                     b, key, path, "deepmerge_many").items():
+
+                    b_items.setdefault(k, []).append(b_item)
+
+            for k, items in b_items.items():
+                if k in a_index:
+                    merged = yield from _recurse(
+                                 _deepmerge_many(a_index[k], items,
+                                                 state.sub(k), filter_func,
+                                                 copy, path.sub(k)),
+                                 path)
+
+                    if merged is not a_index[k]:
+                        a[a_position[id(a_index[k])]] = merged
+
+                elif len(items) == 1:
+                    a.append(items[0])
+
+                else:
+                    a.append((yield from _recurse(
+                                  _deepmerge_many(items[0], items[1:],
+                                                  state.sub(k), filter_func,
+                                                  True, path.sub(k)),
+                                  path)))
+
+        else:
+            # lists (and list edits) don't involve any traversal, so we
+            # just merge each layer in turn
+
+            for b in bs:
+                if isinstance(b, DeepListEdit):
+                    listpatch(a, b)
+
+                elif state.list_as_set:
+                    a.extend(_difference(b, a))
+
+                else:
+                    a.extend(b)
+
+
+    elif (a_kind is set) and all(_KINDS[type(b)] is set for b in bs):
+        for b in bs:
+            a.update(b)
+
+
+    elif (a_kind is dict) and all(_KINDS[type(b)] is dict for b in bs):
+        # work through all the keys in all the layers, in the order they
+        # first appear
+
+        for item in dict.fromkeys(k for b in bs for k in b):
+            sub_state = state.sub(item)
+
+            if sub_state.skip:
+                continue
+
+
+            # work through the values for this item, in each layer, in
+            # order: simple values are merged as we go and compound
+            # values collected up, to be merged in one recursive call
+
+            value = a[item] if item in a else _MISSING
+            compound_values = []
+
+            for b in bs:
+                if item not in b:
+                    continue
+
+                b_value = b[item]
+
+                # the current value is the value so far or, if there
+                # wasn't one in 'a', the first compound value collected
+                # (if there's no value yet, this is _MISSING)
+
+                current = (compound_values[0]
+                               if (value is _MISSING) and compound_values
+                               else value)
+
+                action = _merge_action(
+                             current, b_value, sub_state, filter_func,
+                             path, item, "deepmerge_many")
+
+                if action is _MERGE:
+                    compound_values.append(b_value)
+
+                elif action is _SET:
+                    if _KINDS[type(b_value)] is not None:
+                        compound_values.append(b_value)
+                    else:
+                        value = b_value
+
+
+            if compound_values:
+                if value is not _MISSING:
+                    merged = yield from _recurse(
+                                 _deepmerge_many(value, compound_values,
+                                                 sub_state, filter_func, copy,
+                                                 path.sub(item)),
+                                 path)
+
+                elif len(compound_values) == 1:
+                    # a single value is just stored (as deepmerge()
+                    # would)
+
+                    merged = compound_values[0]
+
+                else:
+                    # several layers supply a value, so we merge the
+                    # later ones into the first, as deepmerge() would,
+                    # but copying it, rather than modifying the first
+                    # layer
+
+                    merged = yield from _recurse(
+                                 _deepmerge_many(compound_values[0],
+                                                 compound_values[1:],
+                                                 sub_state, filter_func, True,
+                                                 path.sub(item)),
+                                 path)
+
+                value = merged
+
+
+            if (value is not _MISSING) and (
+                    (item not in a) or (a[item] is not value)):
+
+                a[item] = value
+
+
+    else:
+        # find the first layer which can't be merged, for the message
+
+        for b in bs:
+            if (a_kind is None) or (a_kind is not _KINDS[type(b)]):
+
+                break
+
+        raise TypeError(
+                  "deepmerge_many at: %s incompatible or unhandled types: %s "
+                  "and: %s" % (path, type(a), type(b)))
+
+
+    return a
+
+
+
+def deepmerge_many(base, layers, replace=True, list_as_set=False,
+                   change_types=False, filter_func=None, list_keys=None,
+                   policy=None, copy=False):
+
+    """Merges a sequence of nested compound objects, 'layers', into
+    'base', in order, with later layers taking precedence (if 'replace'
+    is True).  The result is the same as calling deepmerge() on 'base'
+    with each layer in turn, but all the layers are traversed together,
+    in a single pass, so each key is only visited once and 'base' is
+    not walked again for each layer.
+
+    The arguments are as per deepmerge(), with 'base' being modified in
+    place (unless 'copy' is True, in which case the result is
+    returned).
+
+    One difference to calling deepmerge() repeatedly is that, where a
+    compound item is not in 'base' and more than one layer supplies it,
+    the later layers are merged into a copy of the item from the first
+    layer (with only the parts they change being copied, as with the
+    'copy' option to deepmerge()): with deepmerge(), the item from the
+    first layer would be added and the later ones merged into it,
+    modifying that layer.  Where only one layer supplies it, it is
+    added, without being copied, as with deepmerge().
+
+    If a filter_func is specified, it is called, for each layer, with
+    the same parameters as deepmerge() would do, except that, for
+    compound items, 'a' will not yet have had the previous layers
+    merged into it.  Where it returns False for a simple item, only
+    that item is skipped (deepmerge() stops merging the rest of the
+    dictionary containing it, which depends on the order of the keys
+    in each layer, so can't be done when they're traversed together).
+    """
+
+    state = _policy_state(
+                policy, list_keys, replace=replace, list_as_set=list_as_set,
+                change_types=change_types)
+
+    merged = _walk(_deepmerge_many(base, list(layers), state, filter_func,
+                                   copy))
+
+    if copy:
+        return merged
+
+
+
+# the result of deepmerge_plan() - see that function for information
+
+DeepMergePlan = namedtuple(
+                    "DeepMergePlan",
+                    ("added", "replaced", "unchanged", "inserted", "deleted",
+                     "conflicts", "bytes_added"))
+
+
+
+def _deep_sizeof(obj, seen):
+    """Returns the approximate memory used by 'obj' (as measured by
+    sys.getsizeof()), including the objects within it, but excluding
+    any objects whose IDs are in the set 'seen' (to which the IDs of
+    the objects counted are added, so shared objects are only counted
+    once).
+    """
+
+    size = 0
+    stack = [obj]
+
+    while stack:
+        obj = stack.pop()
+
+        if id(obj) in seen:
+            continue
+
+        seen.add(id(obj))
+        size += sys.getsizeof(obj)
+
+        # tuples and frozensets are simple values, as far as merging is
+        # concerned, but the objects in them still take up memory
+
+        container = _CONTAINERS[type(obj)]
+
+        if container is None:
+            if isinstance(obj, (tuple, frozenset)):
+                stack.extend(obj)
+
+        elif container.kind is dict:
+            for key, value in container.iterate(obj):
+                stack.append(key)
+                stack.append(value)
+
+        else:
+            stack.extend(container.iterate(obj))
+
+    return size
+
+
+
+class _MergePlanner:
+    """This class is the 'changes' object for _deepmerge(), when it's
+    run for deepmerge_plan(): nothing is changed, but the changes which
+    would be made are counted in the dictionary 'plan' (which has the
+    fields of DeepMergePlan), and the conflicts recorded in its
+    'conflicts' list (after which, the merge continues, skipping the
+    item).
+    """
+
+
+    def __init__(self, plan):
+        self.plan = plan
+
+        # the IDs of the objects counted in 'bytes_added'
+
+        self.seen = set()
+
+
+    def _added(self, obj):
+        self.plan["bytes_added"] += _deep_sizeof(obj, self.seen)
+
+
+    def conflict(self, path, error):
+        self.plan["conflicts"].append((path, str(error)))
+
+
+    def edit_list(self, a, script):
+        for op, index, value in script:
+            if op == "delete":
+                self.plan["deleted"] += value
+            else:
+                self.plan["inserted"] += len(value)
+                self._added(value)
+
+
+    def extend_list(self, a, items):
+        self.plan["inserted"] += len(items)
+        self._added(items)
+
+
+    def append_item(self, a, item):
+        self.plan["inserted"] += 1
+        self._added(item)
+
+
+    def update_set(self, a, items):
+        for item in items:
+            if item not in a:
+                self.append_item(a, item)
+
+
+    def set_item(self, a, item, value):
+        if item not in a:
+            self.plan["added"] += 1
+            self._added(item)
+            self._added(value)
+
+        elif (type(a[item]) != type(value)) or (a[item] != value):
+            self.plan["replaced"] += 1
+            self._added(value)
+
+        else:
+            self.plan["unchanged"] += 1
+
+
+    def keep_item(self, a, item, value):
+        self.plan["unchanged"] += 1
+
+
+
+def deepmerge_plan(a, b, replace=True, list_as_set=False, change_types=False,
+                   filter_func=None, list_keys=None, policy=None):
+
+    """Works out what deepmerge() would do, if called with the same
+    arguments, without changing 'a' (a 'dry run'), returning a summary
+    of the changes it would make, and any problems it would encounter.
+    'a' and 'b' are traversed together, following the same rules as
+    deepmerge() (see that function for information), but nothing is
+    copied, so this is much cheaper than copying 'a' and merging into
+    the copy.
+
+    The return value is a DeepMergePlan object (a named tuple) with the
+    following fields:
+
+    added -- the number of items which would be added to dictionaries
+
+    replaced -- the number of simple values in dictionaries which would
+    be replaced with a different value (or type)
+
+    unchanged -- the number of simple values in dictionaries which
+    would be left as they are (because they are the same, or 'replace'
+    is False)
+
+    inserted -- the number of items which would be added to lists and
+    sets (including keyed lists and those inserted by list edits)
+
+    deleted -- the number of items which would be deleted from lists,
+    by list edits
+
+    conflicts -- a list of (path, message) tuples, giving the paths
+    (as DeepPath objects) where deepmerge() would raise an exception
+    (because the types of the items don't match, or a keyed list is
+    invalid) and the message of the exception; note that deepmerge()
+    would stop at the first of these, but the plan continues past them
+
+    bytes_added -- the estimated memory (in bytes, from
+    sys.getsizeof()) used by the objects which would be added to 'a'
+    (counting any object referenced more than once only once)
+
+    The filter_func, if specified, is called in the same way as by
+    deepmerge(), so should not have side effects, if the plan is not to
+    change anything.
+    """
+
+    state = _policy_state(
+                policy, list_keys, replace=replace, list_as_set=list_as_set,
+                change_types=change_types)
+
+    plan = { "added": 0, "replaced": 0, "unchanged": 0, "inserted": 0,
+             "deleted": 0, "conflicts": [], "bytes_added": 0 }
+
+    _walk(_deepmerge(a, b, state, filter_func, False, _MergePlanner(plan)))
+
+    return DeepMergePlan(**plan)
@@ -0,0 +1,328 @@
+# deepops.merge3
+
+
+
+from collections import namedtuple
+
+from .diff import _EQUAL_DEPTH
+from .intern import _known_equal
+from .keyedlist import _index_keyed_list
+from .listset import _difference
+from .path import DeepPath
+from .policy import _policy_state
+from .types import _CONTAINERS, _KINDS, _thawed_type
+from .walk import _recurse, _walk
+
+
+
+class _Missing:
+    """Class of the MISSING object, below."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "MISSING"
+
+
+    def __reduce__(self):
+        # pickle as a reference to the module-level object, so it's
+        # still the same object when unpickled
+        return "MISSING"
+
+
+
+# marker used in a DeepConflict where an item is not present in one of
+# the versions (e.g. where it was deleted)
+
+MISSING = _Missing()
+
+
+
+# a conflict found by deepmerge3(): the path of the item and its value
+# in each of the three versions (or MISSING)
+
+DeepConflict = namedtuple("DeepConflict", ("path", "base", "ours", "theirs"))
+
+
+
+def _equal(a, b):
+    """Returns whether 'a' and 'b' are equal: if they're the same
+    object, or frozen objects with different hashes (see deepintern()),
+    this is known without comparing them, otherwise they're compared
+    with '=='.  They're treated as not equal if comparing them exceeds
+    the recursion limit (as _deepdiff() does).
+    """
+
+    equal = _known_equal(a, b)
+
+    if equal is not None:
+        return equal
+
+    try:
+        return a == b
+
+    except RuntimeError:
+        return False
+
+
+
+def _same_type(t, base, ours, theirs):
+    """Returns whether 'ours' and 'theirs' are both handled as the kind
+    of container 't' (dict, list or set - see register_container()), as
+    is 'base' (unless it is MISSING).
+    """
+
+    return ((_KINDS[type(ours)] is t) and (_KINDS[type(theirs)] is t)
+            and ((base is MISSING) or (_KINDS[type(base)] is t)))
+
+
+
+def _keyed(base, ours, theirs, state):
+    """Returns whether the items in 'base', 'ours' and 'theirs' are
+    merged by key: i.e. they're all dictionaries, or all keyed lists.
+    """
+
+    return (_same_type(dict, base, ours, theirs)
+            or (_same_type(list, base, ours, theirs)
+                and (state.list_key is not None)))
+
+
+
+def _same_items(a, b):
+    """Returns whether the sequences 'a' and 'b' contain the same
+    objects, in the same order.
+    """
+
+    return (len(a) == len(b)) and all(x is y for x, y in zip(a, b))
+
+
+
+def _merge3_keyed(base, ours, theirs, state, conflicts, path):
+    """Merges three mappings of keys to items (either dictionaries or
+    the indexed items in keyed lists), returning a list of (key,
+    merged item) in order: the keys in 'ours', followed by the new keys
+    in 'theirs'.  Items deleted in the result are omitted.
+
+    This is a generator function, to be run with _walk(), as it makes
+    recursive calls to _deepmerge3().
+    """
+
+    merged = []
+
+    keys = list(ours) + [ k for k in theirs if k not in ours ]
+
+    for key in keys:
+        sub_state = state.sub(key)
+
+        # if this path is skipped, we just keep our version
+
+        if sub_state.skip:
+            if key in ours:
+                merged.append((key, ours[key]))
+            continue
+
+        value = yield from _recurse(
+                    _deepmerge3(base.get(key, MISSING),
+                                ours.get(key, MISSING),
+                                theirs.get(key, MISSING), sub_state,
+                                conflicts, path.sub(key)),
+                    path)
+
+        if value is not MISSING:
+            merged.append((key, value))
+
+    return merged
+
+
+
+def _deepmerge3(base, ours, theirs, state, conflicts, path=DeepPath()):
+    """Backend function for deepmerge3() that does the actual work.  It
+    is defined privately to not offer the 'path' argument.
+
+    This is a generator function, to be run with _walk(): recursive
+    calls are made by yielding the generator for the call.
+
+    The merged value is returned (which may be MISSING, if the item is
+    deleted) and any conflicts are appended to the list 'conflicts'.
+    """
+
+    if state.skip:
+        return ours
+
+
+    # if only one side has changed the item (or they both made the same
+    # change), we use that - this is checked by identity first (which
+    # is quick and common, as unchanged parts of the structures are
+    # often shared), then by value
+
+    if ours is theirs:
+        return ours
+
+    if base is ours:
+        return theirs
+
+    if base is theirs:
+        return ours
+
+    # however, as with deepdiff(), beyond _EQUAL_DEPTH, dictionaries and
+    # keyed lists are not compared with '==' (comparing them at every
+    # level would be quadratic in the depth of the structures): they're
+    # merged item by item instead, which gives the same result
+
+    if (len(path) < _EQUAL_DEPTH) or not _keyed(base, ours, theirs, state):
+        if _equal(ours, theirs):
+            return ours
+
+        if _equal(base, ours):
+            return theirs
+
+        if _equal(base, theirs):
+            return ours
+
+
+    # both sides have changed the item, differently - if they're both
+    # the same compound type (and the base was the same type, or it was
+    # missing, and both added it), we merge the items inside them
+
+    if _same_type(dict, base, ours, theirs):
+        items = yield from _merge3_keyed(
+                          {} if base is MISSING else base, ours, theirs,
+                          state, conflicts, path)
+
+        # if they weren't compared with '==' (see above), nothing may
+        # have changed from one version, in which case that's returned,
+        # so it's still shared
+
+        if len(path) >= _EQUAL_DEPTH:
+            keys = [ k for k, value in items ]
+            values = [ value for k, value in items ]
+
+            for version in (ours, theirs):
+                container = _CONTAINERS[type(version)]
+                version_items = list(container.iterate(version))
+
+                if (([ k for k, value in version_items ] == keys)
+                    and _same_items([ value for k, value in version_items ],
+                                    values)):
+
+                    return version
+
+        return _thawed_type(ours)(items)
+
+
+    if (_same_type(list, base, ours, theirs)
+        and (state.list_key is not None)):
+
+        key = state.list_key
+
+        items = yield from _merge3_keyed(
+                          {} if base is MISSING
+                              else _index_keyed_list(
+                                       base, key, path, "deepmerge3"),
+                          _index_keyed_list(ours, key, path, "deepmerge3"),
+                          _index_keyed_list(theirs, key, path, "deepmerge3"),
+                          state, conflicts, path)
+
+        items = [ item for k, item in items ]
+
+        if len(path) >= _EQUAL_DEPTH:
+            for version in (ours, theirs):
+                if _same_items(version, items):
+                    return version
+
+        return _thawed_type(ours)(items)
+
+
+    if (_same_type(set, base, ours, theirs)
+        or (_same_type(list, base, ours, theirs) and state.list_as_set)):
+
+        # the items in the result are those in both, plus those added
+        # by either side - i.e. items removed by either side are
+        # removed, with the order of 'ours' kept, followed by any items
+        # added by 'theirs'
+
+        if base is MISSING:
+            base = ()
+
+        theirs_removed = _difference(base, theirs)
+        theirs_added = _difference(_difference(theirs, base), ours)
+
+        return _thawed_type(ours)(
+                   _difference(ours, theirs_removed) + theirs_added)
+
+
+    # otherwise, we have a conflict: we record this and keep our value
+
+    conflicts.append(DeepConflict(path, base, ours, theirs))
+
+    return ours
+
+
+
+def deepmerge3(base, ours, theirs, list_as_set=False, list_keys=None,
+               policy=None):
+
+    """Performs a three-way merge of two versions of a nested compound
+    object - 'ours' and 'theirs' - which have both been changed from a
+    common original version, 'base'.  None of the objects are modified.
+
+    The return value is a 2-tuple: ('merged', 'conflicts'):
+
+    'merged' is the merged object, which contains the changes made in
+    both versions.  It is built from new compound objects only where
+    both versions have changed: everything else is shared with 'ours'
+    or 'theirs' (whichever has changed), so should be copied, if it's
+    to be modified independently.
+
+    'conflicts' is a list of DeepConflict objects, each being a tuple
+    (path, base, ours, theirs), giving the path (as a DeepPath) of an
+    item changed differently in both versions, and the value of the
+    item in each of the versions (or MISSING, where it's not present).
+    In the merged object, the value from 'ours' is used for these.
+
+    The three objects are traversed together, in a single pass.  An
+    item which is the same object, or has the same value, in both
+    versions, or has only been changed in one of them, is not
+    traversed any further.  Where both versions have changed an item:
+
+    For dictionaries, the keys are merged individually: keys added or
+    removed in one version are added or removed; those changed in both
+    are merged recursively.
+
+    For sets (and lists, if list_as_set is True), the result contains
+    the items in both versions, plus the items added by either version
+    (so items removed by either version are removed).  This never
+    conflicts.
+
+    For keyed lists (see deepdiff()), the items are matched by their
+    key field and merged, as for dictionaries.
+
+    For anything else (simple values, ordinary lists and items which
+    have been changed to a different type), a conflict is reported.
+
+    Keyword arguments:
+
+    base -- the original version
+
+    ours -- our changed version (which takes precedence in conflicts)
+
+    theirs -- their changed version
+
+    list_as_set -- this specifies whether lists should be merged as
+    sets (see above)
+
+    list_keys -- if this is specified, it is a dictionary mapping paths
+    to the key fields of keyed lists (see deepdiff())
+
+    policy -- if this is specified, it is a DeepPolicy object, giving
+    options for particular paths (the list_as_set, list_key and skip
+    options are used: a skipped item keeps our version)
+    """
+
+    state = _policy_state(policy, list_keys, list_as_set=list_as_set)
+
+    conflicts = []
+
+    merged = _walk(_deepmerge3(base, ours, theirs, state, conflicts))
+
+    return merged, conflicts
@@ -0,0 +1,484 @@
+# deepops.parallel
+
+
+
+import os
+import pickle
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+from .diff import DeepDiffResult, _DiffBuilder, _deepdiff
+from .fingerprint import DeepFingerprints
+from .intern import _known_equal
+from .merge import deepmerge, deepmerge_many
+from .path import DeepPath
+from .policy import DeepPolicy, _policy_state
+from .types import _CONTAINERS, _KINDS, _thawed_type
+from .walk import _walk
+
+
+
+def _merge_task(payloads, options):
+    """Merges a list of pickled objects, in order, into the first one,
+    returning the result, pickled, along with the time taken to unpickle
+    the objects, merge them and pickle the result.
+
+    This runs in a worker process, so is a module-level function (to be
+    picklable) and the objects are pickled explicitly, so the time
+    taken to do so can be measured.
+    """
+
+    start = perf_counter()
+
+    objs = [ pickle.loads(payload) for payload in payloads ]
+
+    loaded = perf_counter()
+
+    policy = DeepPolicy(options["rules"]) if options["rules"] else None
+
+    deepmerge_many(objs[0], objs[1:], replace=options["replace"],
+                   list_as_set=options["list_as_set"],
+                   change_types=options["change_types"],
+                   list_keys=options["list_keys"], policy=policy)
+
+    merged = perf_counter()
+
+    result = pickle.dumps(objs[0], protocol=pickle.HIGHEST_PROTOCOL)
+
+    return result, (loaded - start, merged - loaded, perf_counter() - merged)
+
+
+
+def _merge_parallel(executor, base, layers, options, workers, chunk_size,
+                    stats):
+
+    """Backend function for deepmerge_parallel(), which runs the merge
+    on the supplied executor.  See that function for information.
+    """
+
+    start = perf_counter()
+
+
+    # pickle the layers here, so we know how long it took (the
+    # executor would otherwise do it, behind the scenes)
+
+    partials = [ pickle.dumps(layer, protocol=pickle.HIGHEST_PROTOCOL)
+                     for layer in layers ]
+
+    stats["serialise_time"] += perf_counter() - start
+
+
+    # (each chunk needs at least two layers, or nothing would be
+    # merged)
+
+    if chunk_size is None:
+        chunk_size = -(-len(partials) // workers)
+
+    chunk_size = max(2, chunk_size)
+
+
+    # merge the chunks of layers, then pairs of the results, until only
+    # one result is left - the order of the results is kept, so later
+    # layers still take precedence
+    #
+    # a group with only one item just carries over to the next level
+
+    while len(partials) > 1:
+        groups = [ partials[i : i + chunk_size]
+                       for i in range(0, len(partials), chunk_size) ]
+
+        futures = [ executor.submit(_merge_task, group, options)
+                            if len(group) > 1 else None
+                        for group in groups ]
+
+        partials = []
+
+        for group, future in zip(groups, futures):
+            if future is None:
+                partials.append(group[0])
+                continue
+
+            result, (load_time, merge_time, dump_time) = future.result()
+
+            partials.append(result)
+
+            stats["tasks"] += 1
+            stats["bytes_sent"] += sum(len(payload) for payload in group)
+            stats["bytes_received"] += len(result)
+            stats["deserialise_time"] += load_time
+            stats["merge_time"] += merge_time
+            stats["serialise_time"] += dump_time
+
+        chunk_size = 2
+
+
+    # finally, merge the combined layers into the base, here
+
+    loading = perf_counter()
+
+    combined = pickle.loads(partials[0])
+
+    merging = perf_counter()
+
+    deepmerge(base, combined, replace=options["replace"],
+              list_as_set=options["list_as_set"],
+              change_types=options["change_types"],
+              list_keys=options["list_keys"],
+              policy=DeepPolicy(options["rules"]) if options["rules"]
+                         else None)
+
+    stats["deserialise_time"] += merging - loading
+    stats["merge_time"] += perf_counter() - merging
+    stats["wall_time"] += perf_counter() - start
+
+
+
+def deepmerge_parallel(base, layers, replace=True, list_as_set=False,
+                       change_types=False, list_keys=None, policy=None,
+                       max_workers=None, chunk_size=None, executor=None,
+                       stats=None):
+
+    """Merges a sequence of nested compound objects, 'layers', into
+    'base', in place, in the same way as calling deepmerge() with each
+    layer in turn, but spreading the work across a pool of processes.
+
+    The layers are split into chunks, each of which is merged in a
+    worker process (with deepmerge_many()), and the results of those
+    are combined in pairs, in a balanced tree, until a single result is
+    left, which is then merged into 'base', in this process.  This
+    gives the same result as merging the layers in sequence, as merging
+    is associative (later layers still take precedence over earlier
+    ones).
+
+    The objects are pickled to send them to the worker processes and
+    back, so the items added to 'base' will be copies of those in the
+    layers, rather than the same objects, and the layers must be
+    picklable.  This overhead means this is only worthwhile where there
+    are many large layers - it's measured and can be reported with the
+    'stats' argument.
+
+    The 'replace', 'list_as_set', 'change_types', 'list_keys' and
+    'policy' arguments are as per deepmerge().  A filter_func cannot be
+    used (as it would need to be called in the worker processes) and
+    the layers should not contain DeepListEdit scripts (as these can't
+    be combined with each other).
+
+    Keyword arguments (in addition to deepmerge()):
+
+    max_workers -- the number of worker processes to use (by default,
+    the number of CPUs)
+
+    chunk_size -- the number of layers to merge in each task, in the
+    first round (by default, the layers are divided equally between
+    the workers, and at least two)
+
+    executor -- if this is specified, it is a concurrent.futures
+    Executor to use to run the tasks (which will not be shut down),
+    rather than creating a new ProcessPoolExecutor
+
+    stats -- if this is specified, it is a dictionary, which will be
+    updated with the statistics of the merge: 'tasks' (the number of
+    tasks run in the executor), 'bytes_sent' and 'bytes_received' (the
+    total size of the pickled objects sent to and received from the
+    tasks), 'serialise_time' and 'deserialise_time' (the total time
+    spent pickling and unpickling objects, in all processes),
+    'merge_time' (the total time spent merging, in all processes) and
+    'wall_time' (the elapsed time of the whole operation), with times
+    in seconds
+    """
+
+    layers = list(layers)
+
+    if stats is None:
+        stats = {}
+
+    for name in ("tasks", "bytes_sent", "bytes_received", "serialise_time",
+                 "deserialise_time", "merge_time", "wall_time"):
+
+        stats[name] = 0
+
+    if not layers:
+        return
+
+
+    # the options are sent to each task, so the policy is sent as its
+    # rules (the trie and cached states would be wasted)
+
+    options = {
+        "replace": replace,
+        "list_as_set": list_as_set,
+        "change_types": change_types,
+        "list_keys": list_keys,
+        "rules": policy.rules if policy else None,
+    }
+
+    workers = max_workers or os.cpu_count() or 1
+
+    if executor is not None:
+        _merge_parallel(executor, base, layers, options, workers,
+                        chunk_size, stats)
+
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        _merge_parallel(executor, base, layers, options, workers,
+                        chunk_size, stats)
+
+
+
+def _estimate_size(obj, limit):
+    """Returns the number of compound objects and items in 'obj',
+    counting no further than 'limit' (so the time taken is limited).
+    The compound objects are those handled as containers (see
+    register_container()).
+    """
+
+    count = 0
+    stack = [obj]
+
+    while stack and (count < limit):
+        obj = stack.pop()
+
+        container = _CONTAINERS[type(obj)]
+
+        if container is not None:
+            items = list(container.iterate(obj))
+            count += len(items)
+
+            if container.kind is dict:
+                stack.extend(value for key, value in items)
+            else:
+                stack.extend(items)
+
+        count += 1
+
+    return min(count, limit)
+
+
+
+def _diff_task(a, b, key, options):
+    """Compares the subtrees 'a' and 'b', under the top-level 'key', as
+    deepdiff() would, returning (remove_items, update_items).  This may
+    run in a worker process, so the policy state is rebuilt from the
+    options.
+    """
+
+    state = _policy_state(
+                DeepPolicy(options["rules"]) if options["rules"] else None,
+                options["list_keys"], list_as_set=options["list_as_set"],
+                list_edits=options["list_edits"],
+                change_types=options["change_types"])
+
+    fingerprints = DeepFingerprints() if options["fingerprints"] else None
+
+    return _walk(_deepdiff(a, b, state.sub(key), options["filter_func"],
+                           fingerprints, _DiffBuilder(),
+                           path=DeepPath((key,))))
+
+
+
+def _known_same(a, b, fingerprints):
+    """Returns whether 'a' and 'b' are known to be the same, without
+    comparing them item by item: if they're the same object, or their
+    fingerprints are the same (see _same(), in deepdiff()).
+    """
+
+    equal = _known_equal(a, b)
+
+    if (equal is None) and (fingerprints is not None):
+        equal = fingerprints.equal(a, b)
+
+    return bool(equal)
+
+
+
+def _diff_parallel(executor, a, b, state, options, fingerprints, threshold):
+    """Backend function for deepdiff_parallel(), which runs the
+    comparison on the supplied executor.  See that function for
+    information.
+    """
+
+    filter_func = options["filter_func"]
+
+
+    # find the subtrees under the keys common to both dictionaries which
+    # are large enough to be compared separately (any which are skipped,
+    # or are known to be the same, are left for the main comparison to
+    # skip, rather than sending them to a worker)
+
+    large = []
+
+    for item in a:
+        if (item not in b) or state.sub(item).skip:
+            continue
+
+        if not ((_KINDS[type(a[item])] is not None)
+                and (_KINDS[type(b[item])] is not None)):
+
+            continue
+
+        if _known_same(a[item], b[item], fingerprints):
+            continue
+
+        if ((_estimate_size(a[item], threshold)
+             + _estimate_size(b[item], threshold)) >= threshold):
+
+            large.append(item)
+
+
+    futures = [ (item, executor.submit(_diff_task, a[item], b[item], item,
+                                       options))
+                    for item in large ]
+
+
+    # compare everything else here, while the large subtrees are being
+    # compared - the filter function has already been called for the
+    # top level, so we don't call it again for the copies
+
+    large = set(large)
+
+    a_rest = { k: v for k, v in a.items() if k not in large }
+    b_rest = { k: v for k, v in b.items() if k not in large }
+
+    if filter_func:
+        rest_filter_func = (
+            lambda path, a, b: (not path) or filter_func(path, a, b))
+    else:
+        rest_filter_func = None
+
+    rest_remove_items, rest_update_items = _walk(
+        _deepdiff(a_rest, b_rest, state, rest_filter_func, fingerprints,
+                  _DiffBuilder()))
+
+    large_results = { item: future.result() for item, future in futures }
+
+
+    # build the results in the same order as _deepdiff() would: the
+    # items removed and added entirely, followed by the changes to the
+    # items common to both, in the order of 'a', taking these from the
+    # results of the large subtrees, in the same way as _deepdiff()
+    # does for a recursive call, or from the rest
+
+    remove_items = { item: value
+                         for item, value in rest_remove_items.items()
+                             if item not in b_rest }
+
+    update_items = { item: value
+                         for item, value in rest_update_items.items()
+                             if item not in a_rest }
+
+    for item in a:
+        if item in large_results:
+            remove_subitems, update_subitems = large_results[item]
+
+            if remove_subitems:
+                remove_items[item] = remove_subitems
+
+            if update_subitems:
+                update_items[item] = update_subitems
+
+        else:
+            if (item in b_rest) and (item in rest_remove_items):
+                remove_items[item] = rest_remove_items[item]
+
+            if (item in b_rest) and (item in rest_update_items):
+                update_items[item] = rest_update_items[item]
+
+
+    # the results have the same type as 'a' (as the copy above was a
+    # plain dictionary), or the mutable version of it, as _deepdiff()
+    # would give
+
+    if _thawed_type(a) is not dict:
+        remove_items = _thawed_type(a)(remove_items)
+        update_items = _thawed_type(a)(update_items)
+
+    return DeepDiffResult(remove_items, update_items)
+
+
+
+def deepdiff_parallel(a, b, list_as_set=False, change_types=False,
+                      filter_func=None, fingerprints=None, list_edits=False,
+                      list_keys=None, policy=None, max_workers=None,
+                      threshold=10000, executor=None):
+
+    """Compares two nested compound objects, as deepdiff() does, but,
+    where they are both dictionaries, the large subtrees under the keys
+    common to both are compared in parallel, in a pool of workers, and
+    the results combined.  The result is the same as deepdiff().
+
+    The size of each subtree is estimated by counting its items (but
+    only up to the threshold, so this is quick) and, if the total for
+    both sides is at least 'threshold', it's compared separately.
+    Everything else is compared in the calling process, while the
+    workers are running.
+
+    By default, a ProcessPoolExecutor is used, so the subtrees are
+    pickled and sent to the worker processes, and the items in the
+    result will be copies, rather than the objects from 'a' and 'b'.
+    An executor can be supplied instead, such as a ThreadPoolExecutor
+    (although this will only help where threads can run in parallel).
+    With a process pool, a filter_func must be picklable (e.g. a
+    module-level function) and a DeepFingerprints object can't be
+    shared with the workers (they will use their own).
+
+    The arguments are as per deepdiff(), with the following additional
+    keyword arguments:
+
+    max_workers -- the number of workers to create in the pool (by
+    default, the number of CPUs)
+
+    threshold -- the minimum estimated size of the subtrees under a key
+    (the total number of items in both), for them to be compared in
+    parallel
+
+    executor -- if this is specified, it is a concurrent.futures
+    Executor to use to run the comparisons (which will not be shut
+    down), rather than creating a new ProcessPoolExecutor
+    """
+
+    if fingerprints is True:
+        fingerprints = DeepFingerprints()
+
+    state = _policy_state(
+                policy, list_keys, list_as_set=list_as_set,
+                list_edits=list_edits, change_types=change_types)
+
+
+    # if there are no subtrees to compare in parallel, or the top level
+    # is skipped, or they're known to be the same, we just compare them
+    # here
+
+    if (not ((_KINDS[type(a)] is dict) and (_KINDS[type(b)] is dict))
+        or state.skip
+        or _known_same(a, b, fingerprints)):
+
+        return DeepDiffResult(
+                   *_walk(_deepdiff(a, b, state, filter_func, fingerprints,
+                                    _DiffBuilder())))
+
+
+    # the filter function is called for the top level here, once (if it
+    # rejects it, there are no changes, as _deepdiff() would give)
+
+    if filter_func and not filter_func(DeepPath(), a, b):
+        return DeepDiffResult(*_DiffBuilder().empty(a))
+
+
+    options = {
+        "list_as_set": list_as_set,
+        "change_types": change_types,
+        "filter_func": filter_func,
+        "fingerprints": fingerprints is not None,
+        "list_edits": list_edits,
+        "list_keys": list_keys,
+        "rules": policy.rules if policy else None,
+    }
+
+    if executor is not None:
+        return _diff_parallel(executor, a, b, state, options, fingerprints,
+                              threshold)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        return _diff_parallel(executor, a, b, state, options, fingerprints,
+                              threshold)
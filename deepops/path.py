@@ -2,16 +2,89 @@
 
 
 
-class DeepPath(list):
+class DeepPath:
     """This class represents the 'path' into a hierarchy of
     dictionaries, lists and sets.
 
     It is used for generating string representations of a path for
     error messages, as well as performing checks for specific
     locations.
+
+    A path is stored as a (persistent) linked list, with each path
+    holding a reference to the path of its parent, and the final item:
+    this means that extending a path with sub() takes constant time and
+    doesn't copy the path.  The full sequence of path items is only
+    built (and then cached) when it's needed, for example, when the path
+    is converted to a string, iterated over or compared.
+
+    Paths support the same operations as a list of the path items (this
+    class used to be a subclass of list): len(), iteration, indexing and
+    slicing (which returns a list), comparison and ordering with lists
+    and tuples, concatenation, and the list methods, including those
+    which modify the path in place, such as append() and pop().
+
+    The items in a path are shared with the paths extended from it, so a
+    path that is modified in place keeps its items in a separate list,
+    leaving the shared items - and any paths already extended from it -
+    unchanged.
     """
 
 
+    __slots__ = ("_parent", "_item", "_len", "_items", "_edited")
+
+
+    def __init__(self, items=()):
+        """Initialises the path to contain the sequence of path items
+        in 'items' (by default, it will be empty, representing the top
+        of the hierarchy).
+        """
+
+        items = tuple(items)
+
+        if items:
+            parent = DeepPath()
+            for item in items[:-1]:
+                parent = parent.sub(item)
+
+            self._parent = parent
+            self._item = items[-1]
+
+        else:
+            self._parent = None
+            self._item = None
+
+        self._len = len(items)
+        self._items = items
+
+        self._edited = None
+
+
+    def _tuple(self):
+        """Returns the path items as a tuple, building it (and caching
+        it) by following the chain of parents, if it has not been
+        already.
+        """
+
+        if self._edited is not None:
+            return tuple(self._edited)
+
+        if self._items is None:
+            # walk up the chain of parents until we find one which has
+            # already been built (there will always be one, as the root
+            # is built when it is created)
+
+            items = []
+            path = self
+            while path._items is None:
+                items.append(path._item)
+                path = path._parent
+
+            items.reverse()
+            self._items = path._items + tuple(items)
+
+        return self._items
+
+
     def __str__(self):
         """Returns a printable version of the path for use in error
         messages.  This is the path items, each converted to a string
@@ -28,16 +101,216 @@ class DeepPath(list):
         return "".join(map(lambda i: "[%s]" % repr(i), self)) or "<root>"
 
 
+    def __repr__(self):
+        return repr(list(self._tuple()))
+
+
+    def _edit(self):
+        """Returns the list of path items to modify the path in place,
+        copying them from the shared items, the first time the path is
+        modified.
+        """
+
+        if self._edited is None:
+            self._edited = list(self._tuple())
+
+        return self._edited
+
+
+    def __len__(self):
+        if self._edited is not None:
+            return len(self._edited)
+
+        return self._len
+
+
+    def __iter__(self):
+        return iter(self._tuple())
+
+
+    def __getitem__(self, index):
+        # slices return a list, as they did when this class was a
+        # subclass of list
+
+        items = self._tuple() if self._edited is None else self._edited
+
+        if isinstance(index, slice):
+            return list(items[index])
+
+        return items[index]
+
+
+    def __setitem__(self, index, value):
+        self._edit()[index] = value
+
+
+    def __delitem__(self, index):
+        del self._edit()[index]
+
+
+    def __contains__(self, item):
+        return item in self._tuple()
+
+
+    def __eq__(self, other):
+        if self is other:
+            return True
+
+        if isinstance(other, DeepPath):
+            return (len(self) == len(other)) and (
+                       self._tuple() == other._tuple())
+
+        if isinstance(other, (list, tuple)):
+            return self._tuple() == tuple(other)
+
+        return NotImplemented
+
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+
+        if result is NotImplemented:
+            return result
+
+        return not result
+
+
+    def _compare(self, other):
+        """Returns the path items in 'other' as a tuple, for ordering
+        comparisons, or None, if it's not a path, list or tuple.
+        """
+
+        if isinstance(other, DeepPath):
+            return other._tuple()
+
+        if isinstance(other, (list, tuple)):
+            return tuple(other)
+
+        return None
+
+
+    def __lt__(self, other):
+        other = self._compare(other)
+        return NotImplemented if other is None else self._tuple() < other
+
+
+    def __le__(self, other):
+        other = self._compare(other)
+        return NotImplemented if other is None else self._tuple() <= other
+
+
+    def __gt__(self, other):
+        other = self._compare(other)
+        return NotImplemented if other is None else self._tuple() > other
+
+
+    def __ge__(self, other):
+        other = self._compare(other)
+        return NotImplemented if other is None else self._tuple() >= other
+
+
+    def __hash__(self):
+        # a path is hashable, so it can be used as a dictionary key, but
+        # it must not be modified in place while it is one
+
+        return hash(self._tuple())
+
+
+    def __add__(self, other):
+        return list(self._tuple()) + list(other)
+
+
+    def __radd__(self, other):
+        return list(other) + list(self._tuple())
+
+
+    def __iadd__(self, other):
+        self._edit().extend(other)
+        return self
+
+
+    def __mul__(self, count):
+        return list(self._tuple()) * count
+
+
+    __rmul__ = __mul__
+
+
+    def __imul__(self, count):
+        items = self._edit()
+        items *= count
+        return self
+
+
+    def append(self, item):
+        self._edit().append(item)
+
+
+    def extend(self, items):
+        self._edit().extend(items)
+
+
+    def insert(self, index, item):
+        self._edit().insert(index, item)
+
+
+    def pop(self, index=-1):
+        return self._edit().pop(index)
+
+
+    def remove(self, item):
+        self._edit().remove(item)
+
+
+    def clear(self):
+        self._edited = []
+
+
+    def reverse(self):
+        self._edit().reverse()
+
+
+    def sort(self, key=None, reverse=False):
+        self._edit().sort(key=key, reverse=reverse)
+
+
+    def index(self, item, *args):
+        return self._tuple().index(item, *args)
+
+
+    def count(self, item):
+        return self._tuple().count(item)
+
+
+    def copy(self):
+        return DeepPath(self._tuple())
+
+
+    def __reduce__(self):
+        return DeepPath, (self._tuple(),)
+
+
     def sub(self, sub_item):
         """Returns a new path, extended by the supplied sub item.  The
-        returned path is a copy and does not affect the path the
+        returned path is a new object and does not affect the path the
         method is called on.
 
         This method is used when calling the deep...() functions
-        recursively, to construct the path to the sub item.
+        recursively, to construct the path to the sub item.  It takes
+        constant time, as the new path just references this one as its
+        parent (unless this path has been modified in place, in which
+        case its items are copied into a new parent).
         """
 
-        return DeepPath(self + [sub_item])
+        parent = self if self._edited is None else DeepPath(self._edited)
+
+        path = _new_path(DeepPath)
+        path._parent = parent
+        path._item = sub_item
+        path._len = parent._len + 1
+        path._items = None
+        path._edited = None
+        return path
 
 
     def startswith(self, test_path):
@@ -46,18 +319,30 @@ class DeepPath(list):
         items - typically it's a list of path items as strings).
         """
 
+        test_path = tuple(test_path)
+
+        # a path modified in place has no chain of parents to walk, so
+        # we just compare the start of its items
+        if self._edited is not None:
+            return tuple(self._edited[:len(test_path)]) == test_path
+
         # if the length of the test path is greater than my our path,
         # we're definitely not inside it
-        if len(test_path) > len(self):
+        if len(test_path) > self._len:
             return False
 
-        # compare items up to the length of the test path (because
-        # zip() only returns up to the length of the shortest iterable)
-        # with our path to see if they're the same, up to that point -
-        # if any don't match at any point, we're not inside it
-        for my_item, test_item in zip(self, test_path):
-            if my_item != test_item:
-                return False
+        # walk up the chain of parents to the path with the same length
+        # as the test path and compare it with that - if they're the
+        # same, we're inside the test path
+        path = self
+        for i in range(self._len - len(test_path)):
+            path = path._parent
+
+        return path._tuple() == test_path
+
+
+
+# shortcut to create a new DeepPath object without calling __init__(),
+# used by sub() for speed
 
-        # if we get here, we're inside the test path
-        return True
+_new_path = object.__new__
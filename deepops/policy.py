@@ -0,0 +1,305 @@
+# deepops.policy
+
+
+
+class _Any:
+    """Class of the ANY wildcard object, below."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "ANY"
+
+
+    def __reduce__(self):
+        # pickle as a reference to the module-level object, so it's
+        # still the same object when unpickled
+        return "ANY"
+
+
+
+# wildcard used in the patterns of a DeepPolicy to match any single
+# item in a path
+
+ANY = _Any()
+
+
+# the options which can be set in a DeepPolicy and their default
+# values (which will be used unless overridden by the arguments to the
+# function or the policy)
+
+_OPTIONS = {
+    "skip": False,
+    "replace": True,
+    "list_as_set": False,
+    "list_edits": False,
+    "list_key": None,
+    "change_types": False,
+}
+
+
+
+class _PolicyNode:
+    """A node in the trie of patterns in a DeepPolicy."""
+
+    __slots__ = ("children", "any", "options", "specificity")
+
+
+    def __init__(self, specificity):
+        # the child nodes for specific path items
+        self.children = {}
+
+        # the child node for the ANY wildcard
+        self.any = None
+
+        # the options set by patterns ending at this node (or None)
+        self.options = None
+
+        # the number of non-wildcard items in the pattern to this node
+        # - used to give more specific patterns precedence
+        self.specificity = specificity
+
+
+
+class _PolicyState:
+    """This class represents the position in a DeepPolicy at a
+    particular path during a traversal, giving the options in effect at
+    that path (as attributes) and the nodes in the trie of patterns
+    which (so far) match the path.
+
+    The state for a sub item is obtained with sub(), which caches the
+    result, so each distinct step is only worked out once, and then
+    takes constant time.
+    """
+
+    __slots__ = tuple(_OPTIONS) + ("_nodes", "_next", "_any_next")
+
+
+    def __init__(self, nodes, options):
+        # we only keep the nodes which could match anything further
+        # down
+
+        self._nodes = [ node for node in nodes if node.children or node.any ]
+
+        for name, value in options.items():
+            setattr(self, name, value)
+
+        # cache of the states for specific sub items, and for sub items
+        # only matching ANY wildcards
+
+        self._next = {}
+        self._any_next = None
+
+
+    def _options(self):
+        """Returns the options in effect at this state, as a
+        dictionary.
+        """
+
+        return { name: getattr(self, name) for name in _OPTIONS }
+
+
+    def _make_sub(self, nodes):
+        """Creates the state for a sub item, given the trie nodes
+        matched by the sub item.  The options are inherited from this
+        state (except list_key, which only applies at the path of the
+        keyed list itself, not to lists inside its items) and then
+        updated with the options of any patterns ending at the matching
+        nodes, in increasing order of specificity.
+        """
+
+        options = self._options()
+        options["list_key"] = None
+
+        for node in sorted(nodes, key=lambda n: n.specificity):
+            if node.options:
+                options.update(node.options)
+
+        return _PolicyState(nodes, options)
+
+
+    def sub(self, sub_item):
+        """Returns the state for 'sub_item' within the path of this
+        state.
+        """
+
+        # if no patterns could match any deeper, the state will never
+        # change (unless this is a keyed list, as list_key isn't
+        # inherited)
+
+        if (not self._nodes) and (self.list_key is None):
+            return self
+
+
+        state = self._next.get(sub_item)
+        if state is not None:
+            return state
+
+
+        # find the nodes matching this item specifically - if there are
+        # none, the state only depends on the wildcards, so is the same
+        # for all such items and can be cached once
+
+        exact_nodes = [ node.children[sub_item] for node in self._nodes
+                            if sub_item in node.children ]
+
+        if not exact_nodes:
+            if self._any_next is None:
+                self._any_next = self._make_sub(
+                    [ node.any for node in self._nodes if node.any ])
+
+            return self._any_next
+
+
+        state = self._make_sub(
+            exact_nodes + [ node.any for node in self._nodes if node.any ])
+
+        self._next[sub_item] = state
+
+        return state
+
+
+
+class DeepPolicy:
+    """This class holds a compiled set of rules specifying options
+    for particular paths, which are used by deepdiff(), deepmerge() and
+    deepremoveitems() in place of (or as well as) a filter_func.
+
+    Each rule consists of a pattern, giving a path (as a sequence of
+    path items, where ANY matches any single item), and a dictionary
+    of options, which apply at that path and everything below it
+    (unless overridden by a rule for a path further down).  Where
+    several rules match the same path, the options of the rules with
+    more specific (non-ANY) items take precedence.
+
+    The available options are:
+
+    skip -- if True, the path (and everything below it) is skipped, as
+    if a filter_func had returned False for it.
+
+    replace, list_as_set, list_edits, change_types -- these override
+    the argument of the same name to the function called (see those
+    functions for information).  Setting replace to False keeps the
+    values in 'a' when merging.
+
+    list_key -- the name of the key field for a keyed list at that path
+    (see deepdiff()): unlike the other options, this applies only at
+    that path, not to the lists below it.
+
+    The rules are compiled into a trie of patterns, which is traversed
+    alongside the structures being processed: the state for each step
+    is cached, so checking the policy is a constant time operation for
+    each item, rather than calling back into a Python function.  The
+    same policy object can be reused over many calls.
+    """
+
+
+    def __init__(self, rules=()):
+        """Initialises the policy with an iterable of rules, each a
+        tuple of (pattern, options), or a dictionary mapping patterns
+        to options.
+        """
+
+        if isinstance(rules, dict):
+            rules = rules.items()
+
+        self.rules = []
+        self._root = _PolicyNode(0)
+
+        # the root states, keyed on the tuple of default options they
+        # were created with
+
+        self._root_states = {}
+
+        for pattern, options in rules:
+            self.add(pattern, options)
+
+
+    def add(self, pattern, options):
+        """Adds a rule to the policy, for the path 'pattern', setting
+        the specified dictionary of 'options'.
+        """
+
+        for name in options:
+            if name not in _OPTIONS:
+                raise ValueError("DeepPolicy unknown option: %s" % name)
+
+        node = self._root
+        specificity = 0
+
+        for item in pattern:
+            if item is ANY:
+                if node.any is None:
+                    node.any = _PolicyNode(specificity)
+                node = node.any
+
+            else:
+                specificity += 1
+                if item not in node.children:
+                    node.children[item] = _PolicyNode(specificity)
+                node = node.children[item]
+
+        if node.options is None:
+            node.options = {}
+        node.options.update(options)
+
+        self.rules.append((tuple(pattern), dict(options)))
+
+
+        # any existing states will be out of date, so throw them away
+
+        self._root_states = {}
+
+
+    def _root_state(self, **defaults):
+        """Returns the state at the root of the policy, where the
+        options are the defaults for all the options, overridden by
+        the specified 'defaults' (typically the arguments to the
+        function being called) and then the options of any rules for
+        the root path.
+        """
+
+        key = tuple(sorted(defaults.items()))
+
+        state = self._root_states.get(key)
+
+        if state is None:
+            options = dict(_OPTIONS)
+            options.update(defaults)
+
+            if self._root.options:
+                options.update(self._root.options)
+
+            state = _PolicyState([self._root], options)
+            self._root_states[key] = state
+
+        return state
+
+
+
+# policy with no rules, used when none is supplied
+
+_EMPTY_POLICY = DeepPolicy()
+
+
+
+def _policy_state(policy, list_keys, **defaults):
+    """Returns the root state for a call to one of the deep...()
+    functions, given the 'policy' and 'list_keys' arguments (either of
+    which may be None) and the other arguments to the function, as
+    'defaults'.
+
+    The list_keys argument (a dictionary mapping paths to key fields)
+    is converted to rules, added to the policy.
+    """
+
+    if list_keys:
+        policy = DeepPolicy(
+            (policy.rules if policy else [])
+                + [ (path, { "list_key": key })
+                        for path, key in list_keys.items() ])
+
+    elif policy is None:
+        policy = _EMPTY_POLICY
+
+    return policy._root_state(**defaults)
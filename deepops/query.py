@@ -0,0 +1,246 @@
+# deepops.query
+
+
+
+from functools import lru_cache
+import re
+
+from .policy import ANY
+from .types import _CONTAINERS, _KINDS
+
+
+
+class _AnyDepth:
+    """Class of the ANY_DEPTH wildcard object, below."""
+
+    __slots__ = ()
+
+    def __repr__(self):
+        return "ANY_DEPTH"
+
+
+    def __reduce__(self):
+        # pickle as a reference to the module-level object, so it's
+        # still the same object when unpickled
+        return "ANY_DEPTH"
+
+
+
+# wildcard used in query expressions to match any number of levels
+# (including none) in a path - the ANY wildcard (from deepops.policy)
+# matches exactly one level
+
+ANY_DEPTH = _AnyDepth()
+
+
+# maximum number of compiled expressions to keep in the cache
+
+_CACHE_SIZE = 256
+
+
+# an integer item in a query string: only ASCII digits, with an
+# optional minus sign (str.isdigit() also accepts other Unicode digits,
+# which int() rejects, and stripping all the leading '-' accepted
+# '--1')
+
+_INDEX_RE = re.compile(r"-?[0-9]+")
+
+
+
+def _parse(expr):
+    """Parses a query expression string into a tuple of path items,
+    splitting it on '.', with '*' converted to ANY, '**' to ANY_DEPTH
+    and integers (including negative ones) to int.  An item in double
+    quotes is a string key, with the quotes removed, so keys which
+    would otherwise be taken as one of those can be given (e.g. '"0"'
+    or '"*"').
+    """
+
+    items = []
+
+    for item in expr.split("."):
+        if (len(item) >= 2) and item.startswith('"') and item.endswith('"'):
+            items.append(item[1:-1])
+
+        elif item == "*":
+            items.append(ANY)
+
+        elif item == "**":
+            items.append(ANY_DEPTH)
+
+        elif _INDEX_RE.fullmatch(item):
+            items.append(int(item))
+
+        else:
+            items.append(item)
+
+    return tuple(items)
+
+
+
+def _emit(node, out):
+    """The final step of every compiled query, which adds the matching
+    node to the list of results.
+    """
+
+    out.append(node)
+
+
+
+def _key_step(key, next_step):
+    """Returns a step matching a dictionary key."""
+
+    def step(node, out):
+        if (_KINDS[type(node)] is dict) and (key in node):
+            next_step(node[key], out)
+
+    return step
+
+
+
+def _index_step(index, next_step):
+    """Returns a step matching an integer, which indexes a list, or is
+    a key in a dictionary.
+    """
+
+    def step(node, out):
+        kind = _KINDS[type(node)]
+
+        if kind is list:
+            if -len(node) <= index < len(node):
+                next_step(node[index], out)
+
+        elif (kind is dict) and (index in node):
+            next_step(node[index], out)
+
+    return step
+
+
+
+def _any_step(next_step):
+    """Returns a step matching every value in a dictionary, or every
+    item in a list or set.
+    """
+
+    def step(node, out):
+        container = _CONTAINERS[type(node)]
+
+        if container is None:
+            return
+
+        if container.kind is dict:
+            for key, value in container.iterate(node):
+                next_step(value, out)
+
+        else:
+            for value in container.iterate(node):
+                next_step(value, out)
+
+    return step
+
+
+
+def _any_depth_step(next_step):
+    """Returns a step matching a node and every node below it, at any
+    depth, in depth-first order.  An explicit stack is used, so there is
+    no limit on the depth.
+    """
+
+    def step(node, out):
+        stack = [node]
+
+        while stack:
+            node = stack.pop()
+
+            next_step(node, out)
+
+            container = _CONTAINERS[type(node)]
+
+            if container is None:
+                continue
+
+            if container.kind is dict:
+                stack.extend(reversed([ value for key, value
+                                            in container.iterate(node) ]))
+
+            elif container.kind is list:
+                stack.extend(reversed(list(container.iterate(node))))
+
+            else:
+                stack.extend(container.iterate(node))
+
+    return step
+
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def compile_query(expr):
+    """Compiles a query expression into a function, which takes a
+    nested data structure and returns a list of the values matching the
+    expression, in the order they were found.
+
+    The expression is either a string of path items, separated by '.'
+    (e.g. "interfaces.*.addresses.0"), or a tuple of path items (which
+    allows keys which contain '.', or non-string keys).  In a string,
+    '*' matches any single item, '**' matches any number of levels
+    (including none) and an integer indexes a list (or is an integer
+    key in a dictionary).  An item in double quotes is always a string
+    key, so 'ports."80"' matches the key "80", rather than index 80 (a
+    key containing '.' still needs the tuple form).  In a tuple, ANY
+    and ANY_DEPTH are used as the wildcards and items are used as they
+    are.
+
+    As with the other functions, the dictionaries, lists and sets
+    which are looked into are the types handled as containers (see
+    register_container()): anything else, including tuples, is a
+    value.
+
+    Each path item is compiled into a specialised function, chained
+    together, and the compiled expressions are cached, so repeatedly
+    querying with the same expression does not parse it again.
+    """
+
+    items = _parse(expr) if isinstance(expr, str) else expr
+
+
+    # build the chain of steps, from the end of the expression back to
+    # the start, with each step calling the next
+
+    step = _emit
+
+    for item in reversed(items):
+        if item is ANY:
+            step = _any_step(step)
+
+        elif item is ANY_DEPTH:
+            step = _any_depth_step(step)
+
+        elif isinstance(item, int) and not isinstance(item, bool):
+            step = _index_step(item, step)
+
+        else:
+            step = _key_step(item, step)
+
+
+    first_step = step
+
+    def query(d):
+        out = []
+        first_step(d, out)
+        return out
+
+    return query
+
+
+
+def deepquery(d, expr):
+    """Returns a list of the values in the nested data structure 'd'
+    matching the query expression 'expr'.  See compile_query() for the
+    format of the expression.
+
+    Unlike deepget(), this can use wildcards and index into lists.
+    Paths which don't exist simply don't match (no exception is
+    raised).
+    """
+
+    return compile_query(expr)(d)
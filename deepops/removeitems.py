@@ -2,25 +2,56 @@
 
 
 
+from .keyedlist import _index_keyed_list
 from .path import DeepPath
+from .policy import _policy_state
+from .types import _KINDS, _check_writable
+from .undo import _UndoLog
+from .walk import _recurse, _walk
 
 
 
-def _deepremoveitems(a, b, filter_func, path=DeepPath()):
+def _record_remove(undo, a, item):
+    """Records the removal of 'item' from the list or set 'a' in the
+    _UndoLog 'undo' (for a list, this is the first matching item, as
+    removed by list.remove()).
+    """
+
+    if _KINDS[type(a)] is list:
+        undo.remove_list_item(a, a.index(item))
+    else:
+        undo.remove_set_item(a, item)
+
+
+
+def _deepremoveitems(a, b, state, filter_func, undo=None, path=DeepPath()):
     """Backend function for deepremoveitems() that does the actual
     work.  It is defined privately to not offer the 'path' argument.
 
+    This is a generator function, to be run with _walk(): recursive
+    calls are made by yielding the generator for the call.
+
     See deepremoveitems() for information.
 
     Keyword arguments (in addition to deepremoveitems()):
 
+    state -- the state of the DeepPolicy for this path, giving the
+    options to use (this replaces the 'policy' argument)
+
+    undo -- if this is specified, it is an _UndoLog object, in which
+    the changes made are recorded, so they can be rolled back
+
     path -- a DeepPath() object representing the position in the
     structures for this call.
     """
 
 
-    # if a filter function was supplied call it and return without
-    # doing anything, if it returns False
+    # if the policy says to skip this path, or a filter function was
+    # supplied call it, return without doing anything, if it returns
+    # False
+
+    if state.skip:
+        return
 
     if filter_func:
         if not filter_func(path, a, b):
@@ -32,20 +63,73 @@ def _deepremoveitems(a, b, filter_func, path=DeepPath()):
     # them from (we'll check for that later), so just abort with an
     # exception
 
-    if not isinstance(b, (list, set, dict)):
+    a_kind = _KINDS[type(a)]
+    b_kind = _KINDS[type(b)]
+
+    if b_kind is None:
         raise TypeError("deepremoveitems at: %s cannot remove simple type: %s"
                             % (path, type(b)))
 
+    _check_writable(a, path, "deepremoveitems")
+
+
+    # if the object we're removing from is a keyed list of
+    # dictionaries, and the object specifying what to remove is a list
+    # of dictionaries containing the key field, we match up the items
+    # by the value of their key field and remove the entire item, if
+    # the only field is the key field, or remove the other fields from
+    # the item, recursively, if not
+
+    key = None
+    if (a_kind is list) and (b_kind is list):
+        key = state.list_key
+
+    if key is not None:
+        a_index = _index_keyed_list(a, key, path, "deepremoveitems")
+
+        remove_ids = set()
+
+        for k, b_item in _index_keyed_list(
+                             b, key, path, "deepremoveitems").items():
+
+            if k not in a_index:
+                continue
+
+            if len(b_item) == 1:
+                remove_ids.add(id(a_index[k]))
+
+            else:
+                yield from _recurse(
+                    _deepremoveitems(
+                        a_index[k],
+                        type(b_item)((f, v) for f, v in b_item.items()
+                                         if f != key),
+                        state.sub(k), filter_func, undo, path.sub(k)),
+                    path)
+
+
+        # remove the entire items in a single pass (rather than calling
+        # remove() for each one, which would be quadratic)
+
+        if remove_ids:
+            if undo:
+                undo.replace_list(a)
+
+            a[:] = [ item for item in a if id(item) not in remove_ids ]
+
 
     # if the object we're removing from is a list or set...
 
-    if isinstance(a, (list, set)):
+    elif a_kind in (list, set):
         # ... and the object specifying what to remove is also a list or
         # set, we just remove any items that are in the removal list
 
-        if isinstance(b, (list, set)):
+        if b_kind in (list, set):
             for item in b:
                 if item in a:
+                    if undo:
+                        _record_remove(undo, a, item)
+
                     a.remove(item)
 
 
@@ -63,6 +147,9 @@ def _deepremoveitems(a, b, filter_func, path=DeepPath()):
             for item in b:
                 if not b[item]:
                     if item in a:
+                        if undo:
+                            _record_remove(undo, a, item)
+
                         a.remove(item)
 
                 else:
@@ -75,13 +162,16 @@ def _deepremoveitems(a, b, filter_func, path=DeepPath()):
 
     # if the object we're removing from is a dictionary...
 
-    elif isinstance(a, dict):
+    elif a_kind is dict:
         # ... and the object specifying what to remove is a list or set,
         # we just remove the keys in that list or set, if they exist
 
-        if isinstance(b, (list, set)):
+        if b_kind in (list, set):
             for item in b:
-                if item in a:
+                if (item in a) and (not state.sub(item).skip):
+                    if undo:
+                        undo.pop_item(a, item)
+
                     a.pop(item)
 
 
@@ -99,11 +189,22 @@ def _deepremoveitems(a, b, filter_func, path=DeepPath()):
         else:
             for item in b:
                 if item in a:
+                    sub_state = state.sub(item)
+
+                    if sub_state.skip:
+                        continue
+
                     if not b[item]:
+                        if undo:
+                            undo.pop_item(a, item)
+
                         a.pop(item)
                     else:
-                        _deepremoveitems(a[item], b[item], filter_func,
-                                         path.sub(item))
+                        yield from _recurse(
+                            _deepremoveitems(a[item], b[item], sub_state,
+                                             filter_func, undo,
+                                             path.sub(item)),
+                            path)
 
 
     # if the object we're removing from is not one of the above -
@@ -118,7 +219,9 @@ def _deepremoveitems(a, b, filter_func, path=DeepPath()):
 
 
 
-def deepremoveitems(a, b, filter_func=None):
+def deepremoveitems(a, b, filter_func=None, list_keys=None, policy=None,
+                    atomic=False):
+
     """Recursively remove items from nested object 'b' from nested
     object 'a', modifying object 'a' in place.  Both 'a' and 'b' must
     be compound types (a list, set or dictionary) at the top level and
@@ -144,6 +247,13 @@ def deepremoveitems(a, b, filter_func=None):
     cannot be used instead of an empty dictionary: they will remove
     no items from the corresponding item.
 
+    Where 'a' is a list at a path given in list_keys, and 'b' is a
+    list, they are handled as 'keyed lists' of dictionaries (see
+    deepdiff()): each item in 'b' is matched up with the item in 'a'
+    with the same value of the key field; if it contains only the key
+    field, the entire item is removed, otherwise the other fields are
+    removed from the item, recursively.
+
     If there are mismatches, violating the above rules, a TypeError()
     or ValueError() exception is raised.
 
@@ -164,6 +274,33 @@ def deepremoveitems(a, b, filter_func=None):
     act on this level or skip it: it can be used to filter at specific
     levels, perform some other action or raise an exception, if a
     particular level is problematic
+
+    list_keys -- if this is specified, it is a dictionary mapping paths
+    (as tuples of path items, where the items of a keyed list are given
+    by the value of their key field) to the name of the key field in
+    the items of the list at that path, for lists to be handled as
+    keyed lists (see deepdiff())
+
+    policy -- if this is specified, it is a DeepPolicy object, giving
+    options for particular paths (only 'skip' and 'list_key' are used
+    by this function), allowing paths to be skipped, without calling a
+    filter_func
+
+    atomic -- if this is True, and an exception is raised part way
+    through (e.g. because of a mismatch in the types, or from a
+    filter_func), the items already removed from 'a' are put back
+    before the exception is passed on, so 'a' is left unchanged (see
+    deepmerge())
     """
 
-    _deepremoveitems(a, b, filter_func)
+    undo = _UndoLog() if atomic else None
+
+    try:
+        _walk(_deepremoveitems(a, b, _policy_state(policy, list_keys),
+                               filter_func, undo))
+
+    except BaseException:
+        if undo:
+            undo.rollback()
+
+        raise
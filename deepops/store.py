@@ -0,0 +1,334 @@
+# deepops.store
+
+
+
+from bisect import bisect_right
+from copy import copy as _copy, deepcopy
+
+from .diff import deepdiff
+from .merge import deepmerge
+from .removeitems import deepremoveitems
+from .types import _CONTAINERS, _KINDS
+from .walk import _DIRECT_LEVELS, _walk
+
+
+
+def _size(obj):
+    """Returns the number of items in nested object 'obj' (counting
+    each compound object, and each item in it), as a rough measure of
+    how much memory it takes and how long it takes to copy or apply.
+    The compound objects are those handled as containers (see
+    register_container()).
+    """
+
+    count = 0
+    stack = [obj]
+
+    while stack:
+        obj = stack.pop()
+
+        container = _CONTAINERS[type(obj)]
+
+        if container is not None:
+            items = list(container.iterate(obj))
+            count += len(items)
+
+            if container.kind is dict:
+                stack.extend(value for key, value in items)
+            else:
+                stack.extend(items)
+
+        count += 1
+
+    return count
+
+
+
+# the types of simple value which copy.deepcopy() returns as they are
+# (so they can just be left in place, in the copy of their container)
+
+_ATOMIC_TYPES = frozenset((type(None), bool, int, float, complex, str, bytes))
+
+
+
+def _deepcopy(obj, memo, depth=0):
+    """Returns a deep copy of 'obj', as copy.deepcopy() would, but the
+    compound objects (see register_container()) are copied by walking
+    them, rather than recursively, so the depth of the object is not
+    limited by the recursion limit.  Everything else (simple values,
+    read-only containers and the items in sets, which must be
+    hashable) is copied with copy.deepcopy(), sharing the 'memo'
+    dictionary, so objects which appear more than once in 'obj' are
+    only copied once, as with copy.deepcopy().
+
+    This is a generator function, to be run with _walk(): as with
+    _recurse(), recursive calls are made directly, with 'yield from',
+    except for one level in every _DIRECT_LEVELS, where the generator
+    for the call is yielded ('depth' is the depth of 'obj' within the
+    object being copied, to count the levels).
+    """
+
+    container = _CONTAINERS[type(obj)]
+
+    if (container is None) or container.readonly or (container.kind is set):
+        return deepcopy(obj, memo)
+
+    if id(obj) in memo:
+        return memo[id(obj)]
+
+
+    # the object is copied and then the items in the copy replaced with
+    # copies of them, so the type of the object is kept (as with
+    # copy.deepcopy()) - atomic values are left as they are
+
+    copied = _copy(obj)
+    memo[id(obj)] = copied
+
+    if container.kind is dict:
+        items = container.iterate(obj)
+    else:
+        items = enumerate(container.iterate(obj))
+
+    depth += 1
+
+    for k, v in items:
+        if _KINDS[type(v)] is not None:
+            if depth % _DIRECT_LEVELS:
+                copied[k] = yield from _deepcopy(v, memo, depth)
+            else:
+                copied[k] = yield _deepcopy(v, memo, depth)
+
+        elif type(v) not in _ATOMIC_TYPES:
+            copied[k] = deepcopy(v, memo)
+
+    return copied
+
+
+
+def _copy_object(obj):
+    """Returns a deep copy of 'obj', using _deepcopy()."""
+
+    return _walk(_deepcopy(obj, {}))
+
+
+
+def _check_types(path, a, b):
+    """Filter function for deepdiff(), which raises a TypeError if an
+    item changes between a compound and a simple type: deepdiff() will
+    give a delta for this (with change_types), but deepmerge() can't
+    apply it.
+    """
+
+    if (_KINDS[type(a)] is None) != (_KINDS[type(b)] is None):
+
+        raise TypeError("DeepVersionStore at: %s cannot store change of "
+                        "type: %s to: %s" % (path, type(a), type(b)))
+
+    return True
+
+
+
+class DeepVersionStore:
+    """This class stores a sequence of versions of a nested compound
+    object (such as a configuration document), taking much less memory
+    than keeping a full copy of each one.
+
+    Versions are added with commit() and numbered from 0.  A full copy
+    (a 'checkpoint') is kept of the first version and of some later
+    ones; the other versions are stored as the difference from the
+    previous version (a 'delta', as returned by deepdiff(), with
+    change_types and list_edits set).
+
+    To retrieve a version, with get(), the nearest checkpoint at or
+    before it is found (with a binary search, over the list of
+    checkpoints) and copied, and the deltas after that applied to it,
+    in turn.
+
+    Checkpoints are placed adaptively: a new one is taken when the
+    total size of the deltas since the last checkpoint reaches
+    'checkpoint_ratio' times the size of the new version (so applying
+    them would be about as much work as copying the version, and would
+    take about as much memory to store).  Documents which change a
+    little at a time thus get few checkpoints, and ones which change a
+    lot, more.  The number of deltas between checkpoints can also be
+    limited with 'max_chain', bounding the time taken by get().
+
+    The store also keeps a copy of the latest version, to compare the
+    next one against and to return it quickly.  The objects committed
+    are copied, so they can be modified afterwards, and the objects
+    returned are new copies, which can be modified by the caller.
+    """
+
+
+    def __init__(self, list_as_set=False, list_keys=None, policy=None,
+                 checkpoint_ratio=1.0, max_chain=None):
+        """The 'list_as_set', 'list_keys' and 'policy' arguments are
+        passed to deepdiff(), deepremoveitems() and deepmerge(), to
+        compute and apply the deltas (note that list_as_set will
+        ignore changes in the order of lists).
+
+        Keyword arguments (in addition):
+
+        checkpoint_ratio -- the total size of the deltas since the last
+        checkpoint, as a proportion of the size of the version, at
+        which a new checkpoint is taken
+
+        max_chain -- if this is specified, it is the maximum number of
+        deltas to be stored between checkpoints
+        """
+
+        self.list_as_set = list_as_set
+        self.list_keys = list_keys
+        self.policy = policy
+        self.checkpoint_ratio = checkpoint_ratio
+        self.max_chain = max_chain
+
+        # the version numbers with checkpoints (in ascending order, for
+        # searching) and the copies of those versions, keyed on the
+        # version number
+
+        self._checkpoints = []
+        self._snapshots = {}
+
+        # the delta to get from the previous version to each version,
+        # in a list indexed by version number (None for checkpoints)
+
+        self._deltas = []
+
+        # the copy of the latest version and the total size of the
+        # deltas since the last checkpoint
+
+        self._head = None
+        self._chain_size = 0
+
+
+    def __len__(self):
+        return len(self._deltas)
+
+
+    def _apply(self, obj, delta):
+        """Applies a delta to 'obj', in place.  The delta is copied, so
+        the items added aren't shared with the stored delta (which
+        would be modified, when the next delta is applied).
+        """
+
+        remove_items, update_items = delta
+
+        deepremoveitems(obj, remove_items, list_keys=self.list_keys,
+                        policy=self.policy)
+
+        deepmerge(obj, _copy_object(update_items),
+                  list_as_set=self.list_as_set, change_types=True,
+                  list_keys=self.list_keys, policy=self.policy)
+
+
+    def _diff(self, obj):
+        """Returns the delta from the latest version to 'obj', or None,
+        if one cannot be computed, in which case a checkpoint must be
+        used.
+
+        This happens when the type of a compound item has changed, or
+        an item has changed between a compound and a simple type.
+        """
+
+        if type(obj) is not type(self._head):
+            return None
+
+        try:
+            delta = deepdiff(self._head, obj, list_as_set=self.list_as_set,
+                             change_types=True, filter_func=_check_types,
+                             list_edits=True, list_keys=self.list_keys,
+                             policy=self.policy)
+
+        except TypeError:
+            return None
+
+        # the delta shares items with the objects, so it's copied to be
+        # kept, independently (with the same memo for both parts, so any
+        # items they share are still shared, as with copy.deepcopy())
+
+        memo = {}
+
+        return tuple(_walk(_deepcopy(items, memo)) for items in delta)
+
+
+    def commit(self, obj):
+        """Adds a copy of 'obj' to the store, as a new version, and
+        returns the number of the new version.
+        """
+
+        version = len(self._deltas)
+
+        delta = self._diff(obj) if version else None
+
+        head = _copy_object(obj)
+
+        if delta is not None:
+            delta_size = sum(_size(items) for items in delta)
+
+            if ((self._chain_size + delta_size
+                 >= self.checkpoint_ratio * _size(head))
+
+                or ((self.max_chain is not None)
+                    and (version - self._checkpoints[-1] > self.max_chain))):
+
+                delta = None
+
+        if delta is None:
+            # the checkpoint shares the copy with the head (which is
+            # never modified: it's replaced with each new version)
+
+            self._checkpoints.append(version)
+            self._snapshots[version] = head
+            self._chain_size = 0
+
+        else:
+            self._chain_size += delta_size
+
+        self._deltas.append(delta)
+        self._head = head
+
+        return version
+
+
+    def get(self, version=-1):
+        """Returns a copy of the specified version of the object (by
+        default, the latest).  Negative version numbers count back from
+        the latest version, as for list indices.
+
+        An IndexError is raised if the version does not exist.
+        """
+
+        num_versions = len(self._deltas)
+
+        if version < 0:
+            version += num_versions
+
+        if not 0 <= version < num_versions:
+            raise IndexError("DeepVersionStore version: %d out of range"
+                                 % version)
+
+        if version == num_versions - 1:
+            return _copy_object(self._head)
+
+
+        # find the last checkpoint at or before the version, then apply
+        # the deltas from there
+
+        checkpoint = self._checkpoints[
+                         bisect_right(self._checkpoints, version) - 1]
+
+        obj = _copy_object(self._snapshots[checkpoint])
+
+        for delta in self._deltas[checkpoint + 1 : version + 1]:
+            self._apply(obj, delta)
+
+        return obj
+
+
+    def checkpoints(self):
+        """Returns a list of the version numbers which are stored as
+        checkpoints (full copies), rather than deltas.
+        """
+
+        return list(self._checkpoints)
@@ -0,0 +1,685 @@
+# deepops.tracked
+
+
+
+from .types import _CONTAINERS, _KINDS
+from .walk import _walk
+
+
+
+# marker for a key which was not present in a dictionary
+
+_MISSING = object()
+
+
+
+class _Tracked:
+    """Base class for the tracked containers below, holding the methods
+    common to all of them.
+
+    Each tracked container records the changes made to it directly
+    and holds a link to its parent container (and the key it's stored
+    under there).  When a container first changes, it notifies its
+    parent, which records that the child has changed, and so on, up to
+    the top: this means the changes can be found by following only the
+    containers which have changed, rather than comparing everything.
+    """
+
+    __slots__ = ()
+
+
+    def _init_tracking(self, parent, key):
+        """Initialises the tracking attributes common to all the tracked
+        containers, linking it to the 'parent' container, under 'key'.
+        """
+
+        self._parent = parent
+        self._key = key
+        self._dirty = False
+        self._reset()
+
+
+    def _touch(self):
+        """Called before a change is made to this container: if this is
+        the first change, the parent is notified.
+        """
+
+        if not self._dirty:
+            self._dirty = True
+
+            if self._parent is not None:
+                self._parent._child_changed(self._key, self)
+
+
+    def changes(self):
+        """Returns the changes made to this container (and those inside
+        it) since it was created (or clear_changes() was last called),
+        as a tuple (remove_items, update_items), in the same form as
+        returned by deepdiff().
+
+        This takes time proportional to the number of changes, rather
+        than the size of the container.  The items in the result are
+        not copied, so will be the same objects as those stored in the
+        container.
+        """
+
+        return _walk(_tracked_changes(self))
+
+
+    def clear_changes(self):
+        """Forgets the changes made to this container (and those inside
+        it), so that subsequent calls to changes() will only return
+        changes made after this point.
+        """
+
+        # we only need to visit the containers which have changed: in a
+        # dictionary, these are the children which have changed, or
+        # been stored, but, in a list, we don't know which children have
+        # changed, so have to check them all
+
+        stack = [self]
+
+        while stack:
+            container = stack.pop()
+
+            if isinstance(container, TrackedDict):
+                children = (
+                    dict.get(container, key) for key in
+                        container._dirty_keys.union(container._orig))
+
+            elif isinstance(container, TrackedList):
+                children = list.__iter__(container)
+
+            else:
+                children = ()
+
+            stack.extend(child for child in children
+                             if isinstance(child, _Tracked)
+                                 and child._dirty
+                                 and (child._parent is container))
+
+            container._dirty = False
+            container._reset()
+
+
+
+class TrackedDict(_Tracked, dict):
+    """A dictionary which records the changes made to it (and to the
+    tracked containers inside it), so these can be retrieved with
+    changes() in the same form as deepdiff() returns, without keeping
+    a copy of the original and comparing it.
+
+    Any dictionaries, lists or sets stored in it are converted to
+    tracked containers (so the objects stored will not be the same as
+    the ones supplied).  Tuples, and anything else, are stored as they
+    are, and changes inside them are not tracked.
+
+    A tracked container should only be stored in one place: if it is
+    stored in several, only changes to it through the most recent
+    location will be tracked.
+    """
+
+    __slots__ = ("_parent", "_key", "_dirty", "_orig", "_dirty_keys")
+
+
+    def __init__(self, *args, **kwargs):
+        dict.__init__(self, *args, **kwargs)
+        self._init_tracking(None, None)
+
+        for key, value in dict.items(self):
+            dict.__setitem__(self, key, _track(value, self, key))
+
+
+    def __reduce__(self):
+        # copies (and unpickled objects) start with no changes
+        return TrackedDict, (dict(self),)
+
+
+    def _reset(self):
+        # the original values of keys which have been set or deleted
+        # (or _MISSING, if the key was not present)
+        self._orig = {}
+
+        # the keys of child containers which have changed
+        self._dirty_keys = set()
+
+
+    def _record(self, key):
+        """Records the original value of 'key', before it is changed
+        (if it has not been changed already).
+        """
+
+        self._touch()
+
+        if key not in self._orig:
+            self._orig[key] = dict.get(self, key, _MISSING)
+
+
+    def _child_changed(self, key, child):
+        # only record the change if the child is still stored here
+
+        if dict.get(self, key, _MISSING) is child:
+            self._touch()
+            self._dirty_keys.add(key)
+
+
+    def _children_changed(self):
+        """Returns an iterator of (key, child) for the child containers
+        which have changed and are still in their original location.
+        """
+
+        for key in self._dirty_keys:
+            child = dict.get(self, key, _MISSING)
+
+            if self._orig.get(key, child) is child:
+                yield key, child
+
+
+    def _unlink(self, key):
+        """Disconnects the child container at 'key' (if it is one) from
+        this dictionary, as it's being removed.
+        """
+
+        child = dict.get(self, key)
+
+        if isinstance(child, _Tracked) and (child._parent is self):
+            child._parent = None
+
+
+    def __setitem__(self, key, value):
+        self._record(key)
+        self._unlink(key)
+        dict.__setitem__(self, key, _track(value, self, key))
+
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+
+        self._record(key)
+        self._unlink(key)
+        dict.__delitem__(self, key)
+
+
+    def pop(self, key, *default):
+        if key not in self:
+            return dict.pop(self, key, *default)
+
+        value = dict.__getitem__(self, key)
+        del self[key]
+        return value
+
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        dict.__setitem__(self, key, value)
+        del self[key]
+        return key, value
+
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+
+        return dict.__getitem__(self, key)
+
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+    def clear(self):
+        for key in list(self):
+            del self[key]
+
+
+
+class TrackedList(_Tracked, list):
+    """A list which records whether it has changed (or any of the
+    tracked containers inside it have), for changes().  As with
+    deepdiff(), a list which has changed is reported as entirely
+    replaced: the contents of the list, when it first changed, are
+    removed and the current contents are updated (added).  This means
+    the first change to a list (or inside it) takes time proportional
+    to its size, as a copy of the list is taken.
+
+    See TrackedDict for information about storing containers.
+    """
+
+    __slots__ = ("_parent", "_key", "_dirty", "_snapshot")
+
+
+    def __init__(self, *args):
+        list.__init__(self, *args)
+        self._init_tracking(None, None)
+
+        for i, value in enumerate(list.__iter__(self)):
+            list.__setitem__(self, i, _track(value, self, None))
+
+
+    def __reduce__(self):
+        # copies (and unpickled objects) start with no changes
+        return TrackedList, (list(self),)
+
+
+    def _reset(self):
+        # a (deep) copy of the list, taken when it first changes
+        self._snapshot = None
+
+
+    def _touch(self):
+        # the copy must be deep, as changes inside the items of the
+        # list (which happen after this) also change the list
+
+        if not self._dirty:
+            self._snapshot = _plain_copy(self)
+
+        _Tracked._touch(self)
+
+
+    def _child_changed(self, key, child):
+        # we can't cheaply check where in the list the child is (and
+        # it doesn't matter, as the whole list is reported as changed)
+
+        self._touch()
+
+
+    def __setitem__(self, index, value):
+        self._touch()
+
+        if isinstance(index, slice):
+            value = [ _track(v, self, None) for v in value ]
+        else:
+            value = _track(value, self, None)
+
+        list.__setitem__(self, index, value)
+
+
+    def __delitem__(self, index):
+        self._touch()
+        list.__delitem__(self, index)
+
+
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+
+    def __imul__(self, n):
+        self._touch()
+        return list.__imul__(self, n)
+
+
+    def append(self, value):
+        self._touch()
+        list.append(self, _track(value, self, None))
+
+
+    def extend(self, values):
+        self._touch()
+        list.extend(self, [ _track(v, self, None) for v in values ])
+
+
+    def insert(self, index, value):
+        self._touch()
+        list.insert(self, index, _track(value, self, None))
+
+
+    def pop(self, *index):
+        self._touch()
+        return list.pop(self, *index)
+
+
+    def remove(self, value):
+        self._touch()
+        list.remove(self, value)
+
+
+    def clear(self):
+        self._touch()
+        list.clear(self)
+
+
+    def sort(self, *args, **kwargs):
+        self._touch()
+        list.sort(self, *args, **kwargs)
+
+
+    def reverse(self):
+        self._touch()
+        list.reverse(self)
+
+
+
+class TrackedSet(_Tracked, set):
+    """A set which records the items added to and removed from it, for
+    changes().
+
+    See TrackedDict for information about storing containers.
+    """
+
+    __slots__ = ("_parent", "_key", "_dirty", "_added", "_removed")
+
+
+    def __init__(self, *args):
+        set.__init__(self, *args)
+        self._init_tracking(None, None)
+
+
+    def __reduce__(self):
+        # copies (and unpickled objects) start with no changes
+        return TrackedSet, (set(self),)
+
+
+    def _reset(self):
+        # the items added and removed since the set was created (an
+        # item removed and then added back again is in neither)
+        self._added = set()
+        self._removed = set()
+
+
+    def add(self, item):
+        if item not in self:
+            self._touch()
+
+            if item in self._removed:
+                self._removed.discard(item)
+            else:
+                self._added.add(item)
+
+            set.add(self, item)
+
+
+    def discard(self, item):
+        if item in self:
+            self._touch()
+
+            if item in self._added:
+                self._added.discard(item)
+            else:
+                self._removed.add(item)
+
+            set.discard(self, item)
+
+
+    def remove(self, item):
+        if item not in self:
+            raise KeyError(item)
+
+        self.discard(item)
+
+
+    def pop(self):
+        item = set.pop(self)
+        set.add(self, item)
+        self.discard(item)
+        return item
+
+
+    def clear(self):
+        for item in list(self):
+            self.discard(item)
+
+
+    def update(self, *others):
+        for other in others:
+            for item in other:
+                self.add(item)
+
+
+    def difference_update(self, *others):
+        for other in others:
+            for item in other:
+                self.discard(item)
+
+
+    def intersection_update(self, *others):
+        keep = set(self).intersection(*others)
+        self.difference_update([ i for i in self if i not in keep ])
+
+
+    def symmetric_difference_update(self, other):
+        for item in set(other):
+            if item in self:
+                self.discard(item)
+            else:
+                self.add(item)
+
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+
+    def __iand__(self, other):
+        self.intersection_update(other)
+        return self
+
+
+    def __isub__(self, other):
+        self.difference_update(other)
+        return self
+
+
+    def __ixor__(self, other):
+        self.symmetric_difference_update(other)
+        return self
+
+
+
+def _tracked_changes(container):
+    """Backend function for changes() that does the actual work.  This
+    is a generator function, to be run with _walk().
+    """
+
+    if isinstance(container, TrackedSet):
+        return set(container._removed), set(container._added)
+
+
+    if isinstance(container, TrackedList):
+        if (not container._dirty) or (container._snapshot == container):
+            return [], []
+
+        return container._snapshot, list(container)
+
+
+    remove_items = {}
+    update_items = {}
+
+
+    # first, the keys which have been set or deleted in this dictionary
+
+    for key, orig in container._orig.items():
+        value = dict.get(container, key, _MISSING)
+
+        # if the key holds the same object it started with, it hasn't
+        # changed (but it might have changed inside, which is handled
+        # below)
+
+        if value is orig:
+            continue
+
+        if value is _MISSING:
+            remove_items[key] = None
+
+        elif orig is _MISSING:
+            update_items[key] = value
+
+        elif ((_KINDS[type(orig)] is not None)
+              or (_KINDS[type(value)] is not None)):
+
+            # a compound value has been replaced (or has replaced a
+            # simple value), so we remove the old value entirely and
+            # add the new one
+
+            remove_items[key] = None
+            update_items[key] = value
+
+        elif (type(orig) != type(value)) or (orig != value):
+            update_items[key] = value
+
+
+    # then the child containers which have changed inside
+
+    for key, child in container._children_changed():
+        remove_subitems, update_subitems = yield _tracked_changes(child)
+
+        if remove_subitems:
+            remove_items[key] = remove_subitems
+
+        if update_subitems:
+            update_items[key] = update_subitems
+
+
+    return remove_items, update_items
+
+
+
+def _plain_copy(obj):
+    """Returns a deep copy of 'obj', with any dictionaries, lists and
+    sets (tracked or not) copied into plain ones.  An explicit stack is
+    used, so the depth is not limited by the recursion limit.
+    """
+
+    def new_container(obj):
+        kind = _KINDS[type(obj)]
+
+        if kind is dict:
+            return {}
+        if kind is list:
+            return []
+        if kind is set:
+            return set(_CONTAINERS[type(obj)].iterate(obj))
+        return None
+
+
+    root = new_container(obj)
+
+    if root is None:
+        return obj
+
+    stack = [(obj, root)]
+
+    while stack:
+        src, dst = stack.pop()
+
+        container = _CONTAINERS[type(src)]
+
+        if container.kind is dict:
+            for key, value in container.iterate(src):
+                copy = new_container(value)
+                dst[key] = value if copy is None else copy
+
+                if isinstance(copy, (dict, list)):
+                    stack.append((value, copy))
+
+        else:
+            for value in container.iterate(src):
+                copy = new_container(value)
+                dst.append(value if copy is None else copy)
+
+                if isinstance(copy, (dict, list)):
+                    stack.append((value, copy))
+
+    return root
+
+
+
+def _convert(obj, parent, key):
+    """Returns a tracked container for 'obj', without converting the
+    items inside it, linked to 'parent' under 'key', and whether its
+    items need converting.  If 'obj' cannot be tracked, it is returned
+    as it is.
+    """
+
+    if isinstance(obj, _Tracked):
+        obj._parent = parent
+        obj._key = key
+        return obj, False
+
+    container = _CONTAINERS[type(obj)]
+
+    if container is None:
+        return obj, False
+
+    # (plain dictionaries and lists are copied directly, which is
+    # quicker than going through their items)
+
+    if container.kind is dict:
+        tracked = TrackedDict.__new__(TrackedDict)
+        dict.update(tracked,
+                    obj if type(obj) is dict else container.iterate(obj))
+
+    elif container.kind is list:
+        tracked = TrackedList.__new__(TrackedList)
+        list.extend(tracked,
+                    obj if type(obj) is list else container.iterate(obj))
+
+    else:
+        tracked = TrackedSet.__new__(TrackedSet)
+        set.update(tracked, container.iterate(obj))
+        tracked._init_tracking(parent, key)
+        return tracked, False
+
+    tracked._init_tracking(parent, key)
+    return tracked, True
+
+
+
+def _track(obj, parent, key):
+    """Converts 'obj' and any dictionaries, lists and sets inside it
+    into tracked containers, linking it to 'parent' under 'key', and
+    returns the result.  An explicit stack is used, so the depth is not
+    limited by the recursion limit.
+    """
+
+    root, convert = _convert(obj, parent, key)
+
+    stack = [root] if convert else []
+
+    while stack:
+        container = stack.pop()
+
+        if isinstance(container, dict):
+            for item_key, value in dict.items(container):
+                tracked, convert = _convert(value, container, item_key)
+                dict.__setitem__(container, item_key, tracked)
+
+                if convert:
+                    stack.append(tracked)
+
+        else:
+            for i, value in enumerate(list.__iter__(container)):
+                tracked, convert = _convert(value, container, None)
+                list.__setitem__(container, i, tracked)
+
+                if convert:
+                    stack.append(tracked)
+
+    return root
+
+
+
+def deeptrack(obj):
+    """This function converts a nested data structure of dictionaries,
+    lists and sets into tracked containers (TrackedDict, TrackedList
+    and TrackedSet), returning the result.  The original structure is
+    not modified.
+
+    Changes made to the returned structure are recorded as they happen
+    and can be retrieved with its changes() method, in the same form
+    as deepdiff() would give, comparing the structure before and after
+    the changes, but in time proportional to the number of changes,
+    rather than the size of the structure.  This is useful where a
+    large structure is changed a little at a time, and the changes
+    need to be found regularly (calling clear_changes() after each
+    time).
+    """
+
+    return _track(obj, None, None)
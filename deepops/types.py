@@ -0,0 +1,240 @@
+# deepops.types
+
+
+
+from copy import copy as _copy
+from operator import contains as _contains, methodcaller as _methodcaller
+
+
+
+# types which are never treated as containers, when matching a type
+# against a registered abstract base class (strings and bytes are
+# sequences, but each item is another string, so they'd recurse
+# forever)
+
+_STRING_TYPES = (str, bytes, bytearray)
+
+
+
+class _ContainerType:
+    """This class holds the information about a registered type of
+    container - see register_container().  The hooks are always set
+    (to the standard operations, if none were given), so they can be
+    called without checking.
+    """
+
+    __slots__ = ("kind", "readonly", "iterate", "contains")
+
+
+    def __init__(self, kind, readonly, iterate, contains):
+        self.kind = kind
+        self.readonly = readonly
+
+        if iterate is None:
+            iterate = _methodcaller("items") if kind is dict else iter
+
+        self.iterate = iterate
+        self.contains = _contains if contains is None else contains
+
+
+
+# the registered container types (and abstract base classes), keyed
+# on the class, in the order they were registered
+
+_registered = {}
+
+
+
+def _lookup(t):
+    """Returns the _ContainerType for type 't', or None, if it's not a
+    container (i.e. it's a simple type).
+
+    The type itself and its base classes are searched for first (so a
+    subclass of a registered type is handled the same way, unless it's
+    registered itself), followed by the registered abstract base
+    classes, most recently registered first (so a class which has been
+    registered as a 'virtual' subclass of one is also matched).
+    """
+
+    for base in t.__mro__:
+        if base in _registered:
+            return _registered[base]
+
+    if not issubclass(t, _STRING_TYPES):
+        for cls in reversed(list(_registered)):
+            if issubclass(t, cls):
+                return _registered[cls]
+
+    return None
+
+
+
+class _TypeTable(dict):
+    """This class is a dictionary caching the result of looking up
+    each concrete type, which is done (by __missing__()) the first time
+    that type is seen: after that, checking an object is a single
+    dictionary lookup on its type, which is much faster than a chain of
+    isinstance() calls (especially for simple values, which have to
+    fail every check).
+
+    The value for each type is the result of calling 'lookup' with it.
+    All the tables are cleared when a container is registered, as the
+    results may change.
+    """
+
+    _tables = []
+
+
+    def __init__(self, lookup):
+        super().__init__()
+        self._lookup = lookup
+        self._tables.append(self)
+
+
+    def __missing__(self, t):
+        value = self._lookup(t)
+        self[t] = value
+        return value
+
+
+
+def _lookup_kind(t):
+    container = _CONTAINERS[t]
+    return None if container is None else container.kind
+
+
+
+# the caches, keyed on the concrete type of an object:
+#
+# _CONTAINERS gives the _ContainerType, with the information about the
+# type and the hooks, or None, if it's a simple type
+#
+# _KINDS gives the kind of container (dict, list or set) for each
+# type, or None, and is used to check types, inline, with
+# '_KINDS[type(obj)]'
+
+_CONTAINERS = _TypeTable(_lookup)
+_KINDS = _TypeTable(_lookup_kind)
+
+
+
+def _thawed_type(obj):
+    """Returns the type to use to build a new object based on 'obj': the
+    type of container it's handled as, if it's read-only (such as the
+    frozen objects returned by deepintern()), or the same type,
+    otherwise.
+    """
+
+    container = _CONTAINERS[type(obj)]
+
+    if (container is not None) and container.readonly:
+        return container.kind
+
+    return type(obj)
+
+
+
+def _check_writable(obj, path, opname):
+    """Raises a TypeError if 'obj' is a read-only container, which the
+    operation 'opname' would need to modify at 'path'.
+    """
+
+    container = _CONTAINERS[type(obj)]
+
+    if (container is not None) and container.readonly:
+        raise TypeError("%s at: %s cannot modify read-only type: %s"
+                            % (opname, path, type(obj)))
+
+
+
+def _mutable_copy(obj):
+    """Returns a shallow copy of 'obj', which can be modified: if it's a
+    read-only container, this is an object of the type it's handled as,
+    containing the same items.
+    """
+
+    container = _CONTAINERS[type(obj)]
+
+    if (container is not None) and container.readonly:
+        return container.kind(container.iterate(obj))
+
+    return _copy(obj)
+
+
+
+def register_container(cls, kind, readonly=False, iterate=None,
+                       contains=None):
+
+    """Registers a class of container, so that the functions in this
+    module handle its objects as dictionaries, lists or sets, rather
+    than as simple values.
+
+    By default, dictionaries, lists and sets (and any subclasses of
+    them) are handled as containers and everything else (including
+    tuples and frozensets) as simple values.  This allows other types
+    to be used directly, such as memory-efficient or read-only
+    containers, or to be converted from.
+
+    The class can be an abstract base class, in which case any type
+    which is a subclass of it (including 'virtual' subclasses) is
+    handled as the container - for example, registering
+    collections.abc.Mapping as a read-only dict would handle any
+    mapping type, including types.MappingProxyType.  Strings and bytes
+    are never handled as containers in this way.
+
+    The objects of the class must support the standard operations for
+    their kind of container: for a dict, iteration over the keys,
+    membership ('in'), indexing ('[]'), items() and len(); for a list,
+    the same, with integer indices; and, for a set, iteration,
+    membership and len().  Where an object must be created (for
+    example, in the results of deepdiff() or deepfilter()), an object
+    of the same class is created, unless it's read-only.
+
+    Types are looked up once, the first time an object of that type is
+    seen, and the result cached, so checking the type of each item is a
+    single dictionary lookup.  The cache is cleared when a container
+    is registered.
+
+    Keyword arguments:
+
+    cls -- the class to register
+
+    kind -- the type of container it is handled as: dict, list or set
+    (the built-in types themselves)
+
+    readonly -- if this is True, objects of the class cannot be
+    modified: functions which modify objects in place (such as
+    deepmerge()) raise a TypeError and, where new objects must be
+    created based on one, an object of the 'kind' type is created
+    instead (as for the frozen objects returned by deepintern())
+
+    iterate -- if this is specified, it is a function, called with an
+    object of the class, returning an iterable of the items in it (for
+    a dict, the (key, value) pairs, as returned by items()); this is
+    used, instead of the standard operation, where all of the items in
+    an object are needed
+
+    contains -- if this is specified, it is a function, called with an
+    object of the class and an item (the key, for a dict), returning
+    whether the item is in the object; this is used, instead of 'in',
+    where items are looked up in an object
+    """
+
+    if not isinstance(cls, type):
+        raise TypeError("register_container cannot register non-class: %s"
+                            % cls)
+
+    if kind not in (dict, list, set):
+        raise ValueError("register_container invalid kind of container: %s"
+                             % kind)
+
+    _registered[cls] = _ContainerType(kind, readonly, iterate, contains)
+
+    for table in _TypeTable._tables:
+        table.clear()
+
+
+
+register_container(dict, dict)
+register_container(list, list)
+register_container(set, set)
@@ -0,0 +1,154 @@
+# deepops.undo
+
+
+
+# the types of entry in the undo log - each entry is a tuple of (type,
+# object, argument, value), with the argument and value depending on
+# the type
+
+_SET_ITEM = 0           # key, previous value
+_DEL_ITEM = 1           # key
+_TRUNCATE = 2           # previous length
+_INSERT = 3             # index, previous value
+_RESTORE_LIST = 4       # previous contents
+_SET_DISCARD = 5        # items added
+_SET_ADD = 6            # item removed
+_KEY_ORDER = 7          # previous list of keys
+
+
+
+class _UndoLog:
+    """This class records the changes made to compound objects, by
+    deepmerge() and deepremoveitems() with the 'atomic' option, so they
+    can be undone with rollback(), if the operation fails part way
+    through.
+
+    Only what is needed to reverse each change is recorded (such as the
+    previous value of an item which is replaced, or the length of a
+    list before items are appended to it), so the cost is proportional
+    to the number of changes, rather than the size of the objects (as
+    it would be, if they were copied beforehand).  The exceptions are
+    lists which are rebuilt or edited, where the previous contents of
+    the list are kept (but not copied deeply), and dictionaries which
+    have items removed, where the previous order of the keys is kept
+    (so it can be restored).
+
+    The methods which record a change must be called before the change
+    is made.
+    """
+
+
+    def __init__(self):
+        self._log = []
+
+        # the IDs of the dictionaries whose key order has been recorded
+
+        self._ordered = set()
+
+
+    def set_item(self, obj, key):
+        """Records that the item 'key' in dictionary 'obj' is about to
+        be set (replacing the existing value, if any).
+        """
+
+        if key in obj:
+            self._log.append((_SET_ITEM, obj, key, obj[key]))
+        else:
+            self._log.append((_DEL_ITEM, obj, key, None))
+
+
+    def pop_item(self, obj, key):
+        """Records that the item 'key' in dictionary 'obj' is about to
+        be removed.
+        """
+
+        if id(obj) not in self._ordered:
+            self._ordered.add(id(obj))
+            self._log.append((_KEY_ORDER, obj, list(obj), None))
+
+        self._log.append((_SET_ITEM, obj, key, obj[key]))
+
+
+    def extend_list(self, obj):
+        """Records that items are about to be appended to list 'obj'."""
+
+        self._log.append((_TRUNCATE, obj, len(obj), None))
+
+
+    def remove_list_item(self, obj, index):
+        """Records that the item at 'index' in list 'obj' is about to be
+        removed.
+        """
+
+        self._log.append((_INSERT, obj, index, obj[index]))
+
+
+    def replace_list(self, obj):
+        """Records that the contents of list 'obj' are about to be
+        replaced (or changed in some other way).
+        """
+
+        self._log.append((_RESTORE_LIST, obj, obj[:], None))
+
+
+    def add_set_items(self, obj, items):
+        """Records that 'items' are about to be added to set 'obj' (only
+        those not already present are recorded).
+        """
+
+        added = [ item for item in items if item not in obj ]
+
+        if added:
+            self._log.append((_SET_DISCARD, obj, added, None))
+
+
+    def remove_set_item(self, obj, item):
+        """Records that 'item' is about to be removed from set 'obj'."""
+
+        self._log.append((_SET_ADD, obj, item, None))
+
+
+    def rollback(self):
+        """Undoes all of the changes recorded, in reverse order, and
+        clears the log.
+        """
+
+        for entry, obj, arg, value in reversed(self._log):
+            if entry == _SET_ITEM:
+                obj[arg] = value
+
+            elif entry == _DEL_ITEM:
+                del obj[arg]
+
+            elif entry == _TRUNCATE:
+                del obj[arg:]
+
+            elif entry == _INSERT:
+                obj.insert(arg, value)
+
+            elif entry == _RESTORE_LIST:
+                obj[:] = arg
+
+            elif entry == _SET_DISCARD:
+                obj.difference_update(arg)
+
+            elif entry == _SET_ADD:
+                obj.add(arg)
+
+            elif entry == _KEY_ORDER:
+                # all the keys have been restored, but those which were
+                # removed are now at the end, so we put them back in
+                # order
+
+                items = [ (key, obj[key]) for key in arg ]
+                obj.clear()
+                obj.update(items)
+
+        self.clear()
+
+
+    def clear(self):
+        """Discards the log, keeping the changes."""
+
+        self._log = []
+        self._ordered = set()
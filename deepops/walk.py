@@ -0,0 +1,131 @@
+# deepops.walk
+
+
+
+def _walk(gen):
+    """Runs a traversal, written as a 'recursive' generator function,
+    using an explicit stack of generators, rather than the Python call
+    stack.  This means the depth of the structures being traversed is
+    not limited by the recursion limit.
+
+    Where the traversal function would call itself recursively, it
+    instead yields the generator for the recursive call (i.e. the
+    result of calling the generator function, which does not run it)
+    and the result of the recursive call (the value it returns) is sent
+    back, as the result of the yield expression:
+
+        sub_result = yield _deepsomething(a[item], b[item], ...)
+
+    The value returned by the top-level generator, 'gen', is returned.
+
+    Going through the stack for every call is slow, though, so
+    traversals which have a path should make their recursive calls
+    with _recurse(), which only does this for one level in every
+    _DIRECT_LEVELS.
+    """
+
+    # the stack holds the generators which have made a recursive call
+    # and are waiting for the result - the one currently running is
+    # held separately in 'gen', to avoid indexing the stack each time
+
+    stack = []
+    send_value = None
+
+    while True:
+        try:
+            sub_gen = gen.send(send_value)
+
+        except StopIteration as e:
+            # the running generator has finished, so we send the value
+            # it returned to the one that called it (or return it, if
+            # this was the top level)
+
+            if not stack:
+                return e.value
+
+            gen = stack.pop()
+            send_value = e.value
+
+        else:
+            # the running generator has made a 'recursive call', so we
+            # push it onto the stack and start the new generator
+
+            stack.append(gen)
+            gen = sub_gen
+            send_value = None
+
+
+
+def _iter_walk(gen):
+    """This generator function runs a traversal in the same way as
+    _walk(), but the traversal can also yield tuples, which are yielded
+    from here, as they're reached (for example, the changes found by
+    iter_deepdiff()), rather than being taken as recursive calls.  The
+    value returned by the top-level generator is discarded.
+    """
+
+    stack = []
+    send_value = None
+
+    while True:
+        try:
+            value = gen.send(send_value)
+
+        except StopIteration as e:
+            if not stack:
+                return
+
+            gen = stack.pop()
+            send_value = e.value
+
+        else:
+            send_value = None
+
+            if type(value) is tuple:
+                yield value
+
+            else:
+                stack.append(gen)
+                gen = value
+
+
+
+# the number of levels of recursive calls which _recurse() makes
+# directly, before making one through the stack in _walk(): each of
+# these uses the Python call stack, so this must be well within the
+# recursion limit
+
+_DIRECT_LEVELS = 50
+
+
+
+def _call_via_walk(gen):
+    """Makes a recursive call for the generator 'gen' by yielding it to
+    _walk(), returning its result.  This is a generator function, used
+    by _recurse().
+    """
+
+    return (yield gen)
+
+
+
+def _recurse(gen, path):
+    """Returns the generator to delegate to, with 'yield from', to make
+    a recursive call for the generator 'gen', from the level of a
+    traversal at 'path' (a DeepPath), when run by _walk():
+
+        sub_result = yield from _recurse(
+                         _deepsomething(a[item], b[item], ...), path)
+
+    This is usually 'gen' itself, so the call is made directly, which
+    is about as quick as an ordinary recursive function call, as it
+    doesn't go back through _walk().  For one level in every
+    _DIRECT_LEVELS, though, the call is yielded to _walk(), instead, so
+    the depth of the Python call stack is limited, no matter how deep
+    the structures are.
+    """
+
+    if (len(path) + 1) % _DIRECT_LEVELS:
+        return gen
+
+    return _call_via_walk(gen)
@@ -59,6 +59,11 @@ setup(
     keywords='deep operations merge remove',
     packages=find_packages(exclude=['contrib', 'docs', 'tests']),
 
+    # Optional dependencies (numpy is needed for deepcolumns())
+    extras_require={
+        'numpy': ['numpy'],
+    },
+
     # List additional URLs
     project_urls={
         'Bug Reports': 'https://github.com/mincebert/deepops/issues',
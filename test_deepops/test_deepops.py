@@ -5,10 +5,99 @@
 import unittest
 
 from deepops import (
-    deepmerge, deepremoveitems, deepfilter, deepdiff, deepsetdefault, deepget)
-
+    deepmerge, deepremoveitems, deepfilter, deepdiff, deepsetdefault, deepget,
+    deepget_many, deepmerge_many, deepmerge_plan, deepmerge3, deepcompose,
+    deepmerge_parallel, deepdiff_parallel, deepequal, deepquery,
+    deepcolumns, iter_deepdiff, deeptrack, deepintern, deepthaw,
+    apply_jsonpatch, deepdiff_to_jsonpatch, deepdiff_to_mergepatch,
+    jsonpatch_to_deepdiff, mergepatch_to_deepdiff, compile_query,
+    DeepDiffResult, DeepFingerprints, DeepGetPaths, DeepInternTable,
+    DeepListEdit, DeepPath, DeepPolicy, DeepVersionStore, FrozenDict,
+    FrozenList, FrozenSet, TrackedDict, DeepConflict, MISSING, ANY,
+    ANY_DEPTH, listdiff, listpatch, register_container)
+
+from abc import ABC
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
 from copy import deepcopy
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+
+class _CompactDict(Mapping):
+    """A read-only mapping, storing its keys and values in tuples, for
+    testing register_container().
+    """
+
+    def __init__(self, d):
+        self.keys_ = tuple(d)
+        self.values_ = tuple(d.values())
+
+    def __getitem__(self, key):
+        if key not in self.keys_:
+            raise KeyError(key)
+
+        return self.values_[self.keys_.index(key)]
+
+    def __iter__(self):
+        return iter(self.keys_)
+
+    def __len__(self):
+        return len(self.keys_)
+
+
+register_container(
+    _CompactDict, dict, readonly=True,
+    iterate=lambda d: zip(d.keys_, d.values_),
+    contains=lambda d, key: key in d.keys_)
+
+
+
+class _Pair(ABC):
+    """An abstract base class, registered as a list, for testing
+    register_container() with a 'virtual' subclass.
+    """
+
+
+class _PairList:
+    """A list-like class registered as a subclass of _Pair."""
+
+    def __init__(self, first, second):
+        self.items = [first, second]
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __getitem__(self, index):
+        return self.items[index]
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+
+_Pair.register(_PairList)
+register_container(_Pair, list, readonly=True)
+
+
+
+def _deep_dict(depth, leaf):
+    """Returns a dictionary nested 'depth' levels deep, with the
+    innermost dictionary containing 'leaf', for testing structures
+    deeper than the recursion limit.
+    """
+
+    d = leaf
+    for i in range(depth):
+        d = {"n": d}
+    return d
+
 
 
 class TestDeepOps(unittest.TestCase):
@@ -168,6 +257,27 @@ class TestDeepOps(unittest.TestCase):
         self.assertEqual(x_merge_y, self.x)
 
 
+    def test_merge_set_unhashable(self):
+        x = {"l": [{"a": 1}, [1, 2], {"a": 2}, {"a": 1}]}
+        y = {"l": [[1, 2], {"a": 3}, {1, 2}, {"a": 3}, {"a": 1}]}
+
+        x_merge_y = {
+            "l": [{"a": 1}, [1, 2], {"a": 2}, {"a": 1}, {"a": 3}, {1, 2},
+                  {"a": 3}],
+        }
+
+        deepmerge(x, y, list_as_set=True)
+        self.assertEqual(x_merge_y, x)
+
+
+    def test_merge_set_large(self):
+        x = {"l": list(range(0, 100000, 2))}
+        y = {"l": list(range(100000))}
+        deepmerge(x, y, list_as_set=True)
+        self.assertEqual(list(range(0, 100000, 2)) + list(range(1, 100000, 2)),
+                         x["l"])
+
+
     def test_merge_illegal_original(self):
         with self.assertRaises(TypeError):
             deepmerge(self.illegal_x, self.y, list_as_set=True)
@@ -516,6 +626,47 @@ class TestDeepOps(unittest.TestCase):
         self.assertEqual(x_diff_y_update, diff_update)
 
 
+    def test_diff_set_unhashable(self):
+        x = {"l": [{"a": 1}, [1, 2], {"a": 2}, {"a": 2}, 3]}
+        y = {"l": [3, [1, 2], {"a": [4]}, {1, 2}]}
+
+        diff_remove, diff_update = deepdiff(x, y, list_as_set=True)
+        self.assertEqual({"l": [{"a": 1}, {"a": 2}, {"a": 2}]}, diff_remove)
+        self.assertEqual({"l": [{"a": [4]}, {1, 2}]}, diff_update)
+
+
+    def test_diff_fingerprints(self):
+        diff_remove, diff_update = deepdiff(self.x, self.y)
+        self.assertEqual((diff_remove, diff_update),
+                         deepdiff(self.x, self.y, fingerprints=True))
+
+
+    def test_diff_fingerprints_reused(self):
+        fingerprints = DeepFingerprints()
+        x = {"a": {"b": [1, 2.0, True]}, "c": {"d": "x"}}
+        y = {"a": {"b": [1.0, 2, 1]}, "c": {"d": "y"}}
+
+        self.assertEqual(({}, {"c": {"d": "y"}}),
+                         deepdiff(x, y, fingerprints=fingerprints))
+
+        x["c"]["d"] = "y"
+        fingerprints.invalidate()
+        self.assertEqual(({}, {}), deepdiff(x, y, fingerprints=fingerprints))
+
+
+    def test_diff_fingerprints_unsupported(self):
+        class Value:
+            pass
+
+        v = Value()
+        x = {"a": {"b": v}, "c": {"d": Value()}}
+        y = {"a": {"b": v}, "c": {"d": Value()}}
+
+        diff_remove, diff_update = deepdiff(x, y, fingerprints=True)
+        self.assertEqual({}, diff_remove)
+        self.assertEqual({"c": {"d": y["c"]["d"]}}, diff_update)
+
+
     def test_diff_remove_update(self):
         diff_remove, diff_update = deepdiff(self.x, self.y)
         deepremoveitems(self.x, deepcopy(diff_remove))
@@ -620,6 +771,313 @@ class TestDeepOps(unittest.TestCase):
         self.assertIs(type(sub_update["t"]), SubDict)
 
 
+    def test_diff_list_edits(self):
+        x = {"log": list(range(1000)), "n": [1, 2, 3]}
+        y = {"log": list(range(1000)) + [1000, 1001], "n": [1, 2, 3]}
+
+        diff_remove, diff_update = deepdiff(x, y, list_edits=True)
+        self.assertEqual({}, diff_remove)
+        self.assertEqual(
+            {"log": [("insert", 1000, [1000, 1001])]}, diff_update)
+        self.assertIs(type(diff_update["log"]), DeepListEdit)
+
+        deepmerge(x, diff_update)
+        self.assertEqual(y, x)
+
+
+    def test_diff_list_keys(self):
+        x = {
+            "interfaces": [
+                {"name": "eth0", "mtu": 1500, "addrs": {"10.0.0.1"}},
+                {"name": "eth1", "mtu": 1500},
+                {"name": "eth2", "mtu": 9000, "desc": "x"},
+            ],
+        }
+
+        y = {
+            "interfaces": [
+                {"name": "eth2", "mtu": 9000},
+                {"name": "eth0", "mtu": 1500, "addrs": {"10.0.0.2"}},
+                {"name": "eth3", "mtu": 1500},
+            ],
+        }
+
+        list_keys = {("interfaces",): "name"}
+
+        diff_remove, diff_update = deepdiff(x, y, list_keys=list_keys)
+
+        self.assertEqual(
+            {"interfaces": [
+                {"name": "eth1"},
+                {"name": "eth2", "desc": None},
+                {"name": "eth0", "addrs": {"10.0.0.1"}},
+            ]},
+            diff_remove)
+
+        self.assertEqual(
+            {"interfaces": [
+                {"name": "eth0", "addrs": {"10.0.0.2"}},
+                {"name": "eth3", "mtu": 1500},
+            ]},
+            diff_update)
+
+        deepremoveitems(x, deepcopy(diff_remove), list_keys=list_keys)
+        deepmerge(x, deepcopy(diff_update), list_keys=list_keys)
+
+        self.assertEqual(
+            {"interfaces": [
+                {"name": "eth0", "mtu": 1500, "addrs": {"10.0.0.2"}},
+                {"name": "eth2", "mtu": 9000},
+                {"name": "eth3", "mtu": 1500},
+            ]},
+            x)
+
+
+    def test_diff_list_keys_illegal(self):
+        with self.assertRaises(ValueError):
+            deepdiff({"l": [{"k": 1}, {"k": 1}]}, {"l": []},
+                     list_keys={("l",): "k"})
+
+        with self.assertRaises(TypeError):
+            deepdiff({"l": [1]}, {"l": []}, list_keys={("l",): "k"})
+
+
+    def test_diff_list_keys_nested_list(self):
+        # the key only applies to the keyed list itself, so lists
+        # inside its items are ordinary lists
+
+        x = {"ifs": [{"name": "eth0", "addrs": ["1.1.1.1"]}]}
+        y = {"ifs": [{"name": "eth0", "addrs": ["1.1.1.1", "2.2.2.2"]}]}
+
+        list_keys = {("ifs",): "name"}
+
+        diff_remove, diff_update = deepdiff(x, y, list_keys=list_keys)
+
+        self.assertEqual(
+            {"ifs": [{"name": "eth0", "addrs": ["1.1.1.1"]}]}, diff_remove)
+        self.assertEqual(y, diff_update)
+
+        deepremoveitems(x, deepcopy(diff_remove), list_keys=list_keys)
+        deepmerge(x, deepcopy(diff_update), list_keys=list_keys)
+        self.assertEqual(y, x)
+
+
+    # listdiff() and listpatch() tests
+
+
+    def test_listdiff(self):
+        a = ["a", "b", "c", "a", "b", "b", "a"]
+        b = ["c", "b", "a", "b", "a", "c"]
+
+        edit = listdiff(a, b)
+        self.assertEqual(5, sum(v if op == "delete" else len(v)
+                                    for op, i, v in edit))
+
+        listpatch(a, edit)
+        self.assertEqual(b, a)
+
+
+    def test_listdiff_sequential(self):
+        a = [1, 2, 3, 4, 5, 6]
+        b = [0, 2, 3, 7, 5, 6, 8]
+
+        edit = listdiff(a, b)
+        self.assertEqual([("insert", 6, [8]),
+                          ("delete", 3, 1),
+                          ("insert", 3, [7]),
+                          ("delete", 0, 1),
+                          ("insert", 0, [0])], edit)
+
+        for op, index, value in edit:
+            if op == "delete":
+                del a[index:index + value]
+            else:
+                a[index:index] = value
+
+        self.assertEqual(b, a)
+
+
+    def test_listpatch_illegal(self):
+        with self.assertRaises(ValueError):
+            listpatch([1, 2], DeepListEdit([("delete", 5, 1)]))
+
+
+    # DeepPolicy tests
+
+
+    def test_policy_merge(self):
+        policy = DeepPolicy({
+            ("c",): {"list_as_set": True},
+            ("d",): {"replace": False},
+            ("d", "q"): {"skip": True},
+        })
+
+        x_merge_y = {
+            "a": "y",
+            "b": 6,
+            "c": ["x", "y"],
+            "d": {
+                "m": "x",
+                "n": 3,
+                "p": [1, 2, 2, 3],
+                "q": {
+                    "t": [1],
+                },
+                "o": 4,
+            },
+            "e": {7, 8, 9},
+        }
+
+        deepmerge(self.x, self.y, policy=policy)
+        self.assertEqual(x_merge_y, self.x)
+
+
+    def test_policy_diff_wildcard(self):
+        policy = DeepPolicy([
+            (("hosts", ANY, "acl"), {"list_as_set": True}),
+            (("hosts", ANY, "ifs"), {"list_key": "name"}),
+            (("hosts", ANY, "ifs", ANY, "stats"), {"skip": True}),
+            (("hosts", "h2", "acl"), {"list_as_set": False}),
+        ])
+
+        x = {"hosts": {
+            "h1": {"acl": [1, 2, 3],
+                   "ifs": [{"name": "eth0", "mtu": 1, "stats": {"rx": 1}}]},
+            "h2": {"acl": [1, 2, 3]},
+        }}
+
+        y = {"hosts": {
+            "h1": {"acl": [3, 2, 1, 4],
+                   "ifs": [{"name": "eth0", "mtu": 2, "stats": {"rx": 2}}]},
+            "h2": {"acl": [3, 2, 1]},
+        }}
+
+        diff_remove, diff_update = deepdiff(x, y, policy=policy)
+
+        self.assertEqual({"hosts": {"h2": {"acl": [1, 2, 3]}}}, diff_remove)
+        self.assertEqual(
+            {"hosts": {"h1": {"acl": [4], "ifs": [{"name": "eth0", "mtu": 2}]},
+                       "h2": {"acl": [3, 2, 1]}}},
+            diff_update)
+
+
+    def test_policy_remove_skip(self):
+        policy = DeepPolicy({("d", ANY): {"skip": True}})
+        deepremoveitems(self.x, {"a": None, "d": {"m": None, "p": [1]}},
+                        policy=policy)
+        self.assertNotIn("a", self.x)
+        self.assertEqual({"m": "x", "n": 3, "p": [1, 2], "q": {"t": [1]}},
+                         self.x["d"])
+
+
+    def test_policy_illegal_option(self):
+        with self.assertRaises(ValueError):
+            DeepPolicy({("a",): {"unknown": True}})
+
+
+    # deep structure tests
+
+
+    def test_deep_merge(self):
+        x = _deep_dict(5000, {"a": 1})
+        deepmerge(x, _deep_dict(5000, {"b": 2}))
+
+        for i in range(5000):
+            x = x["n"]
+        self.assertEqual({"a": 1, "b": 2}, x)
+
+
+    def test_deep_diff(self):
+        diff_remove, diff_update = deepdiff(
+            _deep_dict(5000, {"a": 1}), _deep_dict(5000, {"a": 2}))
+
+        for i in range(5000):
+            diff_update = diff_update["n"]
+        self.assertEqual({"a": 2}, diff_update)
+
+
+    def test_deep_remove(self):
+        x = _deep_dict(5000, {"a": 1, "b": 2})
+        deepremoveitems(x, _deep_dict(5000, {"a": None}))
+
+        for i in range(5000):
+            x = x["n"]
+        self.assertEqual({"b": 2}, x)
+
+
+    def test_deep_filter(self):
+        x = deepfilter(_deep_dict(5000, {"a": 1, "b": 2}),
+                       _deep_dict(5000, {"b": None}))
+
+        for i in range(5000):
+            x = x["n"]
+        self.assertEqual({"b": 2}, x)
+
+
+    # DeepPath tests
+
+
+    def test_path_sub(self):
+        root = DeepPath()
+        path = root.sub("a").sub(1)
+
+        self.assertEqual(0, len(root))
+        self.assertEqual(["a", 1], path)
+        self.assertEqual(DeepPath(["a", 1]), path)
+        self.assertEqual(["a", 1, "b"], path.sub("b"))
+        self.assertEqual(["a", 1], list(path))
+        self.assertEqual(1, path[-1])
+        self.assertEqual("<root>", str(root))
+        self.assertEqual("['a'][1]", str(path))
+
+
+    def test_path_startswith(self):
+        path = DeepPath().sub("a").sub("b").sub("c")
+
+        self.assertTrue(path.startswith([]))
+        self.assertTrue(path.startswith(["a", "b"]))
+        self.assertTrue(path.startswith(DeepPath(["a", "b", "c"])))
+        self.assertFalse(path.startswith(["a", "c"]))
+        self.assertFalse(path.startswith(["a", "b", "c", "d"]))
+
+
+    def test_path_list_methods(self):
+        parent = DeepPath().sub("a")
+        path = parent.sub("b")
+        child = path.sub("c")
+
+        path.append("x")
+        path.extend([1, 2])
+        path[0] = "z"
+        del path[-1]
+        self.assertEqual(["z", "b", "x", 1], path)
+        self.assertEqual(1, path.pop())
+        path += ["y"]
+        self.assertEqual(["z", "b", "x", "y"], path)
+        self.assertEqual("['z']['b']['x']['y']", str(path))
+        self.assertEqual(4, len(path))
+        self.assertEqual(2, path.index("x"))
+        self.assertEqual(["b", "x"], path[1:3])
+        self.assertIn("y", path)
+
+        # paths extended before the change are not affected
+
+        self.assertEqual(["a"], parent)
+        self.assertEqual(["a", "b", "c"], child)
+        self.assertEqual(["z", "b", "x", "y", "d"], path.sub("d"))
+        self.assertTrue(path.startswith(["z", "b"]))
+        self.assertFalse(path.startswith(["a", "b"]))
+
+        self.assertLess(DeepPath(["a", 1]), DeepPath(["a", 2]))
+        self.assertLess(DeepPath(["a"]), ["a", 1])
+        self.assertGreaterEqual(child, ["a", "b"])
+        self.assertEqual([DeepPath(["a"]), DeepPath(["a", "b"])],
+                         sorted([DeepPath(["a", "b"]), DeepPath(["a"])]))
+
+        path.clear()
+        self.assertEqual("<root>", str(path))
+
+
     # deepsetdefault() tests
 
 
@@ -723,5 +1181,1181 @@ class TestDeepOps(unittest.TestCase):
             deepget(x, 1, 2, 3, default_error=True)
 
 
+
+    # deepget_many() tests
+
+
+    def test_get_many(self):
+        x = { 1: { 2: { 3: "a", 4: "b" }, 5: "c" } }
+        paths = [(1, 2, 3), (1, 5), (1, 2, 6), (1, 5, 7), (1, 2, 4), (), (1, 5)]
+        self.assertEqual(
+            [deepget(x, *path, default=0) for path in paths],
+            deepget_many(x, paths, default=0))
+
+
+    def test_get_many_compiled(self):
+        paths = DeepGetPaths([("a", "b"), ("a", "c")])
+        self.assertEqual(2, len(paths))
+        self.assertEqual([1, 2], paths.get({"a": {"b": 1, "c": 2}}))
+        self.assertEqual([None, 3], paths.get({"a": {"c": 3}}))
+
+
+    def test_get_many_defaulterror_keyerror(self):
+        x = { 1: { 2: { 3: {} } } }
+        with self.assertRaises(KeyError):
+            deepget_many(x, [(1, 2), (1, 3)], default_error=True)
+
+
+    def test_get_many_defaulterror_typeerror(self):
+        x = { 1: { 2: "string" } }
+        with self.assertRaises(TypeError):
+            deepget_many(x, [(1, 2, 3)], default_error=True)
+
+
+
+    # deepquery() tests
+
+
+    def test_query_wildcard(self):
+        x = {"ifs": [{"name": "eth0", "addrs": ["a", "b"]},
+                     {"name": "eth1", "addrs": ["c"]}]}
+
+        self.assertEqual(["eth0", "eth1"], deepquery(x, "ifs.*.name"))
+        self.assertEqual(["b"], deepquery(x, "ifs.0.addrs.-1"))
+        self.assertEqual(["a", "b", "c"], deepquery(x, ("ifs", ANY, "addrs", ANY)))
+        self.assertEqual([], deepquery(x, "ifs.5.name"))
+
+
+    def test_query_any_depth(self):
+        x = {"a": {"name": 1, "b": [{"name": 2}, {"c": {"name": 3}}]},
+             "name": 0}
+
+        self.assertEqual([0, 1, 2, 3], deepquery(x, "**.name"))
+        self.assertEqual([0, 1, 2, 3], deepquery(x, (ANY_DEPTH, "name")))
+
+
+    def test_query_parse_keys(self):
+        x = {"ports": {"80": "http", 80: "int", "*": "star", "--1": "dashes"}}
+
+        # only plain integers are indices: anything else is a string key
+        # and quoting an item makes it a string key
+
+        self.assertEqual(["int"], deepquery(x, "ports.80"))
+        self.assertEqual(["http"], deepquery(x, 'ports."80"'))
+        self.assertEqual(["star"], deepquery(x, 'ports."*"'))
+        self.assertEqual(["dashes"], deepquery(x, "ports.--1"))
+        self.assertEqual([], deepquery(x, "ports.²"))
+
+
+    def test_query_compiled_cached(self):
+        self.assertIs(compile_query("a.*"), compile_query("a.*"))
+        self.assertEqual([1, 2], compile_query("a.*")({"a": {"b": 1, "c": 2}}))
+
+
+
+    # deepcolumns() tests
+
+
+    @unittest.skipUnless(numpy, "numpy not installed")
+    def test_columns(self):
+        docs = [{"a": {"n": 1, "x": 1.5, "s": "p", "b": True}},
+                {"a": {"n": 2, "s": [1, 2], "b": False}},
+                {"a": 5},
+                {"a": {"n": 3, "x": 2}}]
+
+        n, x, s, b = deepcolumns(docs, [["a", "n"], ["a", "x"], ["a", "s"],
+                                        ["a", "b"]])
+
+        self.assertEqual(numpy.int64, n[0].dtype)
+        self.assertEqual([1, 2, 0, 3], n[0].tolist())
+        self.assertEqual([True, True, False, True], n[1].tolist())
+
+        self.assertEqual(numpy.float64, x[0].dtype)
+        self.assertEqual([1.5, 2.0], x[0][x[1]].tolist())
+
+        self.assertEqual(object, s[0].dtype)
+        self.assertEqual(["p", [1, 2], None, None], s[0].tolist())
+
+        self.assertEqual(bool, b[0].dtype)
+        self.assertEqual([True, True, False, False], b[1].tolist())
+
+
+    @unittest.skipIf(numpy, "numpy installed")
+    def test_columns_no_numpy(self):
+        with self.assertRaises(ImportError):
+            deepcolumns([{}], [["a"]])
+
+
+
+    # iter_deepdiff() tests
+
+
+    def test_iter_diff(self):
+        a = {"x": 1, "y": {"p": 1, "q": [1, 2], "s": {1, 2}}, "z": 2}
+        b = {"x": 2, "y": {"p": 1, "q": [2, 1], "s": {2, 3}}, "n": 3}
+
+        self.assertEqual(
+            [("remove", ["z"], None),
+             ("update", ["n"], 3),
+             ("update", ["x"], 2),
+             ("update", ["y", "q"], [2, 1]),
+             ("remove_item", ["y", "s"], 1),
+             ("add_item", ["y", "s"], 3)],
+            list(iter_deepdiff(a, b)))
+
+        self.assertEqual(
+            [], list(iter_deepdiff(a, b, policy=DeepPolicy({
+                                           (): { "list_as_set": True },
+                                           ("x",): { "skip": True },
+                                           ("y", "s"): { "skip": True },
+                                           ("z",): { "skip": True },
+                                           ("n",): { "skip": True } }))))
+
+
+    def test_iter_diff_list_keys(self):
+        a = {"l": [{"id": 1, "v": 1}, {"id": 2, "v": 2}]}
+        b = {"l": [{"id": 2, "v": 3}, {"id": 3, "v": 4}]}
+
+        # the items in a keyed list are given in the order of 'b', as
+        # in deepdiff()
+
+        self.assertEqual(
+            [("remove", ["l", 1], None),
+             ("update", ["l", 2, "v"], 3),
+             ("update", ["l", 3], {"id": 3, "v": 4})],
+            list(iter_deepdiff(a, b, list_keys={ ("l",): "id" })))
+
+
+    def test_iter_diff_early_stop(self):
+        a = { i: i for i in range(1000) }
+        b = { i: -i for i in range(1000) }
+
+        changes = iter_deepdiff(a, b)
+        self.assertEqual(("update", [1], -1), next(changes))
+
+        with self.assertRaises(TypeError):
+            list(iter_deepdiff({"a": 1}, {"a": "1"}))
+
+        self.assertEqual([("update", ["a"], "1")],
+                         list(iter_deepdiff({"a": 1}, {"a": "1"},
+                                            change_types=True)))
+
+
+    def test_iter_diff_deep(self):
+        self.assertEqual(
+            1, len(list(iter_deepdiff(_deep_dict(5000, {"x": 1}),
+                                      _deep_dict(5000, {"x": 2})))))
+
+
+
+    # deeptrack() tests
+
+
+    def test_track_changes(self):
+        a = {"a": 1, "b": {"c": [1, 2], "d": {"e": 1}, "s": {1, 2}},
+             "x": {"y": 1}}
+
+        t = deeptrack(a)
+        self.assertIsInstance(t["b"]["d"], TrackedDict)
+        self.assertEqual(({}, {}), t.changes())
+
+        t["a"] = 2
+        t["b"]["c"].append(3)
+        t["b"]["d"]["f"] = 5
+        del t["b"]["d"]["e"]
+        t["b"]["s"] |= {3}
+        t["b"]["s"].discard(1)
+        t["x"] = {"z": 2}
+        t["n"] = 1
+
+        remove_items, update_items = t.changes()
+        self.assertEqual(
+            {"b": {"c": [1, 2], "d": {"e": None}, "s": {1}}, "x": None},
+            remove_items)
+        self.assertEqual(
+            {"a": 2, "b": {"c": [1, 2, 3], "d": {"f": 5}, "s": {3}},
+             "x": {"z": 2}, "n": 1},
+            update_items)
+
+        deepremoveitems(a, deepcopy(remove_items))
+        deepmerge(a, deepcopy(update_items))
+        self.assertEqual(t, a)
+
+
+    def test_track_clear_changes(self):
+        t = deeptrack({"a": {"b": 1}, "l": [{"c": 1}]})
+
+        t["a"]["b"] = 2
+        t["a"]["b"] = 1
+        self.assertEqual(({}, {}), t.changes())
+
+        t["l"][0]["c"] = 2
+        t.clear_changes()
+        self.assertEqual(({}, {}), t.changes())
+
+        t["l"][0]["c"] = 3
+        self.assertEqual(({"l": [{"c": 2}]}, {"l": [{"c": 3}]}), t.changes())
+
+
+
+    # deepmerge() copy tests
+
+
+    def test_merge_copy(self):
+        a = {"x": {"y": {"z": 1}, "l": [1]}, "big": {"p": [1, 2, 3]},
+             "k": [{"id": 1, "v": 1}, {"id": 2, "v": 2}]}
+        a_orig = deepcopy(a)
+        b = {"x": {"y": {"z": 2}, "n": 1}, "k": [{"id": 2, "v": 3}]}
+
+        merged = deepmerge(a, b, list_keys={ ("k",): "id" }, copy=True)
+
+        # 'a' is unchanged and the result matches an in-place merge
+        self.assertEqual(a_orig, a)
+        deepmerge(a_orig, b, list_keys={ ("k",): "id" })
+        self.assertEqual(a_orig, merged)
+
+        # untouched subtrees are shared, touched ones are copies
+        self.assertIs(a["big"], merged["big"])
+        self.assertIs(a["x"]["l"], merged["x"]["l"])
+        self.assertIs(a["k"][0], merged["k"][0])
+        self.assertIsNot(a["x"], merged["x"])
+        self.assertIsNot(a["k"][1], merged["k"][1])
+
+
+
+    # deepmerge_many() tests
+
+
+    def test_merge_many(self):
+        base = {"a": 1, "b": {"c": [1], "s": {1}}}
+        layers = [{"a": 2, "b": {"c": [2], "d": {"x": 1}}, "n": {"p": 1}},
+                  {"b": {"s": {2}, "d": {"y": 2}}, "n": {"q": 2}},
+                  {"a": 3, "b": {"c": [1, 3], "d": {"x": 3}}}]
+        layers_orig = deepcopy(layers)
+
+        expected = deepcopy(base)
+        for layer in deepcopy(layers):
+            deepmerge(expected, layer, list_as_set=True)
+
+        deepmerge_many(base, layers, list_as_set=True)
+        self.assertEqual(expected, base)
+
+        # the layers themselves are not modified
+        self.assertEqual(layers_orig, layers)
+
+
+    def test_merge_many_options(self):
+        self.assertEqual(
+            {"a": 1, "b": 3},
+            deepmerge_many({"a": 1}, [{"a": 2}, {"a": 3, "b": 3}],
+                           replace=False, copy=True))
+
+        with self.assertRaises(TypeError):
+            deepmerge_many({"a": 1}, [{"a": 2}, {"a": "3"}])
+
+        with self.assertRaises(TypeError):
+            deepmerge_many({"a": 1}, [{"a": 2}, {"a": [3]}])
+
+        self.assertEqual(
+            {"a": "3"},
+            deepmerge_many({"a": 1}, [{"a": 2}, {"a": "3"}],
+                           change_types=True, copy=True))
+
+
+    def test_merge_many_list_keys(self):
+        base = {"l": [{"id": 1, "v": 1}]}
+
+        deepmerge_many(base, [{"l": [{"id": 1, "w": 2}, {"id": 2, "v": 2}]},
+                              {"l": [{"id": 2, "v": 3}]}],
+                       list_keys={ ("l",): "id" })
+
+        self.assertEqual(
+            {"l": [{"id": 1, "v": 1, "w": 2}, {"id": 2, "v": 3}]}, base)
+
+
+
+    # deepmerge_parallel() tests
+
+
+    def _parallel_layers(self):
+        return [ { "hosts": { "h%d" % (i % 5): { "n": i, "l": [i % 3] } },
+                   "all": { "s": { i % 4 } } }
+                     for i in range(20) ]
+
+
+    def test_merge_parallel(self):
+        expected = { "hosts": {} }
+        for layer in deepcopy(self._parallel_layers()):
+            deepmerge(expected, layer, list_as_set=True)
+
+        result = { "hosts": {} }
+        stats = {}
+        deepmerge_parallel(result, self._parallel_layers(), list_as_set=True,
+                           max_workers=2, stats=stats)
+
+        self.assertEqual(expected, result)
+        self.assertEqual(3, stats["tasks"])
+        self.assertTrue(stats["bytes_sent"] > 0)
+
+
+    def test_merge_parallel_executor(self):
+        policy = DeepPolicy({ ("hosts", ANY, "n"): { "replace": False } })
+
+        expected = {}
+        for layer in deepcopy(self._parallel_layers()):
+            deepmerge(expected, layer, policy=policy)
+
+        result = {}
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            deepmerge_parallel(result, self._parallel_layers(), policy=policy,
+                               chunk_size=3, executor=executor)
+
+        self.assertEqual(expected, result)
+
+
+
+    # deepdiff_parallel() tests
+
+
+    def _parallel_diff_pair(self):
+        a = { "s%d" % i: { "k%d" % j: { "v": j, "l": [j] } for j in range(50) }
+                  for i in range(4) }
+        a.update({ "x": 1, "gone": {} })
+
+        b = deepcopy(a)
+        del b["gone"]
+        b["x"] = 2
+        b["new"] = { "n": 1 }
+        b["s1"]["k3"]["v"] = -1
+        b["s2"]["k4"]["l"].append(5)
+        b["s3"] = { "q": 1 }
+
+        return a, b
+
+
+    def test_diff_parallel(self):
+        a, b = self._parallel_diff_pair()
+
+        diff = deepdiff(a, b)
+        diff_parallel = deepdiff_parallel(a, b, max_workers=2, threshold=50)
+
+        self.assertEqual(diff, diff_parallel)
+        self.assertIsInstance(diff_parallel, DeepDiffResult)
+        self.assertFalse(diff_parallel.truncated)
+
+        # the items are in the same order as deepdiff() gives them
+
+        self.assertEqual([ list(items) for items in diff ],
+                         [ list(items) for items in diff_parallel ])
+
+
+    def test_diff_parallel_executor(self):
+        a, b = self._parallel_diff_pair()
+
+        policy = DeepPolicy({ ("s1",): { "skip": True },
+                              (ANY, ANY, "l"): { "list_as_set": True } })
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertEqual(
+                deepdiff(a, b, policy=policy),
+                deepdiff_parallel(a, b, policy=policy, threshold=10,
+                                  executor=executor))
+
+
+    def test_diff_parallel_dispatch(self):
+        shared = {str(i): [i] for i in range(20)}
+        a = {"s": shared, "c": _CompactDict({str(i): i for i in range(20)})}
+        b = {"s": shared, "c": _CompactDict({str(i): -i for i in range(20)})}
+
+        submitted = []
+
+        class Executor(ThreadPoolExecutor):
+            def submit(self, fn, *args):
+                submitted.append(args[2])
+                return super().submit(fn, *args)
+
+        # the subtree which is the same object isn't sent to a worker,
+        # but the registered container is sized as a container
+
+        with Executor(max_workers=2) as executor:
+            self.assertEqual(
+                deepdiff(a, b),
+                deepdiff_parallel(a, b, threshold=10, executor=executor))
+
+        self.assertEqual(["c"], submitted)
+
+        # the filter function is only called once for the top level,
+        # even when it rejects it
+
+        calls = []
+
+        def filter_func(path, a, b):
+            calls.append(path)
+            return False
+
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            self.assertEqual(({}, {}), deepdiff_parallel(
+                                           a, b, filter_func=filter_func,
+                                           executor=executor))
+
+        self.assertEqual([[]], calls)
+
+
+
+    # deepmerge3() tests
+
+
+    def test_merge3(self):
+        shared = {"big": list(range(10))}
+
+        base = {"a": 1, "b": {"c": 1, "d": [1, 2]}, "s": {1, 2},
+                "z": {"q": 1}, "x": 1, "shared": shared}
+        ours = {"a": 2, "b": {"c": 1, "d": [1, 2, 3]}, "s": {1, 2, 3},
+                "z": {"q": 1}, "n": 1, "shared": shared}
+        theirs = {"a": 3, "b": {"c": 5, "d": [1, 2, 4]}, "s": {2},
+                  "x": 1, "shared": shared}
+        base_orig = deepcopy(base)
+
+        merged, conflicts = deepmerge3(base, ours, theirs)
+
+        self.assertEqual(
+            {"a": 2, "b": {"c": 5, "d": [1, 2, 3]}, "s": {2, 3}, "n": 1,
+             "shared": shared},
+            merged)
+
+        self.assertIs(shared, merged["shared"])
+        self.assertEqual(base_orig, base)
+
+        self.assertEqual(
+            [DeepConflict(["a"], 1, 2, 3),
+             DeepConflict(["b", "d"], [1, 2], [1, 2, 3], [1, 2, 4])],
+            conflicts)
+
+
+    def test_merge3_delete_and_keys(self):
+        base = {"z": {"q": 1}, "l": [{"id": 1, "v": 1}, {"id": 2, "v": 2}]}
+        ours = {"l": [{"id": 1, "v": 2}]}
+        theirs = {"z": {"q": 2}, "l": [{"id": 1, "v": 1}, {"id": 2, "v": 2},
+                                       {"id": 3}]}
+
+        merged, conflicts = deepmerge3(base, ours, theirs,
+                                       list_keys={ ("l",): "id" })
+
+        self.assertEqual({"l": [{"id": 1, "v": 2}, {"id": 3}]}, merged)
+        self.assertEqual([DeepConflict(["z"], {"q": 1}, MISSING, {"q": 2})],
+                         conflicts)
+
+
+    def test_merge3_list_as_set(self):
+        merged, conflicts = deepmerge3(
+            {"l": [1, 2, 3]}, {"l": [4, 1, 2, 3]}, {"l": [1, 3, 5]},
+            list_as_set=True)
+
+        self.assertEqual({"l": [4, 1, 3, 5]}, merged)
+        self.assertEqual([], conflicts)
+
+
+    def test_merge3_deep(self):
+        base = _deep_dict(20000, {"a": 1, "s": {"t": 1}})
+        ours = _deep_dict(20000, {"a": 2, "s": {"t": 1}})
+        theirs = _deep_dict(20000, {"a": 1, "s": {"t": 1}, "b": 3})
+
+        merged, conflicts = deepmerge3(base, ours, theirs)
+
+        self.assertTrue(
+            deepequal(_deep_dict(20000, {"a": 2, "s": {"t": 1}, "b": 3}),
+                      merged))
+        self.assertEqual([], conflicts)
+
+        # the unchanged parts are still shared, although they weren't
+        # compared with '=='
+
+        leaf = merged
+        while "n" in leaf:
+            leaf = leaf["n"]
+
+        ours_leaf = ours
+        while "n" in ours_leaf:
+            ours_leaf = ours_leaf["n"]
+
+        self.assertIs(ours_leaf["s"], leaf["s"])
+
+
+    def test_merge3_container_types(self):
+        # new objects are built of the type a read-only container is
+        # handled as
+
+        merged, conflicts = deepmerge3(
+            _CompactDict({"a": 1, "b": 1}), _CompactDict({"a": 2, "b": 1}),
+            _CompactDict({"a": 1, "b": 2}))
+
+        self.assertIs(dict, type(merged))
+        self.assertEqual({"a": 2, "b": 2}, merged)
+        self.assertEqual([], conflicts)
+
+
+
+    # deepcompose() tests
+
+
+    def test_compose(self):
+        states = [
+            {"a": 1, "b": {"c": 1, "d": [1, 2]}, "s": {1, 2}, "x": {"y": 1}},
+            {"a": 2, "b": {"c": 1, "d": [2, 3]}, "s": {2, 3}, "n": {"p": 1}},
+            {"a": 2, "b": {"d": [3]}, "s": {1, 3}, "n": {"p": 2, "q": 1},
+             "x": {"z": 1}},
+            {"b": {"c": 2, "d": [3, 4]}, "s": {1}, "n": {"q": 1}},
+        ]
+
+        patches = [ deepdiff(a, b) for a, b in zip(states, states[1:]) ]
+        patches_orig = deepcopy(patches)
+
+        remove_items, update_items = deepcompose(patches)
+        self.assertEqual(patches_orig, patches)
+
+        a = deepcopy(states[0])
+        deepremoveitems(a, deepcopy(remove_items))
+        deepmerge(a, deepcopy(update_items))
+        self.assertEqual(states[-1], a)
+
+
+    def test_compose_list_as_set(self):
+        states = [{"l": [1, 2, 3]}, {"l": [1, 4]}, {"l": [4, 2, 5]}]
+
+        patches = [ deepdiff(a, b, list_as_set=True)
+                        for a, b in zip(states, states[1:]) ]
+
+        self.assertEqual(({"l": [2, 3, 1]}, {"l": [4, 2, 5]}),
+                         deepcompose(patches, list_as_set=True))
+
+        self.assertEqual(({}, {}), deepcompose([]))
+
+
+    def test_compose_list_edits(self):
+        states = [
+            {"l": [1, 2, 3, 4, 5, 6], "m": {"n": [1, 2]}},
+            {"l": [0, 1, 3, 4, 7, 5, 6], "m": {"n": [1, 2, 3]}},
+            {"l": [0, 3, 8, 4, 7, 6, 9], "m": {"n": [2, 3]}},
+            {"l": [3, 8, 4, 6, 9, 1], "m": {"n": [2, 3]}},
+        ]
+
+        patches = [ deepdiff(a, b, list_edits=True)
+                        for a, b in zip(states, states[1:]) ]
+
+        # the edits to each list are combined into a single script
+
+        remove_items, update_items = deepcompose(patches)
+        self.assertIsInstance(update_items["l"], DeepListEdit)
+
+        a = deepcopy(states[0])
+        deepremoveitems(a, deepcopy(remove_items))
+        deepmerge(a, deepcopy(update_items))
+        self.assertEqual(states[-1], a)
+
+        # including at the top level
+
+        lists = [ state["l"] for state in states ]
+        remove_items, update_items = deepcompose(
+            deepdiff(a, b, list_edits=True) for a, b in zip(lists, lists[1:]))
+
+        self.assertEqual([], remove_items)
+        self.assertEqual(listdiff(lists[0], lists[-1]), update_items)
+
+        # an edit can't be combined with another update to the list
+
+        with self.assertRaises(ValueError):
+            deepcompose([deepdiff(states[0], states[1], list_edits=True),
+                         deepdiff(states[1], states[2])])
+
+
+    def test_compose_list_edits_replaced(self):
+        # a list which is added (or removed entirely and added again)
+        # and then edited gives the edited list, and a list which is
+        # edited and then replaced gives the new one
+
+        for states in (
+                [{}, {"l": [1, 2]}, {"l": [0, 2, 3]}],
+                [{"l": [5, 6]}, {}, {"l": [1, 2]}, {"l": [0, 2, 3]}],
+                [{"l": [5, 6]}, {"l": [6, 7]}, {}, {"l": [1, 2]}]):
+
+            patches = [ deepdiff(a, b, list_edits=True)
+                            for a, b in zip(states, states[1:]) ]
+
+            remove_items, update_items = deepcompose(patches)
+            self.assertEqual(states[-1]["l"], update_items["l"])
+
+            a = deepcopy(states[0])
+            deepremoveitems(a, deepcopy(remove_items))
+            deepmerge(a, deepcopy(update_items))
+            self.assertEqual(states[-1], a)
+
+
+
+    # DeepVersionStore tests
+
+
+    def test_version_store(self):
+        store = DeepVersionStore(checkpoint_ratio=10, max_chain=3)
+
+        obj = {"a": {str(i): i for i in range(20)}, "l": [1, 2, 3]}
+        versions = []
+
+        for i in range(10):
+            obj["a"][str(i)] = -i
+            obj["l"].insert(1, i)
+            obj.setdefault("s", set()).add(i)
+
+            self.assertEqual(i, store.commit(obj))
+            versions.append(deepcopy(obj))
+
+        # the stored versions are copies, so changing this has no effect
+
+        obj["a"].clear()
+
+        self.assertEqual(10, len(store))
+        self.assertEqual([0, 4, 8], store.checkpoints())
+
+        for i, version in enumerate(versions):
+            self.assertEqual(version, store.get(i))
+
+        self.assertEqual(versions[-1], store.get())
+        self.assertEqual(versions[-2], store.get(-2))
+        self.assertRaises(IndexError, store.get, 10)
+
+
+    def test_version_store_adaptive(self):
+        store = DeepVersionStore()
+
+        versions_a = {str(i): i for i in range(20)}
+        obj = {"a": dict(versions_a)}
+
+        # small changes are stored as deltas, until they add up to the
+        # size of the object
+
+        for i in range(5):
+            obj["a"][str(i)] = -i
+            store.commit(obj)
+
+        self.assertEqual([0], store.checkpoints())
+
+        # changing an item between a compound and a simple type can't
+        # be stored as a delta, nor can replacing everything usefully
+
+        store.commit({"a": 1})
+        store.commit({"b": {str(i): i for i in range(20)}})
+
+        self.assertEqual([0, 5, 6], store.checkpoints())
+
+        self.assertEqual({"a": 1}, store.get(5))
+        self.assertEqual({"a": dict(versions_a, **{"0": 0, "1": -1, "2": -2})},
+                         store.get(2))
+
+
+    def test_version_store_deep(self):
+        # the versions are copied without recursion, so objects deeper
+        # than the recursion limit can be stored
+
+        store = DeepVersionStore()
+
+        store.commit(_deep_dict(20000, {"a": [1]}))
+        store.commit(_deep_dict(20000, {"a": [1, 2]}))
+
+        self.assertTrue(deepequal(_deep_dict(20000, {"a": [1]}),
+                                  store.get(0)))
+
+        self.assertTrue(deepequal(_deep_dict(20000, {"a": [1, 2]}),
+                                  store.get(1)))
+
+
+
+    # deepintern() tests
+
+
+    def test_intern(self):
+        table = DeepInternTable()
+
+        a = deepintern({"x": {"p": [1, 2], "q": {3}}, "y": {"p": [1, 2]},
+                        "z": {"p": [True, 2]}}, table)
+
+        b = deepintern({"x": {"p": [1, 2], "q": {3}}}, table)
+
+        # identical subtrees are shared, but not ones which are only
+        # equal
+
+        self.assertIs(a["x"], b["x"])
+        self.assertIs(a["x"]["p"], a["y"]["p"])
+        self.assertIsNot(a["x"]["p"], a["z"]["p"])
+        self.assertIs(True, a["z"]["p"][0])
+
+        self.assertIsInstance(a, FrozenDict)
+        self.assertIsInstance(a["x"]["p"], FrozenList)
+        self.assertIsInstance(a["x"]["q"], FrozenSet)
+
+        self.assertEqual(hash(a["x"]), hash(deepintern({"x": a["x"]})["x"]))
+        self.assertIs(a, deepcopy(a))
+
+        self.assertRaises(TypeError, a.__setitem__, "w", 1)
+        self.assertRaises(TypeError, a["x"]["p"].append, 3)
+        self.assertRaises(TypeError, a["x"]["q"].add, 4)
+        self.assertRaises(TypeError, deepintern, {"x": [bytearray()]})
+
+        thawed = deepthaw(a)
+        self.assertEqual(a, thawed)
+        self.assertIs(type(thawed["x"]["p"]), list)
+        self.assertIs(type(thawed["x"]["q"]), set)
+
+
+    def test_intern_diff_filter(self):
+        table = DeepInternTable()
+
+        a = { "h%d" % i: {"svc": {"port": 80, "opts": [1, 2]}, "id": i}
+                  for i in range(10) }
+
+        b = deepcopy(a)
+        b["h3"]["svc"]["port"] = 8080
+        del b["h4"]["id"]
+
+        frozen_a = deepintern(a, table)
+        frozen_b = deepintern(b, table)
+
+        remove_items, update_items = deepdiff(frozen_a, frozen_b)
+
+        self.assertEqual(deepdiff(a, b), (remove_items, update_items))
+        self.assertIs(type(remove_items), dict)
+        self.assertIs(type(update_items["h3"]), dict)
+
+        self.assertEqual(
+            list(iter_deepdiff(a, b)), list(iter_deepdiff(frozen_a, frozen_b)))
+
+        f = { "h%d" % i: {"svc": ["opts"]} for i in range(10) }
+
+        filtered = deepfilter(frozen_a, f)
+        self.assertEqual(deepfilter(a, f), filtered)
+        self.assertIsInstance(filtered["h1"], FrozenDict)
+
+
+
+    # JSON Patch tests
+
+
+    def test_jsonpatch(self):
+        a = {"a": 1, "b": {"c": [1, 2, 3], "d": "x"}, "e/f": {"g": 1},
+             "u": {"v": 1}}
+
+        b = {"a": 2, "b": {"c": [1, 3, 4]}, "e/f": {}, "u": {"v": 1},
+             "h": {"i": 1}}
+
+        a_orig = deepcopy(a)
+
+        patch = deepdiff_to_jsonpatch(a, *deepdiff(a, b, list_edits=True))
+
+        self.assertIn({"op": "remove", "path": "/e~1f/g"}, patch)
+        self.assertIn({"op": "remove", "path": "/b/c/1"}, patch)
+        self.assertIn({"op": "add", "path": "/b/c/3", "value": 4}, patch)
+
+        # applying with copy-on-write leaves 'a' alone and shares the
+        # unchanged parts
+
+        c = apply_jsonpatch(a, patch, copy=True)
+        self.assertEqual(a_orig, a)
+        self.assertIs(a["u"], c["u"])
+        self.assertEqual(b, c)
+
+        apply_jsonpatch(a, patch)
+        self.assertEqual(c, a)
+
+        remove_items, update_items = jsonpatch_to_deepdiff(a_orig, patch)
+        a = deepcopy(a_orig)
+        deepremoveitems(a, remove_items)
+        deepmerge(a, deepcopy(update_items), change_types=True)
+        self.assertEqual(c, a)
+
+        # changing between simple and compound values replaces the
+        # item entirely
+
+        a = {"k": 1, "l": [1], "m": {"n": 1}}
+        patch = [{"op": "replace", "path": "/k", "value": [1, 2]},
+                 {"op": "replace", "path": "/l", "value": 2},
+                 {"op": "replace", "path": "/m/n", "value": {"o": 1}}]
+
+        remove_items, update_items = jsonpatch_to_deepdiff(a, patch)
+        self.assertEqual({"k": None, "l": None, "m": {"n": None}},
+                         remove_items)
+
+        b = apply_jsonpatch(a, patch, copy=True)
+        deepremoveitems(a, remove_items)
+        deepmerge(a, update_items, change_types=True)
+        self.assertEqual(b, a)
+
+
+    def test_jsonpatch_ops(self):
+        a = {"x": [1, 2], "y": {"z": 1}}
+
+        self.assertEqual(
+            {"x": [0, 1], "w": {"z": 1}, "v": {"z": 1}},
+            apply_jsonpatch(a, [
+                {"op": "add", "path": "/x/0", "value": 0},
+                {"op": "remove", "path": "/x/2"},
+                {"op": "test", "path": "/x", "value": [0, 1]},
+                {"op": "move", "from": "/y", "path": "/w"},
+                {"op": "copy", "from": "/w", "path": "/v"}]))
+
+        self.assertIsNot(a["w"], a["v"])
+
+        self.assertRaises(ValueError, apply_jsonpatch, a,
+                          [{"op": "test", "path": "/x", "value": [1]}])
+
+        self.assertRaises(ValueError, apply_jsonpatch, a,
+                          [{"op": "remove", "path": "/y"}])
+
+        self.assertRaises(ValueError, apply_jsonpatch, a,
+                          [{"op": "add", "path": "/x/3", "value": 1}])
+
+        self.assertRaises(TypeError, apply_jsonpatch, a,
+                          [{"op": "add", "path": "/x/0/p", "value": 1}])
+
+
+    def test_jsonpatch_test_types(self):
+        a = {"x": [1, {"y": True}], "z": 1.0}
+
+        apply_jsonpatch(a, [
+            {"op": "test", "path": "/x", "value": (1, {"y": True})},
+            {"op": "test", "path": "/z", "value": 1}])
+
+        self.assertRaises(ValueError, apply_jsonpatch, a,
+                          [{"op": "test", "path": "/z", "value": True}])
+
+        self.assertRaises(ValueError, apply_jsonpatch, a,
+                          [{"op": "test", "path": "/x",
+                            "value": [True, {"y": 1}]}])
+
+        self.assertRaises(ValueError, apply_jsonpatch, a,
+                          [{"op": "test", "path": "/x/1",
+                            "value": {"y": True, "w": None}}])
+
+        self.assertRaises(ValueError, apply_jsonpatch, a,
+                          [{"op": "test", "path": "/x", "value": "x"}])
+
+        apply_jsonpatch(a, [{"op": "test", "path": "",
+                             "value": {"x": [1, {"y": True}], "z": 1}}])
+
+
+    def test_mergepatch(self):
+        a = {"a": 1, "b": {"c": 1, "d": 2}, "e": [1, 2], "f": {"g": {"h": 1}}}
+        b = {"a": "x", "b": {"c": 1}, "e": [2, 3], "f": {"g": {"i": 1}},
+             "j": {"k": 1}}
+
+        patch = deepdiff_to_mergepatch(a, *deepdiff(a, b, change_types=True))
+
+        self.assertEqual(
+            {"a": "x", "b": {"d": None}, "e": [2, 3],
+             "f": {"g": {"h": None, "i": 1}}, "j": {"k": 1}},
+            patch)
+
+        remove_items, update_items = mergepatch_to_deepdiff(a, patch)
+
+        deepremoveitems(a, remove_items)
+        deepmerge(a, deepcopy(update_items), change_types=True)
+        self.assertEqual(b, a)
+
+        self.assertRaises(ValueError, deepdiff_to_mergepatch,
+                          {"a": 1}, {}, {"a": None})
+
+        # a simple value replaced by a compound one (and vice-versa)
+        # must be removed first
+
+        a = {"k": 1, "l": [1]}
+        patch = {"k": [1, 2], "l": 2}
+
+        remove_items, update_items = mergepatch_to_deepdiff(a, patch)
+        self.assertEqual(({"k": None, "l": None}, patch),
+                         (remove_items, update_items))
+
+        deepremoveitems(a, remove_items)
+        deepmerge(a, update_items, change_types=True)
+        self.assertEqual(patch, a)
+
+
+    def test_jsonpatch_sets(self):
+        a = {"s": {1, 2}, "l": [1, 2]}
+
+        remove_items, update_items = deepdiff(a, {"s": {2, 3}, "l": [2, 3]},
+                                              list_as_set=True)
+
+        # sets (and lists, handled as sets) are replaced with lists
+
+        patch = deepdiff_to_jsonpatch(a, remove_items, update_items,
+                                      list_as_set=True)
+
+        self.assertEqual(
+            {"s": [2, 3], "l": [2, 3]},
+            { op["path"][1:]: sorted(op["value"]) for op in patch })
+
+
+
+    # atomic deepmerge() and deepremoveitems() tests
+
+
+    def test_merge_atomic(self):
+        a = {"a": 1, "b": {"c": [1, 2], "d": {1}}, "e": {"f": 1}, "g": 1}
+        a_orig = deepcopy(a)
+
+        # the error occurs after the other items have been changed
+        # (dictionaries are merged in the order of 'b')
+
+        b = {"a": 2, "b": {"c": [3], "d": {2}, "x": 1}, "h": 1, "e": 1}
+
+        self.assertRaises(TypeError, deepmerge, a, b, atomic=True)
+        self.assertEqual(a_orig, a)
+        self.assertEqual(list(a_orig), list(a))
+
+        # without atomic, the changes before the error are left
+
+        self.assertRaises(TypeError, deepmerge, a, b)
+        self.assertNotEqual(a_orig, a)
+
+        a = deepcopy(a_orig)
+        del b["e"]
+        deepmerge(a, b, atomic=True)
+        self.assertEqual({"a": 2, "b": {"c": [1, 2, 3], "d": {1, 2}, "x": 1},
+                          "e": {"f": 1}, "g": 1, "h": 1}, a)
+
+
+    def test_removeitems_atomic(self):
+        a = {"a": 1, "b": {"c": [1, 2, 1], "d": {1, 2}}, "e": 1, "f": 1}
+        a_orig = deepcopy(a)
+
+        def filter_func(path, a, b):
+            if path == DeepPath(("f",)):
+                raise ValueError("filtered")
+
+            return True
+
+        self.assertRaises(
+            ValueError, deepremoveitems, a,
+            {"a": None, "b": {"c": [1], "d": [2]}, "e": None, "f": {"g": 1}},
+            filter_func=filter_func, atomic=True)
+
+        self.assertEqual(a_orig, a)
+        self.assertEqual(list(a_orig), list(a))
+        self.assertEqual([1, 2, 1], a["b"]["c"])
+
+
+    # deepmerge_plan() tests
+
+    def test_merge_plan(self):
+        a = {"a": 1, "b": {"c": [1, 2], "d": {1}, "e": "x"}, "f": "y",
+             "g": [{"k": 1, "v": 1}]}
+        a_orig = deepcopy(a)
+
+        b = {"a": 2, "b": {"c": [2, 3], "d": {1, 2}, "e": "x", "n": 1},
+             "f": {"z": 1}, "g": [{"k": 1, "v": 2}, {"k": 2}], "h": "new",
+             "i": 1.0}
+
+        plan = deepmerge_plan(a, b, list_keys={"g": "k"})
+        self.assertEqual((3, 2, 2, 4, 0), plan[:5])
+        self.assertEqual([["f"]], [ path for path, _ in plan.conflicts ])
+        self.assertGreater(plan.bytes_added, 0)
+        self.assertEqual(a_orig, a)
+
+        plan = deepmerge_plan(a, b, replace=False, list_as_set=True,
+                              list_keys={"g": "k"})
+        self.assertEqual((3, 0, 4, 3, 0), plan[:5])
+
+        # the conflicts are those deepmerge() would raise
+
+        a = {"a": 1, "b": [1], "c": {"d": "x"}}
+        b = {"a": "1", "b": {2}, "c": {"d": 1.5}}
+
+        plan = deepmerge_plan(a, b)
+        self.assertEqual([["a"], ["b"], ["c", "d"]],
+                         [ path for path, _ in plan.conflicts ])
+
+        with self.assertRaises(TypeError) as cm:
+            deepmerge(deepcopy(a), b)
+
+        self.assertEqual(plan.conflicts[0][1], str(cm.exception))
+
+        plan = deepmerge_plan(a, b, change_types=True)
+        self.assertEqual([["b"]], [ path for path, _ in plan.conflicts ])
+        self.assertEqual(2, plan.replaced)
+
+        # list edits
+
+        a = {"l": [1, 2, 3, 4]}
+        b = {"l": [1, 5, 6, 4, 7]}
+        plan = deepmerge_plan(a, deepdiff(a, b, list_edits=True)[1])
+        self.assertEqual((2, 3), (plan.deleted, plan.inserted))
+
+
+    # deepequal() and deepdiff() budget tests
+
+    def test_equal(self):
+        a = {"a": 1, "b": {"c": [1, 2], "d": {1, 2}}, "e": [{"k": 1, "v": 1}]}
+        self.assertTrue(deepequal(a, deepcopy(a)))
+
+        b = deepcopy(a)
+        b["b"]["c"] = [2, 1]
+        self.assertFalse(deepequal(a, b))
+        self.assertTrue(deepequal(a, b, list_as_set=True))
+
+        b["b"]["x"] = 1
+        self.assertFalse(deepequal(a, b, list_as_set=True))
+        self.assertTrue(deepequal(
+            a, b, list_as_set=True,
+            filter_func=lambda path, a, b: path != ["b"]))
+
+        self.assertTrue(deepequal(
+            a, b, policy=DeepPolicy([(("b",), {"skip": True})])))
+
+        # keyed lists only differ if the items with the same key do
+
+        a = {"e": [{"k": 1, "v": 1}, {"k": 2}]}
+        b = {"e": [{"k": 2}, {"k": 1, "v": 1}]}
+        self.assertFalse(deepequal(a, b))
+        self.assertTrue(deepequal(a, b, list_keys={("e",): "k"}))
+
+        b["e"][1]["v"] = 2
+        self.assertFalse(deepequal(a, b, list_keys={("e",): "k"}))
+
+        # differences in type are just differences
+
+        self.assertFalse(deepequal({"a": 1}, {"a": "1"}))
+        self.assertFalse(deepequal({"a": [1]}, {"a": {1}}))
+        self.assertFalse(deepequal({"a": [1]}, {"a": 1}))
+        self.assertTrue(deepequal({"a": 1}, {"a": 1.0}))
+
+        # the comparison stops at the first difference
+
+        paths = []
+
+        def filter_func(path, a, b):
+            paths.append(path)
+            return True
+
+        a = {"a": {"b": 1}, "c": {"d": 1}}
+        self.assertFalse(deepequal(a, {"a": {"b": 2}, "c": {"d": 2}},
+                                   filter_func=filter_func))
+        self.assertEqual([[], ["a"], ["a", "b"]], paths)
+
+        self.assertRaises(TypeError, deepequal, 1, {})
+
+
+    def test_diff_budget(self):
+        a = { i: { "x": i, "s": {1, 2} } for i in range(10) }
+        b = deepcopy(a)
+
+        for i in range(0, 10, 2):
+            b[i]["x"] = -1
+
+        full = deepdiff(a, b)
+        self.assertFalse(full.truncated)
+        self.assertEqual(5, len(full[1]))
+
+        result = deepdiff(a, b, max_changes=5)
+        self.assertFalse(result.truncated)
+        self.assertEqual(full, result)
+
+        remove_items, update_items = result = deepdiff(a, b, max_changes=2)
+        self.assertTrue(result.truncated)
+        self.assertEqual(3, len(update_items))
+
+        for i, changes in update_items.items():
+            self.assertEqual(full[1][i], changes)
+
+        result = deepdiff(a, b, time_budget=0)
+        self.assertTrue(result.truncated)
+        self.assertEqual(({}, {}), result)
+
+        # the result can be copied, keeping the flag
+
+        self.assertTrue(deepcopy(result).truncated)
+
+
+    # register_container() tests
+
+    def test_container_types(self):
+        a = _CompactDict({"a": 1, "b": _CompactDict({"c": [1, 2], "d": "x"}),
+                          "e": (1, 2)})
+
+        b = {"a": 2, "b": {"c": [1, 2, 3], "d": "x"}, "f": 1, "e": (1, 2)}
+
+        self.assertEqual(({"b": {"c": [1, 2]}},
+                          {"a": 2, "b": {"c": [1, 2, 3]}, "f": 1}),
+                         deepdiff(a, b))
+
+        self.assertEqual(
+            [("update", ["f"], 1), ("update", ["a"], 2),
+             ("update", ["b", "c"], [1, 2, 3])],
+            list(iter_deepdiff(a, b)))
+
+        self.assertTrue(deepequal(a, {"a": 1, "b": {"c": [1, 2], "d": "x"},
+                                      "e": (1, 2)}))
+        self.assertFalse(deepequal(a, b))
+        self.assertTrue(DeepFingerprints().equal(a, deepthaw(a)))
+
+        self.assertEqual({"b": {"d": "x"}}, deepfilter(a, {"b": ["d"]}))
+        self.assertIs(dict, type(deepfilter(a, ["a"])))
+        self.assertEqual(1, deepget(a, "a"))
+
+        # read-only containers can't be modified, but can be copied
+
+        self.assertRaises(TypeError, deepmerge, a, b)
+        self.assertRaises(TypeError, deepremoveitems, a, {"a": None})
+
+        self.assertEqual({"a": 2, "b": {"c": [1, 2, 1, 2, 3], "d": "x"},
+                          "e": (1, 2), "f": 1},
+                         deepmerge(a, b, copy=True))
+
+        self.assertEqual([[]], [ path for path, _ in
+                                 deepmerge_plan(a, b).conflicts ])
+
+        table = DeepInternTable()
+        frozen = deepintern(a, table)
+        self.assertIs(FrozenDict, type(frozen))
+        self.assertIs(frozen["b"], deepintern(deepthaw(a), table)["b"])
+
+        # tuples are still simple values, but classes registered through
+        # an abstract base class are containers
+
+        self.assertRaises(TypeError, deepdiff, {"e": (1,)}, {"e": [1]})
+
+        self.assertEqual(({"p": [1, 2]}, {"p": [1, 3]}),
+                         deepdiff({"p": _PairList(1, 2)},
+                                  {"p": _PairList(1, 3)}))
+
+        self.assertEqual(
+            ({"p": [2]}, {"p": [3]}),
+            deepdiff({"p": _PairList(1, 2)}, {"p": [1, 3]},
+                     list_as_set=True))
+
+        # the registered types are containers everywhere, including the
+        # query, JSON patch and tracking functions
+
+        c = _CompactDict({"x": {"y": [1, 2]}, "p": _PairList(3, 4)})
+
+        self.assertEqual([[1, 2]], deepquery(c, "x.y"))
+        self.assertEqual([3, 4], deepquery(c, "p.*"))
+        self.assertEqual([4], deepquery(c, "p.1"))
+        self.assertEqual([], deepquery({"t": (1, 2)}, "t.0"))
+
+        self.assertEqual([{"op": "replace", "path": "/p", "value": [3, 5]}],
+                         deepdiff_to_jsonpatch(c, {"p": [4]}, {"p": [5]}))
+        self.assertEqual({"x": {"y": [1, 2]}, "p": [3, 4], "q": 1},
+                         apply_jsonpatch(c, [{"op": "add", "path": "/q",
+                                              "value": 1}], copy=True))
+        self.assertEqual(({"x": None}, {"x": 1}),
+                         mergepatch_to_deepdiff(c, {"x": 1}))
+
+        tracked = deeptrack(c)
+        self.assertIs(TrackedDict, type(tracked))
+        tracked["p"].append(5)
+        self.assertEqual(({"p": [3, 4]}, {"p": [3, 4, 5]}), tracked.changes())
+
+        self.assertRaises(ValueError, register_container, _PairList, tuple)
+        self.assertRaises(TypeError, register_container, _PairList(1, 2),
+                          list)
+
+
 if __name__ == '__main__':
     unittest.main()